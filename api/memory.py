@@ -0,0 +1,43 @@
+from os import environ
+
+from flask import Blueprint, Response, abort, jsonify, request
+
+# The report is only served to requests carrying this header with the value of IO_ADMIN_TOKEN
+ADMIN_HEADER = "X-IO-Admin"
+ADMIN_TOKEN_ENV = "IO_ADMIN_TOKEN"
+
+
+def is_admin():
+    """True when the request carries the admin token (and one is configured)."""
+    token = environ.get(ADMIN_TOKEN_ENV)
+    return bool(token) and request.headers.get(ADMIN_HEADER) == token
+
+
+def create_memory_api(get_data):
+    """
+    Blueprint serving ``/admin/memory``: per-structure byte counts, RSS and
+    (with PYTHONTRACEMALLOC=10, so allocations are attributed to packages)
+    a tracemalloc breakdown for this worker. Every cache in
+    ``process.cache.version_caches`` is sized.
+    ``?format=text`` returns the CLI rendering instead of JSON. Without
+    ``IO_ADMIN_TOKEN`` set on the server the route does not exist.
+    """
+    blueprint = Blueprint("memory_api", __name__)
+
+    @blueprint.route("/admin/memory")
+    def memory():
+        if not is_admin():
+            abort(404)
+        from process.cache import version_caches
+        from process.memory import format_report, memory_report
+
+        report = memory_report(
+            get_data(),
+            caches=version_caches(),
+            top=request.args.get("top", 10, type=int)
+        )
+        if request.args.get("format") == "text":
+            return Response(format_report(report) + "\n", content_type="text/plain; charset=utf-8")
+        return jsonify(report)
+
+    return blueprint
@@ -0,0 +1,75 @@
+from flask import Blueprint, Response, request
+
+from process.instrument import callback_metrics, record_response_bytes, reset_response_tracking
+
+PROMETHEUS_MIME = "text/plain; version=0.0.4; charset=utf-8"
+
+HISTOGRAM_FAMILIES = [
+    ("dash_callback_duration_seconds", "seconds", "Wall time of Dash callbacks"),
+    ("dash_callback_extract_seconds", "extract_seconds", "Time spent extracting data in process.* per callback"),
+    ("dash_callback_figure_seconds", "figure_seconds", "Time spent building Plotly figures per callback"),
+    ("dash_callback_response_bytes", "response_bytes", "Size of serialised callback responses"),
+]
+
+CACHE_FAMILIES = [
+    ("io_cache_hits_total", "counter", "hits", "Lookups answered from a memoisation cache"),
+    ("io_cache_misses_total", "counter", "misses", "Lookups that computed a value for a memoisation cache"),
+    ("io_cache_entries", "gauge", "size", "Entries held by a memoisation cache"),
+]
+
+
+def _format_bound(bound):
+    return f"{bound:g}"
+
+
+def render_prometheus():
+    """Render callback histograms and cache counters in Prometheus text format."""
+    from process.cache import version_caches
+
+    lines = []
+    callbacks = callback_metrics.callbacks()
+    for family, series, help_text in HISTOGRAM_FAMILIES:
+        lines += [f"# HELP {family} {help_text}", f"# TYPE {family} histogram"]
+        for callback in callbacks:
+            histogram = callback_metrics.histogram(callback, series)
+            cumulative, total, count = histogram.snapshot()
+            for bound, value in zip(histogram.buckets, cumulative):
+                lines.append(f'{family}_bucket{{callback="{callback}",le="{_format_bound(bound)}"}} {value}')
+            lines.append(f'{family}_bucket{{callback="{callback}",le="+Inf"}} {cumulative[-1]}')
+            lines.append(f'{family}_sum{{callback="{callback}"}} {total}')
+            lines.append(f'{family}_count{{callback="{callback}"}} {count}')
+
+    lines += ["# HELP dash_callback_errors_total Callbacks that raised", "# TYPE dash_callback_errors_total counter"]
+    for callback, count in sorted(callback_metrics.errors.items()):
+        lines.append(f'dash_callback_errors_total{{callback="{callback}"}} {count}')
+
+    stats = [(name, cache.stats()) for name, cache in version_caches()]
+    for family, kind, key, help_text in CACHE_FAMILIES:
+        lines += [f"# HELP {family} {help_text}", f"# TYPE {family} {kind}"]
+        for name, cache_stats in stats:
+            lines.append(f'{family}{{cache="{name}"}} {cache_stats[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def create_metrics_api(callback_path="/_dash-update-component"):
+    """
+    Blueprint exposing ``/metrics`` and recording the response size of every
+    Dash callback request made to ``callback_path``.
+    """
+    blueprint = Blueprint("metrics_api", __name__)
+
+    @blueprint.before_app_request
+    def start_tracking():
+        reset_response_tracking()
+
+    @blueprint.after_app_request
+    def track_response_bytes(response):
+        if request.path.endswith(callback_path) and not response.direct_passthrough:
+            record_response_bytes(response.calculate_content_length() or 0)
+        return response
+
+    @blueprint.route("/metrics")
+    def metrics():
+        return Response(render_prometheus(), content_type=PROMETHEUS_MIME)
+
+    return blueprint
@@ -0,0 +1,18 @@
+from flask import Blueprint, request
+
+from process.profiling import PROFILE_HEADER, header_allows_profiling, request_profiling
+
+
+def create_profiling_hook():
+    """
+    Blueprint that flags a request for profiling when it carries the
+    ``X-IO-Profile`` header with the value of ``IO_PROFILE_TOKEN``.
+    Without the token set on the server the header is ignored.
+    """
+    blueprint = Blueprint("profiling_hook", __name__)
+
+    @blueprint.before_app_request
+    def flag_profiled_request():
+        request_profiling(header_allows_profiling(request.headers.get(PROFILE_HEADER)))
+
+    return blueprint
@@ -0,0 +1,300 @@
+from hashlib import sha1
+from io import BytesIO
+from json import dumps
+from math import isnan
+
+from flask import Blueprint, Response, request
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+MAX_SUPPLIERS = 200
+MAX_BATCH_QUERIES = 500
+
+
+class QueryError(ValueError):
+    """A query that cannot be answered; carries the HTTP status to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_weights(text):
+    """Parse ``"CHN:2,USA:0.5"`` into ``{"CHN": 2.0, "USA": 0.5}``."""
+    weights = {}
+    for item in filter(None, (text or "").split(",")):
+        country, _, weight = item.partition(":")
+        try:
+            weights[country.strip()] = float(weight)
+        except ValueError:
+            raise QueryError(f"Invalid weight '{item}', expected COUNTRY:WEIGHT")
+    return weights
+
+
+def normalise_query(query):
+    """Validate a query dict and fill in defaults, so equal queries hash equally."""
+    kind = query.get("type", "suppliers")
+    country = query.get("country")
+    if not country:
+        raise QueryError("Missing 'country'")
+
+    if kind == "suppliers":
+        if not query.get("industry"):
+            raise QueryError("Missing 'industry'")
+        try:
+            k = int(query.get("k", 10))
+        except (TypeError, ValueError):
+            raise QueryError("'k' must be an integer")
+        if not 0 < k <= MAX_SUPPLIERS:
+            raise QueryError(f"'k' must be between 1 and {MAX_SUPPLIERS}")
+        run_filter = str(query.get("filter", True)).lower() not in ("0", "false", "no")
+        return {"type": kind, "country": country, "industry": query["industry"], "k": k, "filter": run_filter}
+
+    if kind == "risk":
+        if not query.get("industry"):
+            raise QueryError("Missing 'industry'")
+        weights = query.get("weights") or {}
+        if isinstance(weights, str):
+            weights = parse_weights(weights)
+        if not isinstance(weights, dict):
+            raise QueryError("'weights' must be an object of country weights or a 'COUNTRY:WEIGHT,...' string")
+        normalised = {}
+        for country_code, weight in sorted(weights.items()):
+            try:
+                normalised[country_code] = float(weight)
+            except (TypeError, ValueError):
+                raise QueryError(f"Invalid weight {weight!r} for '{country_code}', expected a number")
+            if isnan(normalised[country_code]) or abs(normalised[country_code]) == float("inf"):
+                raise QueryError(f"Invalid weight {weight!r} for '{country_code}', expected a finite number")
+        return {"type": kind, "country": country, "industry": query["industry"], "weights": normalised}
+
+    if kind == "heatmap":
+        if not query.get("reference"):
+            raise QueryError("Missing 'reference'")
+        scale = query.get("scale", "linear")
+        if scale not in ("linear", "log"):
+            raise QueryError("'scale' must be 'linear' or 'log'")
+        return {"type": kind, "country": country, "reference": query["reference"], "scale": scale}
+
+    raise QueryError(f"Unknown query type '{kind}'")
+
+
+def run_query(data, query):
+    """Answer a normalised query with a DataFrame, using the cached process functions."""
+    # Imported on first use so registering the blueprint does not pull in pandas
+    import numpy as np
+    from pandas import DataFrame
+    from process.heatmap import heatmap_block
+    from process.risk import weighted_risk
+    from process.utils import obtain_inputs
+
+    df = data["data"]
+    try:
+        if query["type"] == "suppliers":
+            inputs = obtain_inputs(df, query["industry"], query["k"],
+                                   selected_country=query["country"], run_filter=query["filter"])
+            split_codes = inputs.index.str.split("_", n=1)
+            return DataFrame({
+                "source": inputs.index,
+                "country": split_codes.str[0],
+                "industry": split_codes.str[1],
+                "value": inputs.to_numpy()
+            })
+
+        if query["type"] == "risk":
+            _, metrics = weighted_risk(df, query["weights"], query["country"], query["industry"])
+            return metrics
+
+        block = heatmap_block(df, data["metadata"], query["country"], query["reference"],
+                              blocks=data.get("heatmap_blocks"))
+        if query["scale"] == "log":
+            block = np.log1p(block)
+        block.index = [label.split("_", 1)[1] for label in block.index]
+        block.columns = [label.split("_", 1)[1] for label in block.columns]
+        return block.rename_axis("source_industry").reset_index()
+    except (KeyError, ValueError) as exc:
+        raise QueryError(str(exc).strip("'\""), status=404)
+
+
+def frame_to_json(frame):
+    """Column-oriented dict with NaN mapped to null."""
+    return {
+        col: [None if isinstance(v, float) and isnan(v) else v for v in frame[col].tolist()]
+        for col in frame.columns
+    }
+
+
+def frame_to_arrow(frame):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise QueryError("Arrow output needs the pyarrow package", status=406)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def wants_arrow():
+    return request.args.get("format") == "arrow" or \
+        request.accept_mimetypes.best_match(["application/json", ARROW_MIME]) == ARROW_MIME
+
+
+def make_etag(version, payload, use_arrow):
+    # Results depend only on the data version and the normalised query, so
+    # the tag is known before any work is done
+    return sha1(dumps([version, payload, use_arrow], sort_keys=True).encode()).hexdigest()
+
+
+def error_response(exc):
+    return Response(dumps({"error": str(exc)}), status=exc.status, mimetype="application/json")
+
+
+def create_query_api(get_data):
+    """
+    Blueprint with the numbers behind the charts, for programmatic access.
+
+    ``get_data(year, grouping)`` returns the ``load_data`` dict for a year
+    (None for the default), aggregated by a named grouping (see
+    process.groups); every route takes an optional ``year`` and
+    ``grouping``. Responses are
+    compact column-oriented JSON, or Arrow IPC streams when asked for with
+    ``?format=arrow`` or ``Accept: application/vnd.apache.arrow.stream``.
+    Every response carries an ETag derived from the data version and the
+    query; a GET with a matching ``If-None-Match`` returns 304 without
+    recomputing.
+    """
+    blueprint = Blueprint("query_api", __name__, url_prefix="/api/v1")
+
+    def respond(version, payload, build):
+        use_arrow = wants_arrow()
+        etag = make_etag(version, payload, use_arrow)
+        if request.method == "GET" and request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        try:
+            frame = build()
+            if use_arrow:
+                response = Response(frame_to_arrow(frame), mimetype=ARROW_MIME)
+            else:
+                body = {"version": version, "query": payload, "result": frame_to_json(frame)}
+                response = Response(dumps(body, separators=(",", ":")), mimetype="application/json")
+        except QueryError as exc:
+            return error_response(exc)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def dataset(year, grouping=None):
+        try:
+            year = None if year is None else int(year)
+        except (TypeError, ValueError):
+            raise QueryError("'year' must be an integer")
+        try:
+            return get_data(year, grouping or None)
+        except FileNotFoundError:
+            raise QueryError(f"No IO table for year {year}", status=404)
+        except KeyError:
+            raise QueryError(f"Unknown grouping '{grouping}'", status=404)
+
+    def single(kind):
+        try:
+            data = dataset(request.args.get("year"), request.args.get("grouping"))
+            query = normalise_query(dict(request.args, type=kind))
+        except QueryError as exc:
+            return error_response(exc)
+        return respond(data["version"], query, lambda: run_query(data, query))
+
+    @blueprint.route("/suppliers")
+    def suppliers():
+        return single("suppliers")
+
+    @blueprint.route("/risk")
+    def risk():
+        return single("risk")
+
+    @blueprint.route("/heatmap")
+    def heatmap():
+        return single("heatmap")
+
+    @blueprint.route("/search")
+    def search():
+        """
+        Options matching ``q`` among ``kind`` (countries, industries or
+        sectors), as the dropdowns search them: at most ``limit`` results,
+        100 by default.
+        """
+        from pandas import DataFrame
+        from process import SEARCH_LIMIT
+        from process.search import OPTION_KINDS, search_options
+
+        try:
+            data = dataset(request.args.get("year"), request.args.get("grouping"))
+            kind = request.args.get("kind", "sectors")
+            if kind not in OPTION_KINDS:
+                raise QueryError(f"'kind' must be one of {', '.join(OPTION_KINDS)}")
+            try:
+                limit = int(request.args.get("limit", SEARCH_LIMIT))
+            except ValueError:
+                raise QueryError("'limit' must be an integer")
+            if not 0 < limit <= SEARCH_LIMIT:
+                raise QueryError(f"'limit' must be between 1 and {SEARCH_LIMIT}")
+        except QueryError as exc:
+            return error_response(exc)
+        query = {"type": "search", "kind": kind, "q": request.args.get("q", ""), "limit": limit}
+
+        def build():
+            options = search_options(data, kind, query["q"], limit)
+            return DataFrame({"value": [option["value"] for option in options],
+                              "label": [option["label"] for option in options]})
+        return respond(data["version"], query, build)
+
+    @blueprint.route("/batch", methods=["POST"])
+    def batch():
+        """
+        Answer many queries in one call. The body is
+        ``{"queries": [{"type": "suppliers", "country": "NZL", "industry": "C10T12"}, ...]}``
+        with an optional ``"year"`` and ``"grouping"`` for all of them;
+        failed queries are reported inline and do not fail the batch. Arrow
+        output stacks all results in one table with a ``query`` column
+        holding the position of the query in the request.
+        """
+        from pandas import DataFrame, concat
+
+        body = request.get_json(silent=True) or {}
+        try:
+            data = dataset(body.get("year"), body.get("grouping"))
+        except QueryError as exc:
+            return error_response(exc)
+        raw_queries = body.get("queries")
+        if not isinstance(raw_queries, list) or not raw_queries:
+            return error_response(QueryError("Body must contain a non-empty 'queries' list"))
+        if len(raw_queries) > MAX_BATCH_QUERIES:
+            return error_response(QueryError(f"At most {MAX_BATCH_QUERIES} queries per batch"))
+
+        use_arrow = wants_arrow()
+        results, frames = [], []
+        for pos, raw_query in enumerate(raw_queries):
+            try:
+                query = normalise_query(raw_query if isinstance(raw_query, dict) else {})
+                frame = run_query(data, query)
+            except QueryError as exc:
+                results.append({"query": raw_query, "error": str(exc)})
+                frames.append(DataFrame({"query": [pos], "error": [str(exc)]}))
+                continue
+            results.append({"query": query, "result": frame_to_json(frame)})
+            frames.append(frame.assign(query=pos))
+
+        try:
+            if use_arrow:
+                response = Response(frame_to_arrow(concat(frames, ignore_index=True)), mimetype=ARROW_MIME)
+            else:
+                response = Response(dumps({"version": data["version"], "results": results}, separators=(",", ":")),
+                                    mimetype="application/json")
+        except QueryError as exc:
+            return error_response(exc)
+        response.set_etag(make_etag(data["version"], raw_queries, use_arrow))
+        return response
+
+    return blueprint
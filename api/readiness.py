@@ -0,0 +1,42 @@
+from flask import Blueprint, jsonify, request
+
+from process.startup import timeline
+
+RETRY_AFTER_SECONDS = 5
+
+
+def create_readiness_api(loader, gated_prefixes=("/api/",)):
+    """
+    Blueprint with ``/readyz``: 200 once ``loader`` has finished, 503 while
+    it is still loading and 500 if loading failed, together with the
+    startup phases recorded so far. Until then, requests under
+    ``gated_prefixes`` get a 503 with Retry-After instead of waiting on the
+    load; Dash page and callback requests wait for it.
+    """
+    blueprint = Blueprint("readiness_api", __name__)
+
+    def status():
+        if loader.ready:
+            return 200, None
+        if loader.error is not None:
+            return 500, f"Data load failed: {loader.error}"
+        return 503, "Data is still loading"
+
+    @blueprint.before_app_request
+    def gate():
+        if request.path.startswith(gated_prefixes):
+            code, message = status()
+            if code != 200:
+                response = jsonify({"error": message})
+                response.status_code = 503
+                response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+                return response
+
+    @blueprint.route("/readyz")
+    def readyz():
+        code, message = status()
+        response = jsonify({"ready": code == 200, "detail": message, "phases": timeline.phases()})
+        response.status_code = code
+        return response
+
+    return blueprint
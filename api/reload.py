@@ -0,0 +1,31 @@
+from flask import Blueprint, abort, jsonify
+
+from api.memory import is_admin
+
+
+def create_reload_api(store):
+    """
+    Blueprint for hot reloads of the IO table, admin-token gated like
+    ``/admin/memory``: ``GET /admin/data`` reports the served version and
+    reload state of this worker, ``POST /admin/reload`` reloads it now
+    instead of waiting for the next poll. The reload runs in the
+    background; poll ``/admin/data`` to see the new version.
+    """
+    blueprint = Blueprint("reload_api", __name__)
+
+    @blueprint.route("/admin/data")
+    def data_status():
+        if not is_admin():
+            abort(404)
+        return jsonify(store.status())
+
+    @blueprint.route("/admin/reload", methods=["POST"])
+    def reload():
+        if not is_admin():
+            abort(404)
+        started = store.ready and store.reload()
+        response = jsonify(dict(store.status(), started=started))
+        response.status_code = 202 if started else 409
+        return response
+
+    return blueprint
@@ -1,28 +1,79 @@
-import pandas as pd
+from uuid import uuid4
+
 import plotly.graph_objects as go
 import dash
-from dash import dcc, html
+from dash import Patch, dcc, html
 from dash.dependencies import Input, Output
 from layout.header import get_header_layout
 from layout.sidebar import get_sidebar_layout
 from layout.tabs import get_tabs_layout
+from api.memory import create_memory_api
+from api.metrics import create_metrics_api
+from api.profiling import create_profiling_hook
+from api.query import create_query_api
+from api.readiness import create_readiness_api
+from api.reload import create_reload_api
 
-from process.map import create_io_map
-from process.summary import create_io_summary
-from process.data import load_data
-from process.utils import obtain_inputs
-from process.risk import update_risk_chart
-from process.heatmap import create_heatmap
+from process import DATA_LOAD_TIMEOUT, DEFAULT_YEAR, RELOAD_POLL_SECONDS
+from process.instrument import instrument
+from process.prefetch import Prefetcher, figure_cache, neighbour_industries
+from process.reload import DataStore
+from process.startup import BackgroundLoader, timeline
+from process.years import YearStore, available_years, table_path
 
 # -----------------------
 # Load data
 # -----------------------
-data = load_data()
-industry_options = [
-    {'label': f"{row['Industry']}", 'value': row['Code']}
-    for _, row in data["metadata"].iterrows()
-]
-country_options = list(set(data["all_countries"].Code))
+# pandas, the process modules and the table are loaded on a background
+# thread so that importing this module (i.e. a worker reload) returns
+# quickly. Requests wait for the load through get_data(). When the table
+# file changes, data_store loads the new version the same way and swaps it in.
+# Other years are loaded the same way on first use and kept by year_store.
+def load_app_data(year=DEFAULT_YEAR):
+    import plotly.io as pio
+    from process.artifacts import precomputed_figures
+    from process.data import load_shared_data
+
+    loaded = load_shared_data(table_path=table_path(year))
+    with timeline.phase("seed precomputed figures"):
+        for proc_key, proc_path in precomputed_figures(loaded["version"]):
+            figure_cache.get_or_compute((loaded["version"],) + proc_key, lambda path=proc_path: pio.read_json(path))
+    with timeline.phase("import figure modules"):
+        import process.heatmap, process.map, process.risk, process.summary
+    return loaded
+
+
+def discard_cached(data):
+    from process.cache import version_caches
+    from process.utils import topk_indexes
+    for _, cache in version_caches():
+        cache.discard_version(data["version"])
+    topk_indexes.pop(data["version"], None)
+
+
+def drop_stale_entries(old, new):
+    discard_cached(old)
+
+
+data_loader = BackgroundLoader(load_app_data).start()
+data_store = DataStore(data_loader, load_app_data, on_swap=drop_stale_entries).start_polling(RELOAD_POLL_SECONDS)
+year_store = YearStore(load_app_data, on_evict=discard_cached)
+prefetcher = Prefetcher()
+
+
+def get_data(year=None, grouping=None):
+    """
+    The dataset for ``year`` (default: DEFAULT_YEAR, served by data_store),
+    aggregated by the named ``grouping`` when one is given (see process.groups).
+    """
+    if year is None or year == DEFAULT_YEAR:
+        data = data_store.get(DATA_LOAD_TIMEOUT)
+    else:
+        data = year_store.get(year)
+    if grouping:
+        from process.groups import aggregate_data
+        return aggregate_data(data, grouping)
+    return data
 
 # -----------------------
 # About text
@@ -79,24 +130,345 @@ DROPDOWN_STYLE = {"width": "100%", "marginBottom": "10px"}
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server   # <<< important: this is what WSGI will import
 app.title = "Input-Output Flow Map Dashboard"
+server.register_blueprint(create_readiness_api(data_store))
+server.register_blueprint(create_query_api(get_data))
+server.register_blueprint(create_metrics_api())
+server.register_blueprint(create_profiling_hook())
+server.register_blueprint(create_memory_api(get_data))
+server.register_blueprint(create_reload_api(data_store))
 
 # -----------------------
 # Layout
 # -----------------------
-app.layout = html.Div(
-    style={"backgroundColor": "#f8f9fa", "fontFamily": "Arial, sans-serif"},
-    children=[
-        get_header_layout(ABOUT_TEXT_TOP, ABOUT_TEXT_BULLETS, ABOUT_TEXT_BOTTOM, ABOUT_WEIGHTED_HHI, ABOUT_AUTHOR, LABEL_STYLE),
-
-        html.Div(
-            style={"display": "flex", "padding": "0 20px"},
-            children=[
-                get_sidebar_layout(data, industry_options, LABEL_STYLE, DROPDOWN_STYLE, CARD_STYLE),
-                get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE)
-            ]
+def serve_layout():
+    from process.groups import grouping_options
+    # Built per page load, so the first page waits for the data rather than the import
+    from process.search import layout_options
+    data = get_data()
+    # Only the first SEARCH_LIMIT options (and the layout's defaults) are sent; typing searches the rest on the server
+    industry_options = layout_options(data, "industries", value=["A01_02", "C20"])
+    country_options = layout_options(data, "countries", value=["NZL", "CN1", "AUS"])
+    years = available_years()
+    return html.Div(
+        style={"backgroundColor": "#f8f9fa", "fontFamily": "Arial, sans-serif"},
+        children=[
+            get_header_layout(ABOUT_TEXT_TOP, ABOUT_TEXT_BULLETS, ABOUT_TEXT_BOTTOM, ABOUT_WEIGHTED_HHI, ABOUT_AUTHOR, LABEL_STYLE),
+
+            html.Div(
+                style={"display": "flex", "padding": "0 20px"},
+                children=[
+                    get_sidebar_layout(country_options, industry_options, LABEL_STYLE, DROPDOWN_STYLE, CARD_STYLE,
+                                       years=years, groupings=grouping_options()),
+                    get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE, years=years)
+                ]
+            ),
+            dcc.Store(id="prefetch-store"),
+            # One id per page load, so the prefetcher keeps each browser tab's queue and recent countries apart
+            dcc.Store(id="session-id", data=uuid4().hex)
+        ]
+    )
+
+
+app.layout = serve_layout
+
+# -----------------------
+# Figure builders (cached, shared with the prefetcher)
+# -----------------------
+def input_industry_options(selected_country, selected_industry, year=None, grouping=None):
+    from process.summary import get_input_industry_options
+    data = get_data(year, grouping)
+    return get_input_industry_options(data["data"], data["metadata"], selected_country, selected_industry)
+
+
+def summary_figure(selected_country, selected_output_industry, selected_input_industry, year=None, grouping=None):
+    from process.summary import create_io_summary
+    data = get_data(year, grouping)
+    return figure_cache.get_or_compute(
+        (data["version"], "summary", selected_country, selected_output_industry, selected_input_industry),
+        lambda: create_io_summary(
+            data["data"],
+            selected_country,
+            selected_output_industry,
+            selected_input_industry,
+            data["metadata"],
+            data["all_countries"]
         )
-    ]
-)
+    )
+
+
+def map_figure(selected_country, selected_industry, selected_deps, selected_sec_deps, use_thickness, year=None,
+               grouping=None):
+    from process.map import create_io_map
+    data = get_data(year, grouping)
+    return figure_cache.get_or_compute(
+        (data["version"], "map", selected_country, selected_industry, selected_deps,
+         bool(selected_sec_deps), bool(use_thickness)),
+        lambda: create_io_map(
+            data["data"],
+            selected_country,
+            selected_industry,
+            selected_deps,
+            data["metadata"],
+            data["all_countries"],
+            selected_sec_deps=selected_sec_deps,
+            use_thickness=use_thickness,
+            linkages=data.get("linkages"),
+            centrality=data.get("centrality")
+        )
+    )
+
+
+def map_thickness_patch(selected_country, selected_industry, selected_deps, selected_sec_deps, use_thickness,
+                        year=None, grouping=None):
+    """
+    Patch setting the line width of every link of the drawn importer map,
+    for a change of ``use_thickness`` alone; None when there are no links.
+    The map keeps one trace per link, so only ``data[i].line.width`` is sent.
+    """
+    from process.map import map_line_widths
+    data = get_data(year, grouping)
+    widths = map_line_widths(data["data"], selected_country, selected_industry, selected_deps, selected_sec_deps,
+                             use_thickness)
+    if not widths:
+        return None
+    patch = Patch()
+    for pos, width in enumerate(widths):
+        patch["data"][pos]["line"]["width"] = width
+    return patch
+
+
+def global_flows_figure(mode, industry, count, use_thickness, year=None, grouping=None):
+    from process.flows import flow_index, top_country_flows, top_flows
+    from process.map import create_flow_map
+    data = get_data(year, grouping)
+
+    def build():
+        index = flow_index(data)
+        flows = top_flows(index, industry, count) if mode == "sectors" else top_country_flows(index, industry, count)
+        industry_names = data["metadata"].set_index("Code")["Industry"]
+        title = f"Top {len(flows)} cross-border {'sector' if mode == 'sectors' else 'country'} flows" + \
+            (f" into {industry_names.get(industry, industry)}" if industry else "")
+        return create_flow_map(flows, data["metadata"], data["all_countries"], use_thickness=use_thickness,
+                               title=title)
+    return figure_cache.get_or_compute(
+        (data["version"], "flows", mode, industry, count, bool(use_thickness)), build
+    )
+
+
+def risk_figure(risk_weights_data, selected_country, selected_industry, year=None, grouping=None):
+    from process.risk import update_risk_chart
+    data = get_data(year, grouping)
+    return figure_cache.get_or_compute(
+        (data["version"], "risk", tuple(sorted((risk_weights_data or {}).items())),
+         selected_country, selected_industry),
+        lambda: update_risk_chart(
+            data["data"],
+            risk_weights_data,
+            selected_country,
+            selected_industry,
+            data["metadata"],
+            data["all_countries"]
+        )
+    )
+
+
+def compare_figure(risk_weights_data, first, second, year=None, grouping=None):
+    from process.compare import compare_inputs, create_comparison_chart
+    data = get_data(year, grouping)
+    return figure_cache.get_or_compute(
+        (data["version"], "compare", tuple(sorted((risk_weights_data or {}).items())), first, second),
+        lambda: create_comparison_chart(
+            compare_inputs(data["data"], first, second, risk_weights_data),
+            first,
+            second,
+            data["metadata"],
+            data["all_countries"]
+        )
+    )
+
+
+def risk_weights_patch(risk_weights_data, selected_country, selected_industry, year=None, grouping=None):
+    """Patch replacing the bar heights and weight table of the drawn risk chart, for a change of weights alone."""
+    from process.risk import risk_chart_data
+    data = get_data(year, grouping)
+    df_merged, table_df = risk_chart_data(data["data"], risk_weights_data, selected_country, selected_industry,
+                                          data["metadata"])
+    # Encoded by plotly as the full figure is (typed arrays), so the patched figure is the same
+    bars = go.Figure(go.Bar(y=df_merged['weighted_HHI'], text=df_merged['weighted_HHI'].round(3))).to_dict()
+    patch = Patch()
+    patch["data"][0]["y"] = bars["data"][0]["y"]
+    patch["data"][0]["text"] = bars["data"][0]["text"]
+    patch["data"][1]["cells"]["values"] = [table_df["Country"].tolist(), table_df["Weight"].tolist()]
+    return patch
+
+
+def heatmap_figure(selected_country, reference_country, use_log, year=None, grouping=None):
+    from process.heatmap import create_heatmap
+    data = get_data(year, grouping)
+    return figure_cache.get_or_compute(
+        (data["version"], "heatmap", selected_country, reference_country, use_log),
+        lambda: create_heatmap(
+            data["data"],
+            data["metadata"],
+            selected_country,
+            reference_country,
+            use_log,
+            blocks=data["heatmap_blocks"]
+        )
+    )
+
+
+def heatmap_scale_patch(selected_country, reference_country, use_log, year=None, grouping=None):
+    """Patch replacing the values and colour range of the drawn heatmap, for a change of scale alone."""
+    import numpy as np
+    from process.heatmap import heatmap_values
+    data = get_data(year, grouping)
+    values = heatmap_values(data["data"], data["metadata"], selected_country, reference_country, use_log,
+                            blocks=data["heatmap_blocks"]).values
+    patch = Patch()
+    # Sent as a typed array, as in the full figure, rather than nested lists
+    patch["data"][0]["z"] = go.Figure(go.Heatmap(z=values)).to_dict()["data"][0]["z"]
+    patch["data"][0]["zmin"] = np.nanmin(values)
+    patch["data"][0]["zmax"] = np.nanmax(values)
+    return patch
+
+
+def triggered_only(prop_id):
+    """
+    Whether ``prop_id`` (e.g. "use-thickness.value") is the one input that
+    triggered the running callback, so the figure already drawn differs
+    from the new one in that input alone and can be patched.
+    """
+    try:
+        return list(dash.ctx.triggered_prop_ids) == [prop_id]
+    except dash.exceptions.MissingCallbackContextException:
+        return False
+
+
+def sankey_figure(selected_country, selected_industry, depth, min_share, node_budget, year=None, grouping=None):
+    from process.sankey import create_sankey_chart, upstream_chain
+    data = get_data(year, grouping)
+    return figure_cache.get_or_compute(
+        (data["version"], "sankey", selected_country, selected_industry, depth, min_share, node_budget),
+        lambda: create_sankey_chart(
+            upstream_chain(data["data"], selected_country, selected_industry, depth, min_share, node_budget),
+            selected_country,
+            selected_industry,
+            data["metadata"],
+            data["all_countries"]
+        )
+    )
+
+
+def value_added_figure(selected_country, selected_industry, year=None):
+    from process.tiva import create_va_chart, export_decomposition, load_tiva, va_origin_shares
+    data = get_data(year)
+
+    def build():
+        tiva = load_tiva(data, table_path(year or DEFAULT_YEAR))
+        return create_va_chart(
+            va_origin_shares(tiva, selected_country, selected_industry),
+            export_decomposition(tiva, selected_country),
+            selected_country,
+            selected_industry,
+            data["metadata"],
+            data["all_countries"]
+        )
+    return figure_cache.get_or_compute((data["version"], "value-added", selected_country, selected_industry), build)
+
+
+def year_cube_pending_figure():
+    # Not cached: the next request shows the chart once the background build has finished
+    return error_figure("The year cube is not built yet; it is being built in the background. "
+                        "Try again shortly, or run python cli.py precompute --year-cube")
+
+
+def trends_figure(selected_country, selected_industry, input_industry):
+    from process.trends import create_trends_chart, load_year_cube, supplier_share_history
+    cube = load_year_cube()
+    if cube is None:
+        return year_cube_pending_figure()
+    return figure_cache.get_or_compute(
+        (cube.version, "trends", selected_country, selected_industry, input_industry),
+        lambda: create_trends_chart(
+            supplier_share_history(cube, selected_country, selected_industry, input_industry),
+            selected_country,
+            selected_industry,
+            input_industry
+        )
+    )
+
+
+def change_heatmap_figure(selected_country, reference_country, year_from, year_to, mode):
+    from process.trends import change_blocks, create_change_heatmap, load_year_cube
+    cube = load_year_cube()
+    if cube is None:
+        return year_cube_pending_figure()
+    data = get_data()
+    return figure_cache.get_or_compute(
+        (cube.version, "change", selected_country, reference_country, year_from, year_to, mode),
+        lambda: create_change_heatmap(
+            *change_blocks(cube, data["metadata"], selected_country, reference_country, year_from, year_to),
+            selected_country,
+            reference_country,
+            year_from,
+            year_to,
+            mode
+        )
+    )
+
+
+def prefetch_tasks(selected_tab, selected_country, selected_industry, selected_deps,
+                   selected_sec_deps, use_thickness, risk_weights_data, reference_country, use_log,
+                   year=None, grouping=None, session=None):
+    """
+    Figures the user is likely to ask for next, most likely first: the other
+    tabs of the current selection, then the current tab for neighbouring
+    industries and for the countries recently viewed in ``session``, all
+    for the selected year and grouping.
+    """
+    data = get_data(year, grouping)
+    industry_codes = list(data["metadata"]["Code"])
+
+    def selection_tasks(country, industry, tabs):
+        tasks = []
+        for tab in tabs:
+            if tab == "tab-1":
+                tasks.append((
+                    (data["version"], "map", country, industry, selected_deps,
+                     bool(selected_sec_deps), bool(use_thickness)),
+                    lambda: map_figure(country, industry, selected_deps, selected_sec_deps, use_thickness, year,
+                                       grouping)
+                ))
+            elif tab == "tab-2":
+                def summary(country=country, industry=industry):
+                    options = input_industry_options(country, industry, year, grouping)
+                    return summary_figure(country, industry, options[0]["value"] if options else None, year,
+                                          grouping)
+                key = (data["version"], "summary-default", country, industry)
+                tasks.append((key, lambda key=key, summary=summary: figure_cache.get_or_compute(key, summary)))
+            elif tab == "tab-3":
+                tasks.append((
+                    (data["version"], "risk", tuple(sorted((risk_weights_data or {}).items())),
+                     country, industry),
+                    lambda: risk_figure(risk_weights_data, country, industry, year, grouping)
+                ))
+            elif tab == "tab-4":
+                tasks.append((
+                    (data["version"], "heatmap", country, reference_country, use_log),
+                    lambda: heatmap_figure(country, reference_country, use_log, year, grouping)
+                ))
+        return tasks
+
+    all_tabs = ["tab-1", "tab-2", "tab-3", "tab-4"]
+    other_countries = prefetcher.remember_country(selected_country, session)
+
+    tasks = selection_tasks(selected_country, selected_industry, [t for t in all_tabs if t != selected_tab])
+    for proc_industry in neighbour_industries(industry_codes, selected_industry):
+        tasks += selection_tasks(selected_country, proc_industry, [selected_tab])
+    for proc_country in other_countries:
+        tasks += selection_tasks(proc_country, selected_industry, [selected_tab])
+    return tasks
 
 # -----------------------
 # Callbacks
@@ -107,6 +479,7 @@ app.layout = html.Div(
      Input("close-about", "n_clicks")],
     prevent_initial_call=True
 )
+@instrument("toggle_modal")
 def toggle_modal(open_clicks, close_clicks):
     ctx = dash.callback_context
     if not ctx.triggered:
@@ -132,48 +505,107 @@ def toggle_modal(open_clicks, close_clicks):
     Output('tab2-dropdown-selection', 'value'),
     Input('graph-tabs', 'value'),
     Input('industry-dropdown', 'value'),
-    Input('country-dropdown', "value")
+    Input('country-dropdown', "value"),
+    Input('year-dropdown', 'value'),
+    Input('grouping-dropdown', 'value')
 )
-def update_dropdown_options(selected_tab, selected_industry, selected_country):
-    inputs = obtain_inputs(
-        data["data"],
-        selected_industry,
-        50,
-        selected_country=selected_country,
-        run_filter=False
-    )
-    industry_opts = []
-    for proc_option in list(set(inputs.index.str.split('_', n=1).str[1])):
-        industry_opts.append({
-            "label": data["metadata"][data["metadata"]["Code"] == proc_option]["Industry"].values[0],
-            "value": proc_option
-        })
+@instrument("update_dropdown_options")
+def update_dropdown_options(selected_tab, selected_industry, selected_country, year, grouping):
+    industry_opts = input_industry_options(selected_country, selected_industry, year, grouping)
     if selected_tab == "tab-2":
         options = industry_opts
         default_value = options[0]['value'] if options else None
         return options, default_value
     return [], None
 
+@app.callback(
+    Output('country-dropdown', 'value'),
+    Output('industry-dropdown', 'value'),
+    Output('tab4-dropdown-selection', 'value'),
+    Output('tab9-country', 'value'),
+    Output('tab9-industry', 'value'),
+    Input('grouping-dropdown', 'value'),
+    [dash.dependencies.State('year-dropdown', 'value'),
+     dash.dependencies.State('country-dropdown', 'value'),
+     dash.dependencies.State('industry-dropdown', 'value'),
+     dash.dependencies.State('tab4-dropdown-selection', 'value'),
+     dash.dependencies.State('tab9-country', 'value'),
+     dash.dependencies.State('tab9-industry', 'value')],
+    prevent_initial_call=True
+)
+@instrument("update_grouping_options")
+def update_grouping_options(grouping, year, selected_country, selected_industry, reference_country,
+                            compare_country, compare_industry):
+    # Selections move to their group (e.g. CN1 -> CHN) or back to a member of it;
+    # the options follow through the dropdowns' search callbacks
+    from process.groups import read_groupings, regroup_code
+    data = get_data(year, grouping)
+    spec = read_groupings()
+    countries = list(data["all_countries"]["Code"])
+    industries = list(data["metadata"]["Code"])
+    return (
+        regroup_code(selected_country, countries, spec.get("country_groups", {})),
+        regroup_code(selected_industry, industries, spec.get("industry_groups", {})),
+        regroup_code(reference_country, countries, spec.get("country_groups", {})),
+        regroup_code(compare_country, countries, spec.get("country_groups", {})),
+        regroup_code(compare_industry, industries, spec.get("industry_groups", {})) if compare_industry else None
+    )
+
+
+def register_option_search(dropdown_id, kind, grouped=True, tab=None):
+    """
+    Serve the options of a searchable dropdown from the server: the first
+    SEARCH_LIMIT options of ``kind`` matching what is typed, plus the
+    current selection, for the selected year (and grouping, if ``grouped``).
+    Dropdowns on ``tab`` get their options when the tab is opened rather
+    than with the page.
+    """
+    inputs = [Input(dropdown_id, 'search_value'), Input(dropdown_id, 'value'), Input('year-dropdown', 'value'),
+              Input('grouping-dropdown', 'value'), Input('graph-tabs', 'value')]
+
+    @app.callback(Output(dropdown_id, 'options'), inputs, prevent_initial_call=True)
+    @instrument(f"search_options:{dropdown_id}")
+    def update_options(search_value, value, year, grouping, selected_tab):
+        from process.search import search_options
+        if tab is not None and selected_tab != tab:
+            return dash.no_update
+        return search_options(get_data(year, grouping if grouped else None), kind, search_value, value=value)
+
+
+for proc_dropdown, proc_kind, proc_grouped, proc_tab in (
+        ('country-dropdown', "countries", True, None),
+        ('industry-dropdown', "industries", True, None),
+        ('tab4-dropdown-selection', "countries", True, "tab-4"),
+        ('tab9-country', "countries", True, "tab-9"),
+        ('tab9-industry', "industries", True, "tab-9"),
+        # The Trends tab reads the raw year cube whatever the grouping
+        ('tab5-reference-country', "countries", False, "tab-5"),
+        ('tab5-input-industry', "industries", False, "tab-5")):
+    register_option_search(proc_dropdown, proc_kind, proc_grouped, proc_tab)
+
 @app.callback(
     Output('secondary-dependencies-container', 'style'),
     Input('graph-tabs', 'value')
 )
+@instrument("toggle_visibility")
 def toggle_visibility(selected_tab):
-    return {"display": "none"} if selected_tab in ['tab-2', 'tab-3', 'tab-4'] else CARD_STYLE
+    return {"display": "none"} if selected_tab in ['tab-2', 'tab-3', 'tab-4', 'tab-5', 'tab-6', 'tab-7', 'tab-8', 'tab-9'] else CARD_STYLE
 
 @app.callback(
     Output('thickness-container', 'style'),
     Input('graph-tabs', 'value')
 )
+@instrument("toggle_visibility2")
 def toggle_visibility2(selected_tab):
-    return {"display": "none"} if selected_tab in ['tab-2', 'tab-3', 'tab-4'] else CARD_STYLE
+    return {"display": "none"} if selected_tab in ['tab-2', 'tab-3', 'tab-4', 'tab-5', 'tab-6', 'tab-7', 'tab-8', 'tab-9'] else CARD_STYLE
 
 @app.callback(
     Output('top-dependencies-container', 'style'),
     Input('graph-tabs', 'value')
 )
+@instrument("toggle_visibility3")
 def toggle_visibility3(selected_tab):
-    if selected_tab in ['tab-2', 'tab-3', 'tab-4']:
+    if selected_tab in ['tab-2', 'tab-3', 'tab-4', 'tab-5', 'tab-6', 'tab-7', 'tab-8', 'tab-9']:
         return {"display": "none"}
     else:
         return CARD_STYLE
@@ -182,7 +614,8 @@ def toggle_visibility3(selected_tab):
     Output('selected-industry-container', 'style'),
     Input('graph-tabs', 'value')
 )
-def toggle_visibility3(selected_tab):
+@instrument("toggle_visibility4")
+def toggle_visibility4(selected_tab):
     if selected_tab in ['tab-4']:
         return {"display": "none"}
     else:
@@ -193,18 +626,15 @@ def toggle_visibility3(selected_tab):
     [Input('country-dropdown', 'value'),
      Input('industry-dropdown', 'value'),
      Input("top-dependencies", "value"),
-     Input("tab2-dropdown-selection", "value")]
+     Input("tab2-dropdown-selection", "value"),
+     Input('year-dropdown', 'value'),
+     Input('grouping-dropdown', 'value')]
 )
-def update_summary(selected_country, selected_output_industry, selected_deps, selected_input_industry):
+@instrument("update_summary")
+def update_summary(selected_country, selected_output_industry, selected_deps, selected_input_industry, year,
+                   grouping):
     try:
-        return create_io_summary(
-            data["data"],
-            selected_country,
-            selected_output_industry,
-            selected_input_industry,
-            data["metadata"],
-            data["all_countries"]
-        )
+        return summary_figure(selected_country, selected_output_industry, selected_input_industry, year, grouping)
     except Exception:
         fig = go.Figure()
         fig.add_annotation(
@@ -220,20 +650,28 @@ def update_summary(selected_country, selected_output_industry, selected_deps, se
      Input('industry-dropdown', 'value'),
      Input("top-dependencies", "value"),
      Input("secondary-dependencies", "value"),
-     Input("use-thickness", "value")]
+     Input("use-thickness", "value"),
+     Input('year-dropdown', 'value'),
+     Input('grouping-dropdown', 'value'),
+     Input('map-mode', 'value'),
+     Input('map-flow-industry', 'value'),
+     Input('map-flow-count', 'value')]
 )
-def update_map(selected_country, selected_industry, selected_deps, selected_sec_deps, use_thickness):
+@instrument("update_map")
+def update_map(selected_country, selected_industry, selected_deps, selected_sec_deps, use_thickness, year,
+               grouping, map_mode="importer", flow_industry="all", flow_count=100):
     try:
-        return create_io_map(
-            data["data"],
-            selected_country,
-            selected_industry,
-            selected_deps,
-            data["metadata"],
-            data["all_countries"],
-            selected_sec_deps=selected_sec_deps,
-            use_thickness=use_thickness
-        )
+        if map_mode in ("sectors", "countries"):
+            # Read from the flow index rather than the table, for every importer at once
+            industry = selected_industry if flow_industry == "selected" else None
+            return global_flows_figure(map_mode, industry, flow_count, use_thickness, year, grouping)
+        if triggered_only("use-thickness.value"):
+            patch = map_thickness_patch(selected_country, selected_industry, selected_deps, selected_sec_deps,
+                                        use_thickness, year, grouping)
+            if patch is not None:
+                return patch
+        return map_figure(selected_country, selected_industry, selected_deps, selected_sec_deps, use_thickness,
+                          year, grouping)
     except Exception:
         fig = go.Figure()
         fig.add_annotation(
@@ -252,6 +690,7 @@ def update_map(selected_country, selected_industry, selected_deps, selected_sec_
      dash.dependencies.State("risk-weights-store", "data")],
     prevent_initial_call=True
 )
+@instrument("update_risk_weights")
 def update_risk_weights(n_clicks, country, weight, current_data):
     if current_data is None:
         current_data = {}
@@ -264,31 +703,199 @@ def update_risk_weights(n_clicks, country, weight, current_data):
     [Input("risk-weights-store", "data"),
      Input('country-dropdown', 'value'),
      Input('industry-dropdown', 'value'),
-     Input("top-dependencies", "value")]
+     Input("top-dependencies", "value"),
+     Input('year-dropdown', 'value'),
+     Input('grouping-dropdown', 'value')]
 )
-def update_risk(risk_weights_data, selected_country, selected_industry, selected_deps):
-    return update_risk_chart(
-        data["data"], 
-        risk_weights_data, 
-        selected_country, 
-        selected_industry,
-        data["metadata"],
-        data["all_countries"])
+@instrument("update_risk")
+def update_risk(risk_weights_data, selected_country, selected_industry, selected_deps, year, grouping):
+    if triggered_only("risk-weights-store.data"):
+        return risk_weights_patch(risk_weights_data, selected_country, selected_industry, year, grouping)
+    return risk_figure(risk_weights_data, selected_country, selected_industry, year, grouping)
 
 @app.callback(
     Output('io-heatmap', 'figure'),
     [Input('country-dropdown', 'value'),
      Input('tab4-dropdown-selection', 'value'),
-     Input("tab4-radio-log", "value")]
+     Input("tab4-radio-log", "value"),
+     Input('year-dropdown', 'value'),
+     Input('grouping-dropdown', 'value')]
+)
+@instrument("update_heatmap")
+def update_heatmap(selected_country, reference_country, use_log, year, grouping):
+    if triggered_only("tab4-radio-log.value"):
+        return heatmap_scale_patch(selected_country, reference_country, use_log, year, grouping)
+    return heatmap_figure(selected_country, reference_country, use_log, year, grouping)
+
+
+def error_figure(text):
+    fig = go.Figure()
+    fig.add_annotation(
+        text=text,
+        xref="paper", yref="paper", x=0.5, y=0.5,
+        showarrow=False, font=dict(size=20, color="red")
+    )
+    return fig
+
+
+@app.callback(
+    Output('io-sankey', 'figure'),
+    [Input('country-dropdown', 'value'),
+     Input('industry-dropdown', 'value'),
+     Input('tab8-depth', 'value'),
+     Input('tab8-min-share', 'value'),
+     Input('tab8-node-budget', 'value'),
+     Input('year-dropdown', 'value'),
+     Input('graph-tabs', 'value'),
+     Input('grouping-dropdown', 'value')]
+)
+@instrument("update_sankey")
+def update_sankey(selected_country, selected_industry, depth, min_share, node_budget, year, selected_tab, grouping):
+    if selected_tab != "tab-8":
+        return dash.no_update
+    try:
+        return sankey_figure(selected_country, selected_industry, depth, min_share, node_budget, year, grouping)
+    except Exception:
+        return error_figure(f"Error: Not able to find {selected_industry} for {selected_country}")
+
+
+@app.callback(
+    Output('io-compare', 'figure'),
+    [Input('risk-weights-store', 'data'),
+     Input('country-dropdown', 'value'),
+     Input('industry-dropdown', 'value'),
+     Input('tab9-country', 'value'),
+     Input('tab9-industry', 'value'),
+     Input('year-dropdown', 'value'),
+     Input('graph-tabs', 'value'),
+     Input('grouping-dropdown', 'value')]
+)
+@instrument("update_comparison")
+def update_comparison(risk_weights_data, selected_country, selected_industry, compare_country, compare_industry,
+                      year, selected_tab, grouping):
+    if selected_tab != "tab-9":
+        return dash.no_update
+    second = (compare_country, compare_industry or selected_industry)
+    try:
+        return compare_figure(risk_weights_data, (selected_country, selected_industry), second, year, grouping)
+    except Exception:
+        return error_figure(f"Error: Not able to find {selected_industry} for {selected_country} or {second[0]}")
+
+
+@app.callback(
+    Output('io-value-added', 'figure'),
+    [Input('country-dropdown', 'value'),
+     Input('industry-dropdown', 'value'),
+     Input('year-dropdown', 'value'),
+     Input('graph-tabs', 'value')]
+)
+@instrument("update_value_added")
+def update_value_added(selected_country, selected_industry, year, selected_tab):
+    # The decomposition is only opened (or built) once the tab is shown
+    if selected_tab != "tab-6":
+        return dash.no_update
+    try:
+        return value_added_figure(selected_country, selected_industry, year)
+    except Exception:
+        return error_figure(f"Error: Not able to find {selected_industry} for {selected_country}")
+
+
+@app.callback(
+    Output('rankings-table', 'data'),
+    Output('rankings-table', 'page_count'),
+    Output('rankings-status', 'children'),
+    [Input('rankings-table', 'page_current'),
+     Input('rankings-table', 'page_size'),
+     Input('rankings-table', 'sort_by'),
+     Input('tab7-scope', 'value'),
+     Input('country-dropdown', 'value'),
+     Input('year-dropdown', 'value'),
+     Input('graph-tabs', 'value')]
 )
-def update_heatmap(selected_country, reference_country, use_log):
-    return create_heatmap(
-        data["data"],
-        data["metadata"],
-        selected_country,
-        reference_country,
-        use_log
+@instrument("update_rankings")
+def update_rankings(page_current, page_size, sort_by, scope, selected_country, year, selected_tab):
+    # Only the visible page is sent; sorting and paging happen here
+    from process.rankings import missing_measures, ranking_page, sector_metrics
+    if selected_tab != "tab-7":
+        return dash.no_update, dash.no_update, dash.no_update
+    data = get_data(year)
+    rows, page_count = ranking_page(
+        sector_metrics(data),
+        sort_by,
+        page_current or 0,
+        page_size,
+        country=selected_country if scope == "importer" else None
     )
+    missing = missing_measures(data)
+    status = f"The {' and '.join(missing)} measures are not built for this table yet; they appear once " \
+             f"python cli.py precompute has run for it." if missing else None
+    return rows, page_count, status
+
+
+@app.callback(
+    Output('io-trends', 'figure'),
+    [Input('country-dropdown', 'value'),
+     Input('industry-dropdown', 'value'),
+     Input('tab5-input-industry', 'value'),
+     Input('graph-tabs', 'value')]
+)
+@instrument("update_trends")
+def update_trends(selected_country, selected_industry, input_industry, selected_tab):
+    # The year cube is only opened (or built, in the background) once the tab is shown
+    if selected_tab != "tab-5":
+        return dash.no_update
+    try:
+        return trends_figure(selected_country, selected_industry, input_industry)
+    except Exception:
+        return error_figure(f"Error: Not able to find {selected_industry} for {selected_country}")
+
+
+@app.callback(
+    Output('io-change-heatmap', 'figure'),
+    [Input('country-dropdown', 'value'),
+     Input('tab5-reference-country', 'value'),
+     Input('tab5-year-from', 'value'),
+     Input('tab5-year-to', 'value'),
+     Input('tab5-change-mode', 'value'),
+     Input('graph-tabs', 'value')]
+)
+@instrument("update_change_heatmap")
+def update_change_heatmap(selected_country, reference_country, year_from, year_to, mode, selected_tab):
+    if selected_tab != "tab-5":
+        return dash.no_update
+    try:
+        return change_heatmap_figure(selected_country, reference_country, year_from, year_to, mode)
+    except Exception:
+        return error_figure(f"Error: Not able to compare {year_from} and {year_to}")
+
+
+@app.callback(
+    Output("prefetch-store", "data"),
+    [Input('graph-tabs', 'value'),
+     Input('country-dropdown', 'value'),
+     Input('industry-dropdown', 'value'),
+     Input("top-dependencies", "value"),
+     Input("secondary-dependencies", "value"),
+     Input("use-thickness", "value"),
+     Input("risk-weights-store", "data"),
+     Input('tab4-dropdown-selection', 'value'),
+     Input("tab4-radio-log", "value"),
+     Input('year-dropdown', 'value'),
+     Input('grouping-dropdown', 'value')],
+    [dash.dependencies.State('session-id', 'data')]
+)
+@instrument("schedule_prefetch")
+def schedule_prefetch(selected_tab, selected_country, selected_industry, selected_deps,
+                      selected_sec_deps, use_thickness, risk_weights_data, reference_country, use_log, year,
+                      grouping, session):
+    if not selected_country or not selected_industry:
+        return dash.no_update
+    queued = prefetcher.schedule(prefetch_tasks(
+        selected_tab, selected_country, selected_industry, selected_deps,
+        selected_sec_deps, use_thickness, risk_weights_data, reference_country, use_log, year, grouping,
+        session
+    ), session)
+    return {"queued": queued}
 
 # -----------------------
 # Run
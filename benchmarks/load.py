@@ -0,0 +1,436 @@
+"""
+Load test: replay Dash callback sequences from many concurrent sessions.
+
+    python -m benchmarks.load [--clients 20] [--duration 30] [--think 0.5]
+                              [--config processes=1,threads=8]
+                              [--config processes=4,threads=2,cache=off]
+                              [--url http://127.0.0.1:8050] [--json results.json]
+
+Each client is an asyncio task acting as one browser session: it loads the
+page, then repeats country change -> industry change -> tab switch -> risk
+weight update -> line thickness toggle -> heatmap scale toggle. The last
+three are answered with partial figure updates, so their mean response
+size shows what those save. As in the Dash renderer, an action fires every callback
+whose inputs changed, concurrently, and the outputs it gets back trigger
+the callbacks that depend on them. The callback graph and initial values
+are read from the server's ``/_dash-dependencies`` and ``/_dash-layout``,
+so the sequences follow the app as it changes.
+
+Without ``--url``, a server is started for every ``--config`` through
+``benchmarks.serve`` on a free port (``cache=off`` sets ``IO_CACHE=off``)
+and the configurations are compared side by side.
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from json import dump, dumps, loads
+from urllib.error import URLError
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+DEFAULT_CONFIG = "processes=1,threads=8,cache=on"
+CALLBACK_PATH = "/_dash-update-component"
+# Rounds of output -> input propagation followed per action
+MAX_CHAIN_DEPTH = 10
+RISK_WEIGHTS = [0.5, 1.5, 2.0, 3.0]
+
+
+# -----------------------
+# HTTP
+# -----------------------
+def _dechunk(body):
+    decoded, pos = bytearray(), 0
+    while True:
+        line_end = body.index(b"\r\n", pos)
+        size = int(body[pos:line_end].split(b";")[0], 16)
+        if size == 0:
+            return bytes(decoded)
+        decoded += body[line_end + 2:line_end + 2 + size]
+        pos = line_end + 2 + size + 2
+
+
+async def http_request(host, port, method, path, payload=None, timeout=120):
+    """Send one request on a fresh connection; return (status, body bytes)."""
+    body = b"" if payload is None else dumps(payload).encode()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, content = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if b"transfer-encoding: chunked" in head.lower():
+        content = _dechunk(content)
+    return status, content
+
+
+# -----------------------
+# Callback graph
+# -----------------------
+def _split_outputs(output):
+    """'..a.b...c.d..' (multi-output) or 'a.b' -> [('a', 'b'), ('c', 'd')]."""
+    parts = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [tuple(part.rsplit(".", 1)) for part in parts]
+
+
+class Callback:
+    def __init__(self, spec):
+        self.output = spec["output"]
+        self.outputs = _split_outputs(self.output)
+        self.multi = self.output.startswith("..")
+        self.inputs = [(item["id"], item["property"]) for item in spec["inputs"]]
+        self.state = [(item["id"], item["property"]) for item in spec["state"]]
+        self.initial_call = not spec.get("prevent_initial_call", False)
+        self.label = ",".join(f"{cid}.{prop}" for cid, prop in self.outputs)
+
+    def payload(self, values, changed):
+        def props(pairs):
+            return [{"id": cid, "property": prop, "value": values.get((cid, prop))} for cid, prop in pairs]
+        outputs = [{"id": cid, "property": prop} for cid, prop in self.outputs]
+        return {
+            "output": self.output,
+            "outputs": outputs if self.multi else outputs[0],
+            "inputs": props(self.inputs),
+            "state": props(self.state),
+            "changedPropIds": [f"{cid}.{prop}" for cid, prop in self.inputs if (cid, prop) in changed]
+        }
+
+
+def _walk_layout(node, found):
+    if isinstance(node, list):
+        for child in node:
+            _walk_layout(child, found)
+    elif isinstance(node, dict) and "props" in node:
+        props = node["props"]
+        if isinstance(props.get("id"), str):
+            found[props["id"]] = props
+        for value in props.values():
+            if isinstance(value, (list, dict)):
+                _walk_layout(value, found)
+
+
+class AppSpec:
+    """Callbacks, initial property values and choices read from a running app."""
+
+    def __init__(self, dependencies, layout):
+        self.callbacks = [Callback(spec) for spec in dependencies if not spec.get("clientside_function")]
+        components = {}
+        _walk_layout(layout, components)
+        self.initial = {}
+        for callback in self.callbacks:
+            for cid, prop in callback.inputs + callback.state:
+                self.initial[(cid, prop)] = components.get(cid, {}).get(prop)
+
+        def option_values(cid):
+            return [option["value"] for option in components.get(cid, {}).get("options", [])]
+        self.countries = option_values("country-dropdown")
+        self.industries = option_values("industry-dropdown")
+        self.risk_countries = option_values("risk-country-input") or self.countries
+        self.tabs = [child["props"]["value"] for child in components.get("graph-tabs", {}).get("children", [])]
+
+    def triggered_by(self, changed, initial=False):
+        return [
+            callback for callback in self.callbacks
+            if any(pair in changed for pair in callback.inputs) and (callback.initial_call or not initial)
+        ]
+
+    @classmethod
+    async def fetch(cls, host, port):
+        responses = []
+        for path in ("/_dash-dependencies", "/_dash-layout"):
+            status, body = await http_request(host, port, "GET", path)
+            if status != 200:
+                raise RuntimeError(f"GET {path} returned {status}")
+            responses.append(loads(body))
+        return cls(*responses)
+
+
+# -----------------------
+# Sessions
+# -----------------------
+class Session:
+    """One simulated browser tab: its property values and recorded timings."""
+
+    def __init__(self, spec, host, port, rng, samples, actions):
+        self.spec = spec
+        self.host = host
+        self.port = port
+        self.rng = rng
+        self.values = dict(spec.initial)
+        if ("session-id", "data") in self.values:
+            # The layout was fetched once for all clients; each simulated tab gets its own session id
+            self.values[("session-id", "data")] = f"load-{rng.getrandbits(64):016x}"
+        self.samples = samples
+        self.actions = actions
+
+    async def call(self, callback, changed):
+        start = time.perf_counter()
+        try:
+            status, body = await http_request(self.host, self.port, "POST", CALLBACK_PATH,
+                                              callback.payload(self.values, changed))
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            status, body = 0, b""
+        self.samples.append((callback.label, time.perf_counter() - start, status, len(body)))
+        if status != 200:
+            return set()
+        updated = set()
+        for cid, props in loads(body).get("response", {}).items():
+            for prop, value in props.items():
+                if (cid, prop) in self.values:
+                    self.values[(cid, prop)] = value
+                updated.add((cid, prop))
+        return updated
+
+    async def dispatch(self, name, changed, initial=False):
+        """
+        Fire the callbacks triggered by ``changed`` and follow their outputs.
+        A callback waits while another triggered callback still has to
+        produce one of its inputs, as the Dash renderer does.
+        """
+        start = time.perf_counter()
+        pending = self.spec.triggered_by(changed, initial)
+        seen = set(changed)
+        for _ in range(MAX_CHAIN_DEPTH):
+            if not pending:
+                break
+            ready = [
+                callback for callback in pending
+                if not any(pair in other.outputs for other in pending if other is not callback
+                           for pair in callback.inputs)
+            ] or pending
+            results = await asyncio.gather(*(self.call(callback, seen) for callback in ready))
+            changed = set().union(*results)
+            seen |= changed
+            pending = [callback for callback in pending if callback not in ready]
+            pending += [callback for callback in self.spec.triggered_by(changed) if callback not in pending]
+        self.actions.append((name, time.perf_counter() - start))
+
+    def change_country(self):
+        self.values[("country-dropdown", "value")] = self.rng.choice(self.spec.countries)
+        return {("country-dropdown", "value")}
+
+    def change_industry(self):
+        self.values[("industry-dropdown", "value")] = self.rng.choice(self.spec.industries)
+        return {("industry-dropdown", "value")}
+
+    def switch_tab(self):
+        current = self.values.get(("graph-tabs", "value"))
+        self.values[("graph-tabs", "value")] = self.rng.choice(
+            [tab for tab in self.spec.tabs if tab != current] or self.spec.tabs)
+        return {("graph-tabs", "value")}
+
+    def update_risk_weight(self):
+        self.values[("risk-country-input", "value")] = self.rng.choice(self.spec.risk_countries)
+        self.values[("risk-weight-input", "value")] = self.rng.choice(RISK_WEIGHTS)
+        clicks = self.values.get(("update-risk-weight", "n_clicks")) or 0
+        self.values[("update-risk-weight", "n_clicks")] = clicks + 1
+        return {("update-risk-weight", "n_clicks")}
+
+    def toggle_thickness(self):
+        self.values[("use-thickness", "value")] = not self.values.get(("use-thickness", "value"))
+        return {("use-thickness", "value")}
+
+    def toggle_log_scale(self):
+        current = self.values.get(("tab4-radio-log", "value"))
+        self.values[("tab4-radio-log", "value")] = "linear" if current == "log" else "log"
+        return {("tab4-radio-log", "value")}
+
+    SEQUENCE = [
+        ("country", change_country),
+        ("industry", change_industry),
+        ("tab", switch_tab),
+        ("risk_weight", update_risk_weight),
+        ("thickness", toggle_thickness),
+        ("log_scale", toggle_log_scale),
+    ]
+
+
+async def run_client(spec, host, port, deadline, think, ramp, seed, samples, actions):
+    rng = random.Random(seed)
+    await asyncio.sleep(rng.uniform(0, ramp))
+    session = Session(spec, host, port, rng, samples, actions)
+    await session.dispatch("page_load", set(spec.initial), initial=True)
+    while time.monotonic() < deadline:
+        for name, action in Session.SEQUENCE:
+            if time.monotonic() >= deadline:
+                break
+            await session.dispatch(name, action(session))
+            if think:
+                await asyncio.sleep(rng.expovariate(1 / think))
+
+
+async def run_load(url, clients=20, duration=30.0, think=0.5, ramp=2.0, seed=0):
+    """Drive ``clients`` sessions against ``url`` for ``duration`` seconds."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    spec = await AppSpec.fetch(host, port)
+    samples, actions = [], []
+    start = time.monotonic()
+    await asyncio.gather(*(
+        run_client(spec, host, port, start + ramp + duration, think, ramp, seed + pos, samples, actions)
+        for pos in range(clients)
+    ))
+    return summarise(samples, actions, time.monotonic() - start)
+
+
+# -----------------------
+# Reporting
+# -----------------------
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def _latency(values):
+    ordered = sorted(values)
+    return {f"p{q}": percentile(ordered, q) for q in (50, 95, 99)}
+
+
+def summarise(samples, actions, elapsed):
+    per_callback = {}
+    for label, seconds, status, size in samples:
+        per_callback.setdefault(label, []).append((seconds, status, size))
+    callbacks = {}
+    for label, rows in sorted(per_callback.items()):
+        callbacks[label] = {
+            "count": len(rows),
+            "errors": sum(1 for _, status, _ in rows if status not in (200, 204)),
+            "mean_bytes": sum(size for _, _, size in rows) / len(rows),
+            **_latency([seconds for seconds, _, _ in rows])
+        }
+    per_action = {}
+    for name, seconds in actions:
+        per_action.setdefault(name, []).append(seconds)
+    return {
+        "seconds": elapsed,
+        "requests": len(samples),
+        "errors": sum(entry["errors"] for entry in callbacks.values()),
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "latency": _latency([seconds for _, seconds, _, _ in samples]),
+        "callbacks": callbacks,
+        "actions": {name: {"count": len(values), **_latency(values)} for name, values in sorted(per_action.items())}
+    }
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:9.1f}"
+
+
+def print_report(name, summary):
+    print(f"\n== {name}: {summary['requests']} requests in {summary['seconds']:.1f} s, "
+          f"{summary['throughput']:.1f} req/s, {summary['errors']} errors")
+    print(f"{'callback':<50} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'kB':>8}")
+    for label, entry in summary["callbacks"].items():
+        print(f"{label[:50]:<50} {entry['count']:>6} {entry['errors']:>4} {_ms(entry['p50'])} "
+              f"{_ms(entry['p95'])} {_ms(entry['p99'])} {entry['mean_bytes'] / 1000:8.1f}")
+    for name, entry in summary["actions"].items():
+        print(f"{'action: ' + name:<50} {entry['count']:>6} {'':>4} {_ms(entry['p50'])} "
+              f"{_ms(entry['p95'])} {_ms(entry['p99'])}")
+
+
+def print_comparison(summaries):
+    print(f"\n{'config':<40} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, summary in summaries.items():
+        latency = summary["latency"]
+        print(f"{name:<40} {summary['throughput']:8.1f} {summary['errors']:>7} "
+              f"{_ms(latency['p50'])} {_ms(latency['p95'])} {_ms(latency['p99'])}")
+
+
+# -----------------------
+# Local servers
+# -----------------------
+def parse_config(text):
+    """'processes=4,threads=2,cache=off' -> dict, with defaults filled in."""
+    config = {"processes": 1, "threads": 8, "cache": "on"}
+    for item in filter(None, text.split(",")):
+        key, _, value = item.partition("=")
+        if key not in config:
+            raise ValueError(f"Unknown config key {key!r} in {text!r}")
+        config[key] = value if key == "cache" else int(value)
+    return config
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@contextmanager
+def local_server(config, startup_timeout=600):
+    """Start ``benchmarks.serve`` with ``config`` and yield its URL."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serve", "--port", str(port),
+         "--processes", str(config["processes"]), "--threads", str(config["threads"])],
+        env=dict(os.environ, IO_CACHE=config["cache"]),
+        start_new_session=True
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with {process.returncode} during startup")
+            try:
+                with urlopen(url + "/_dash-layout", timeout=5):
+                    break
+            except (URLError, OSError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Server did not come up within {startup_timeout} s")
+                time.sleep(0.5)
+        yield url
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay concurrent Dash sessions against the dashboard")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load after ramp-up")
+    parser.add_argument("--think", type=float, default=0.5, help="Mean pause between actions (s), 0 for none")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Sessions start spread over this many seconds")
+    parser.add_argument("--config", action="append",
+                        help="Server to start: processes=N,threads=N,cache=on|off (repeat to compare)")
+    parser.add_argument("--url", help="Load an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the summaries to this JSON file")
+    args = parser.parse_args(argv)
+
+    def load(url):
+        return asyncio.run(run_load(url, args.clients, args.duration, args.think, args.ramp, args.seed))
+
+    summaries = {}
+    if args.url:
+        summaries[args.url] = load(args.url)
+        print_report(args.url, summaries[args.url])
+    else:
+        for text in args.config or [DEFAULT_CONFIG]:
+            with local_server(parse_config(text)) as url:
+                summaries[text] = load(url)
+            print_report(text, summaries[text])
+        if len(summaries) > 1:
+            print_comparison(summaries)
+
+    if args.json:
+        with open(args.json, "w") as fid:
+            dump(summaries, fid, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmarks for the process package on synthetic ICIO tables.
+
+    python -m benchmarks.run [--scales 5x45 20x45 81x45] [--repeat 3]
+                             [--json results.json] [--compare baseline.json]
+                             [--plot curves.html]
+
+Each scale (``<countries>x<industries>``) is generated once by
+``benchmarks.synthetic`` and reused. Memoisation caches are cleared before
+every timed call so the numbers reflect the real work. ``--compare`` exits
+non-zero when a benchmark's median is slower than the baseline by more
+than ``--threshold``.
+"""
+import argparse
+import warnings
+from contextlib import redirect_stdout
+from io import StringIO
+from json import dump, load
+from os.path import dirname, join
+from statistics import median
+from tempfile import gettempdir
+from time import perf_counter
+
+from process import COUNTRY_COORDS
+from process.cluster import trade_pattern_matrix
+from process.data import load_data
+from process.groups import aggregate_data, grouped_cache, load_groupings
+from process.heatmap import create_heatmap
+from process.ingest import ingest_table
+from process.map import create_io_map
+from process.risk import update_risk_chart
+from process.summary import create_io_summary, get_input_industry_options
+from process.utils import inputs_cache, obtain_inputs
+
+from benchmarks.synthetic import generate_table, parse_scale
+
+DEFAULT_SCALES = ["5x45", "20x45", "81x45"]
+DATA_DIR = join(gettempdir(), "io-dashboard-bench")
+# trade_pattern_matrix updates one cell per (row, column) pair in Python
+CLUSTER_MAX_CELLS = 100_000
+
+
+def register_coordinates(country_info):
+    """Give synthetic countries map coordinates so every flow gets drawn."""
+    for row in country_info.itertuples():
+        COUNTRY_COORDS.setdefault(row.Code, [row.Latitude, row.Longitude])
+
+
+def build_cases(data, paths):
+    df, metadata, country_info = data["data"], data["metadata"], data["all_countries"]
+    country = country_info["Code"].iloc[1]
+    industry = metadata["Code"].iloc[0]
+    reference = country_info["Code"].iloc[0]
+    options = get_input_industry_options(df, metadata, country, industry)
+    input_industry = options[0]["value"] if options else None
+
+    cases = {
+        "load_data": lambda: load_data(use_precomputed=False, **paths),
+        "ingest_table": lambda: ingest_table(paths["table_path"], join(dirname(paths["table_path"]), "ingest"),
+                                             "bench", countrycode_path=paths["countrycode_path"]),
+        "obtain_inputs[filter]": lambda: obtain_inputs(df, industry, 10, selected_country=country),
+        "obtain_inputs[all]": lambda: obtain_inputs(df, industry, 50, selected_country=country, run_filter=False),
+    }
+    for sec_deps in (False, True):
+        for thickness in (False, True):
+            cases[f"create_io_map[sec={sec_deps},thick={thickness}]"] = (
+                lambda sec_deps=sec_deps, thickness=thickness: create_io_map(
+                    df, country, industry, 10, metadata, country_info,
+                    selected_sec_deps=sec_deps, use_thickness=thickness)
+            )
+    cases["create_io_summary"] = lambda: create_io_summary(
+        df, country, industry, input_industry, metadata, country_info)
+    cases["update_risk_chart"] = lambda: update_risk_chart(df, None, country, industry, metadata, country_info)
+    cases["create_heatmap"] = lambda: create_heatmap(df, metadata, country, reference, "log")
+    for grouping in ("regions", "regions-sectors"):
+        if grouping in load_groupings():
+            cases[f"aggregate_data[{grouping}]"] = lambda grouping=grouping: aggregate_data(data, grouping)
+
+    industry_cols = [f"{c}_{i}" for c in country_info["Code"] for i in metadata["Code"]]
+    matrix = df.loc[df.index.intersection(industry_cols), df.columns.intersection(industry_cols)]
+    if matrix.size <= CLUSTER_MAX_CELLS:
+        cases["trade_pattern_matrix"] = lambda: trade_pattern_matrix(matrix, verbose=False)
+    return cases
+
+
+def time_case(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        inputs_cache.clear()
+        grouped_cache.clear()
+        start = perf_counter()
+        with redirect_stdout(StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            func()
+        timings.append(perf_counter() - start)
+    return {"median": median(timings), "min": min(timings), "runs": repeat}
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=3, data_dir=DATA_DIR, only=None, progress=print):
+    """Return ``{scale: {"sectors": n, "cases": {name: timing}}}``."""
+    results = {}
+    for scale in scales:
+        n_countries, n_industries = parse_scale(scale)
+        paths = generate_table(join(data_dir, scale), scale)
+        data = load_data(use_precomputed=False, **paths)
+        register_coordinates(data["all_countries"])
+
+        cases = build_cases(data, paths)
+        results[scale] = {"sectors": n_countries * n_industries, "cases": {}}
+        for name, func in cases.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            try:
+                timing = time_case(func, repeat)
+            except Exception as exc:
+                progress(f"{scale:>9} {name:<40} failed: {exc!r}")
+                continue
+            results[scale]["cases"][name] = timing
+            progress(f"{scale:>9} {name:<40} median {timing['median'] * 1000:10.1f} ms"
+                     f"   min {timing['min'] * 1000:10.1f} ms")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """List (scale, case, current, baseline) where the median regressed beyond ``threshold``."""
+    regressions = []
+    for scale, result in results.items():
+        for name, timing in result["cases"].items():
+            previous = baseline.get(scale, {}).get("cases", {}).get(name)
+            if previous and timing["median"] > previous["median"] * threshold:
+                regressions.append((scale, name, timing["median"], previous["median"]))
+    return regressions
+
+
+def plot_scaling(results, path):
+    """Write median time against table size (sectors) per benchmark, log-log."""
+    import plotly.graph_objects as go
+
+    names = sorted({name for result in results.values() for name in result["cases"]})
+    fig = go.Figure()
+    for name in names:
+        points = sorted(
+            (result["sectors"], result["cases"][name]["median"])
+            for result in results.values() if name in result["cases"]
+        )
+        fig.add_trace(go.Scatter(
+            x=[sectors for sectors, _ in points],
+            y=[seconds for _, seconds in points],
+            mode="lines+markers",
+            name=name
+        ))
+    fig.update_layout(
+        title="Benchmark scaling",
+        xaxis=dict(title="Sectors (countries x industries)", type="log"),
+        yaxis=dict(title="Median seconds", type="log"),
+        template="plotly_white"
+    )
+    fig.write_html(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the process package on synthetic ICIO tables")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, help="<countries>x<industries> scales")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument("--only", nargs="+", help="Run only benchmarks whose name contains one of these")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Where generated tables are cached")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --json run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Allowed slowdown ratio vs baseline")
+    parser.add_argument("--plot", help="Write scaling curves to this HTML file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, args.repeat, args.data_dir, args.only)
+
+    if args.json:
+        with open(args.json, "w") as fid:
+            dump(results, fid, indent=2)
+    if args.plot:
+        plot_scaling(results, args.plot)
+    if args.compare:
+        with open(args.compare) as fid:
+            regressions = compare(results, load(fid), args.threshold)
+        for scale, name, current, previous in regressions:
+            print(f"REGRESSION {scale} {name}: {current * 1000:.1f} ms vs {previous * 1000:.1f} ms")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
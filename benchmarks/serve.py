@@ -0,0 +1,82 @@
+"""
+Serve the dashboard in a chosen worker configuration, for load tests.
+
+    python -m benchmarks.serve [--host 127.0.0.1] [--port 8050]
+                               [--processes 4] [--threads 2]
+
+``--processes`` pre-forks workers that accept from one shared listening
+socket, the way gunicorn's workers do; each handles at most ``--threads``
+requests at a time. The app (and so the table) is loaded before forking,
+so workers share its pages copy-on-write but keep their own caches.
+Set ``IO_CACHE=off`` in the environment to serve without memoisation.
+"""
+import argparse
+import os
+import signal
+import socket
+from threading import BoundedSemaphore
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Skip the per-request access log, which would dominate a load test."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def limit_concurrency(wsgi_app, threads):
+    """Let at most ``threads`` requests run inside ``wsgi_app`` at once."""
+    slots = BoundedSemaphore(threads)
+
+    def wrapped(environ, start_response):
+        with slots:
+            # Materialise the body so the slot is held for the whole request
+            return list(wsgi_app(environ, start_response))
+    return wrapped
+
+
+def serve(host="127.0.0.1", port=8050, processes=1, threads=8):
+    from app import data_loader, server
+    # Fork only once the table is loaded, so the workers share it
+    data_loader.get()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+
+    wsgi_app = limit_concurrency(server, threads)
+    workers = []
+    for _ in range(processes - 1):
+        pid = os.fork()
+        if pid == 0:
+            make_server(host, port, wsgi_app, threaded=threads > 1,
+                        request_handler=QuietRequestHandler, fd=listener.fileno()).serve_forever()
+            os._exit(0)
+        workers.append(pid)
+
+    def stop(signum, frame):
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Serving on http://{host}:{port} with {processes} process(es) x {threads} thread(s)", flush=True)
+    make_server(host, port, wsgi_app, threaded=threads > 1,
+                request_handler=QuietRequestHandler, fd=listener.fileno()).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the dashboard for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--processes", type=int, default=1, help="Pre-forked worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent requests per process")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.processes, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Synthetic ICIO-shaped tables for benchmarking without the OECD file.
+
+    python -m benchmarks.synthetic OUTPUT_DIR --scale 81x45 [--seed 0]
+
+A scale is ``<countries>x<industries>``. The first countries and industries
+are taken from ``etc/country_code.csv`` and ``etc/metadata.csv`` so the
+real codes (and their map coordinates) are used where they exist; the rest
+get generated three-letter country codes and ``S<nnn>`` industry codes.
+The CSV has the same layout as the OECD file: a ``V1`` label column,
+intermediate-use columns, six final-demand columns per country and
+``OUT``, with ``TLS``, ``VA`` and ``OUT`` rows at the bottom.
+"""
+import argparse
+from itertools import product
+from os import makedirs
+from os.path import exists, join
+from string import ascii_uppercase
+
+import numpy as np
+import pandas as pd
+
+from process import INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE, INTER_COUNTRY_INPUT_OUTPUT_METADATA
+
+FINAL_DEMAND = ["HFCE", "NPISH", "GGFC", "GFCF", "INVNT", "DPABR"]
+# Share of intermediate cells that are non-zero, roughly as in ICIO
+DENSITY = 0.4
+ROW_CHUNK_SIZE = 500
+
+
+def parse_scale(scale):
+    countries, industries = (int(part) for part in scale.lower().split("x"))
+    return countries, industries
+
+
+def synthetic_codes(n_countries, n_industries, seed=0):
+    """Country and industry metadata frames for the requested scale."""
+    rng = np.random.default_rng(seed)
+    real_countries = pd.read_csv(INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE)
+    real_industries = pd.read_csv(INTER_COUNTRY_INPUT_OUTPUT_METADATA)
+
+    countries = real_countries.head(n_countries)
+    used = set(real_countries["Code"])
+    extra = [code for code in ("".join(letters) for letters in product(ascii_uppercase, repeat=3))
+             if code not in used][:max(n_countries - len(countries), 0)]
+    if extra:
+        countries = pd.concat([countries, pd.DataFrame({
+            "Code": extra,
+            "countries": [f"Synthetic {code}" for code in extra],
+            "Latitude": rng.uniform(-50, 60, len(extra)).round(2),
+            "Longitude": rng.uniform(-170, 170, len(extra)).round(2),
+            "color": [f"#{value:06x}" for value in rng.integers(0, 0xFFFFFF, len(extra))]
+        })], ignore_index=True)
+
+    industries = real_industries.head(n_industries)
+    n_extra = max(n_industries - len(industries), 0)
+    if n_extra:
+        codes = [f"S{pos:03d}" for pos in range(n_extra)]
+        industries = pd.concat([industries, pd.DataFrame({
+            "Code": codes,
+            "Industry": [f"Synthetic industry {code}" for code in codes]
+        })], ignore_index=True)
+    return countries, industries
+
+
+def generate_table(output_dir, scale, seed=0, force=False):
+    """
+    Write ``io_table.csv``, ``metadata.csv`` and ``country_code.csv`` for
+    ``scale`` into ``output_dir`` and return their paths. Rows are written
+    in chunks, so memory stays bounded by one chunk of the matrix.
+    Existing files are reused unless ``force`` is set.
+    """
+    makedirs(output_dir, exist_ok=True)
+    paths = {
+        "table_path": join(output_dir, "io_table.csv"),
+        "metadata_path": join(output_dir, "metadata.csv"),
+        "countrycode_path": join(output_dir, "country_code.csv"),
+    }
+    if not force and all(exists(path) for path in paths.values()):
+        return paths
+
+    n_countries, n_industries = parse_scale(scale)
+    countries, industries = synthetic_codes(n_countries, n_industries, seed)
+    countries.to_csv(paths["countrycode_path"], index=False)
+    industries.to_csv(paths["metadata_path"], index=False)
+
+    labels = [f"{c}_{i}" for c in countries["Code"] for i in industries["Code"]]
+    fd_labels = [f"{c}_{fd}" for c in countries["Code"] for fd in FINAL_DEMAND]
+    columns = labels + fd_labels + ["OUT"]
+    n = len(labels)
+
+    rng = np.random.default_rng(seed)
+    column_totals = np.zeros(len(columns))
+    row_outputs = np.zeros(n)
+    with open(paths["table_path"], "w") as fid:
+        fid.write(",".join(["V1"] + columns) + "\n")
+        for start in range(0, n, ROW_CHUNK_SIZE):
+            stop = min(start + ROW_CHUNK_SIZE, n)
+            inter = rng.gamma(0.3, 50.0, size=(stop - start, n)) * (rng.random((stop - start, n)) < DENSITY)
+            final = rng.gamma(1.0, 400.0, size=(stop - start, len(fd_labels)))
+            output = inter.sum(axis=1) + final.sum(axis=1)
+            row_outputs[start:stop] = output
+            block = np.hstack([inter, final, output[:, None]])
+            column_totals += block.sum(axis=0)
+            pd.DataFrame(block, index=labels[start:stop]).to_csv(fid, header=False, float_format="%.6g")
+
+        # Taxes and value added close each industry's column to its row output
+        outputs = np.zeros(len(columns))
+        outputs[:n] = row_outputs
+        taxes = outputs * 0.05
+        value_added = np.where(np.arange(len(columns)) < n, outputs - column_totals - taxes, 0.0)
+        pd.DataFrame([taxes, value_added, outputs], index=["TLS", "VA", "OUT"]).to_csv(
+            fid, header=False, float_format="%.6g")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic ICIO-shaped table")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--scale", default="81x45", help="<countries>x<industries>, e.g. 81x45 or 200x100")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for name, path in generate_table(args.output, args.scale, args.seed, force=True).items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
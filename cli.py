@@ -1,23 +1,238 @@
+"""
+Command-line tools for the input-output dashboard.
 
+    python cli.py precompute [--workers N] [--output DIR] [--year YEAR] [--year-cube] [--tiva]
+    python cli.py export OUTPUT_DIR [--formats json metrics] [--workers N]
+    python cli.py profiles [ID] [--sort cumulative] [--limit 25]
+    python cli.py memory [--compact] [--top 10] [--json]
+    python cli.py startup [--top 15] [--json]
+    python cli.py ingest [--year YEAR] [--output DIR] [--chunk-mb 64] [--float32] [--force] [--compare]
+    python cli.py extract [SECTOR ...] [--country CTRY] [--year YEAR] [--workers N] [--top 20] [--csv PATH] [--detail]
+"""
+import argparse
 
-from process.data import read_input_output_table
+from process import DEFAULT_YEAR, PRECOMPUTE_DIR, PROFILE_DIR
 
-data = read_input_output_table()
-input_output_table = data["table"].set_index("V1")
 
-all_countries = list(data["countrycode"]["Code"])
-df = input_output_table[[col for col in input_output_table.columns if any(col.startswith(prefix) for prefix in all_countries)]]
-mask = df.index.str.startswith(tuple(all_countries))
-df = df[mask]
-df.index.name = None
+def run_precompute(args):
+    from process.precompute import run_precompute
+    from process.years import table_path
+    run_precompute(directory=args.output, workers=args.workers, table_path=table_path(args.year))
+    if args.year_cube:
+        from process.trends import ensure_year_cube
+        cube = ensure_year_cube(directory=args.output)
+        print(f"year cube: {len(cube.years)} years x {len(cube.columns)} columns ({cube.version})")
+    if args.tiva:
+        from process.data import load_shared_data
+        from process.tiva import ensure_tiva
+        tiva = ensure_tiva(load_shared_data(args.output, table_path(args.year)), table_path(args.year), args.output)
+        print(f"tiva: {len(tiva.labels)} sectors x {len(tiva.countries)} countries ({tiva.version})")
 
-df["NZL_A01_02"]
 
-top_3 = df['NZL_A01_02'].nlargest(3)
+def run_export(args):
+    from process.export import run_export
+    run_export(args.output, formats=args.formats, workers=args.workers)
 
-# Filter rows where index does not start with 'NZL'
-mask = ~df.index.str.startswith('NZL')
-filtered_df = df[mask]
 
-# Get the top 3 rows with the largest values in 'NZL_A01_02'
-top_3 = filtered_df['NZL_A01_02'].nlargest(3)
\ No newline at end of file
+def run_profiles(args):
+    from process.profiling import list_profiles, profile_summary
+    if args.id:
+        profile_summary(args.id, directory=args.dir, sort=args.sort, limit=args.limit)
+        return
+    records = list_profiles(args.dir)
+    if not records:
+        print(f"No profiles in {args.dir}")
+    for record in records:
+        print(f"{record['id']}  {record['seconds'] * 1000:9.1f} ms  {record['inputs']}")
+
+
+def run_memory(args):
+    import tracemalloc
+    if args.trace and not tracemalloc.is_tracing():
+        # Started before the heavy imports, with enough frames to attribute them per package
+        tracemalloc.start(10)
+    from json import dumps
+    from process.data import compact_data, load_data
+    from process.memory import format_report, memory_report
+
+    data = load_data(compact=False)
+    report = memory_report(data, top=args.top, trace=not args.compact)
+    compacted = None
+    if args.compact:
+        data = compact_data(data)
+        compacted = memory_report(data, top=args.top)
+
+    if args.json:
+        print(dumps({"before": report, "after": compacted} if args.compact else report, indent=2))
+    else:
+        print(format_report(report, compacted))
+
+
+def run_startup(args):
+    from json import dumps
+    from process.startup import format_startup, measure_startup
+    report = measure_startup()
+    print(dumps(report, indent=2) if args.json else format_startup(report, args.top))
+
+
+def run_ingest(args):
+    from time import perf_counter
+    import numpy as np
+    from process.artifacts import build_lock, read_manifest, version_dir
+    from process.data import load_data, table_version
+    from process.ingest import ingest_data_cache
+    from process.memory import process_rss, reset_peak_rss
+    from process.years import table_path
+
+    path = table_path(args.year)
+    version = table_version(path)
+    with build_lock(version, args.output):
+        existed = read_manifest(version_dir(version, args.output)) is not None
+        try:
+            manifest = ingest_data_cache(
+                path, version, args.output,
+                replace=args.force,
+                dtype=np.float32 if args.float32 else np.float64,
+                chunk_bytes=args.chunk_mb * 1024 * 1024,
+                progress=print
+            )
+        except FileExistsError as exc:
+            raise SystemExit(f"{exc}. Pass --force to rebuild them, then re-run python cli.py precompute.")
+    if existed:
+        print(f"replaced the artifacts of {version}: re-run python cli.py precompute to rebuild the top-K index, "
+              f"heatmap blocks and figures")
+    stats = manifest["ingest"]
+    print(f"streamed {len(manifest['rows'])} x {len(manifest['columns'])} matrix "
+          f"({stats['matrix_bytes'] / 1e6:.0f} MB, {stats['chunk_rows']} rows per chunk) "
+          f"in {stats['seconds']:.1f}s, peak RSS {stats['peak_rss'] / 1e6:.0f} MB")
+
+    if args.compare:
+        reset_peak_rss()
+        start = perf_counter()
+        load_data(use_precomputed=False, compact=False, table_path=path)
+        print(f"pandas read_csv of the whole table: {perf_counter() - start:.1f}s, "
+              f"peak RSS {process_rss()['peak'] / 1e6:.0f} MB")
+
+
+def run_extract(args):
+    from time import perf_counter
+    from process.data import load_shared_data
+    from process.extraction import affected_sectors, ensure_leontief, run_extractions
+    from process.years import table_path
+
+    start = perf_counter()
+    leontief = ensure_leontief(load_shared_data(args.output, table_path(args.year)), args.output)
+    print(f"leontief inverse: {len(leontief.labels)} sectors ({leontief.version}, {perf_counter() - start:.1f}s)")
+    sectors = args.sectors or None
+    if args.country:
+        sectors = [label for label in leontief.labels if label.split("_", 1)[0] == args.country]
+    try:
+        start = perf_counter()
+        table = run_extractions(leontief, sectors, workers=args.workers, directory=args.output)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    print(f"{len(table)} extractions in {perf_counter() - start:.2f}s")
+    if args.csv:
+        table.to_csv(args.csv, index=False)
+        print(f"impact table written to {args.csv}")
+    print(table.head(args.top).to_string(index=False, float_format=lambda value: f"{value:,.2f}"))
+
+    if args.detail:
+        for sector in table["sector"].head(args.top if sectors is None else len(table)):
+            hit_sectors, hit_countries = affected_sectors(leontief, sector, args.top)
+            print(f"\nExtracting {sector}: hardest-hit sectors")
+            print(hit_sectors.to_string(index=False, float_format=lambda value: f"{value:,.2f}"))
+            print(f"\nExtracting {sector}: loss per country")
+            print(hit_countries.head(args.top).to_string(index=False, float_format=lambda value: f"{value:,.2f}"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Input-output dashboard tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    precompute = subparsers.add_parser(
+        "precompute",
+        help="Build the binary data cache, top-K index, risk cube, heatmap blocks and popular figures"
+    )
+    precompute.add_argument("--workers", type=int, default=None, help="Process pool size (default: all cores)")
+    precompute.add_argument("--output", default=PRECOMPUTE_DIR, help="Artifact directory")
+    precompute.add_argument("--year", type=int, default=DEFAULT_YEAR, help="Table year (default: %(default)s)")
+    precompute.add_argument("--year-cube", action="store_true",
+                            help="Also stack every year's table into the cube behind the Trends tab")
+    precompute.add_argument("--tiva", action="store_true",
+                            help="Also build the value-added decomposition behind the Value added tab")
+    precompute.set_defaults(func=run_precompute)
+
+    export = subparsers.add_parser(
+        "export",
+        help="Export figures and metric tables for every importer-industry pair (resumable)"
+    )
+    export.add_argument("output", help="Output directory (re-use it to resume an interrupted export)")
+    export.add_argument("--formats", nargs="+", default=["json", "metrics"],
+                        choices=["json", "png", "svg", "metrics"], help="What to write for each pair")
+    export.add_argument("--workers", type=int, default=None, help="Process pool size (default: all cores)")
+    export.set_defaults(func=run_export)
+
+    profiles = subparsers.add_parser(
+        "profiles",
+        help="List stored callback profiles, or summarise one of them"
+    )
+    profiles.add_argument("id", nargs="?", help="Profile id (or file name) to summarise")
+    profiles.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, calls, ...)")
+    profiles.add_argument("--limit", type=int, default=25, help="Number of functions to show")
+    profiles.add_argument("--dir", default=PROFILE_DIR, help="Profile directory")
+    profiles.set_defaults(func=run_profiles)
+
+    memory = subparsers.add_parser(
+        "memory",
+        help="Report the memory held by the loaded table, its labels and metadata"
+    )
+    memory.add_argument("--compact", action="store_true", help="Also show the footprint after compaction")
+    memory.add_argument("--top", type=int, default=10, help="Packages and allocation sites to list")
+    memory.add_argument("--no-trace", dest="trace", action="store_false", help="Skip tracemalloc")
+    memory.add_argument("--json", action="store_true", help="Print the report as JSON")
+    memory.set_defaults(func=run_memory)
+
+    startup = subparsers.add_parser(
+        "startup",
+        help="Time a cold start of the app: imports per package (-X importtime) and data-load phases"
+    )
+    startup.add_argument("--top", type=int, default=15, help="Packages and imports to list")
+    startup.add_argument("--json", action="store_true", help="Print the report as JSON")
+    startup.set_defaults(func=run_startup)
+
+    ingest = subparsers.add_parser(
+        "ingest",
+        help="Stream a table's CSV in row chunks into the memory-mapped data cache and report peak RSS"
+    )
+    ingest.add_argument("--year", type=int, default=DEFAULT_YEAR, help="Table year (default: %(default)s)")
+    ingest.add_argument("--output", default=PRECOMPUTE_DIR, help="Artifact directory")
+    ingest.add_argument("--chunk-mb", type=int, default=64, help="Approximate size of each parsed chunk")
+    ingest.add_argument("--float32", action="store_true", help="Store the matrix as float32")
+    ingest.add_argument("--force", action="store_true",
+                        help="Replace an existing version, dropping its precomputed artifacts")
+    ingest.add_argument("--compare", action="store_true",
+                        help="Also load the table with a single read_csv and report its peak RSS")
+    ingest.set_defaults(func=run_ingest)
+
+    extract = subparsers.add_parser(
+        "extract",
+        help="Hypothetical extraction: rank sectors by the world output lost without them"
+    )
+    extract.add_argument("sectors", nargs="*", help="Sectors to extract, e.g. USA_C26 (default: every sector)")
+    extract.add_argument("--country", help="Extract every sector of this country instead")
+    extract.add_argument("--year", type=int, default=DEFAULT_YEAR, help="Table year (default: %(default)s)")
+    extract.add_argument("--output", default=PRECOMPUTE_DIR, help="Artifact directory")
+    extract.add_argument("--workers", type=int, default=None, help="Process pool size (default: all cores)")
+    extract.add_argument("--top", type=int, default=20, help="Rows to print")
+    extract.add_argument("--csv", help="Also write the whole ranked impact table to this CSV file")
+    extract.add_argument("--detail", action="store_true",
+                         help="Also print the hardest-hit sectors and countries for each extraction shown")
+    extract.set_defaults(func=run_extract)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,37 @@
 from dash import html, dcc
+from process import DEFAULT_YEAR
 
-def get_sidebar_layout(data, industry_options, LABEL_STYLE, DROPDOWN_STYLE, CARD_STYLE):
+def get_sidebar_layout(country_options, industry_options, LABEL_STYLE, DROPDOWN_STYLE, CARD_STYLE, years=(), groupings=()):
     return html.Div(
         style={"width": "20%", "minWidth": "250px", "marginRight": "20px"},
         children=[
+            html.Div([
+                html.Label("Year:", style=LABEL_STYLE),
+                dcc.Dropdown(
+                    id='year-dropdown',
+                    options=[{"label": str(y), "value": y} for y in years],
+                    value=DEFAULT_YEAR,
+                    clearable=False,
+                    style=DROPDOWN_STYLE
+                )
+            ], style=CARD_STYLE),
+
+            html.Div([
+                html.Label("Grouping:", style=LABEL_STYLE),
+                dcc.Dropdown(
+                    id='grouping-dropdown',
+                    options=list(groupings),
+                    value=None,
+                    placeholder="Countries and industries",
+                    style=DROPDOWN_STYLE
+                )
+            ], style=CARD_STYLE),
+
             html.Div([
                 html.Label("Importer:", style=LABEL_STYLE),
                 dcc.Dropdown(
                     id='country-dropdown',
-                    options=[{"label": c, "value": c} for c in list(data["all_countries"]["Code"])],
+                    options=country_options,
                     value='NZL',
                     style=DROPDOWN_STYLE
                 )
@@ -1,7 +1,28 @@
 from dash import html, dcc
 from dash import dash_table
+from process import FLOW_INDEX_SIZE, RANKING_PAGE_SIZE, SANKEY_DEPTH, SANKEY_MIN_SHARE, SANKEY_NODE_BUDGET
 
-def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE):
+# Columns of the sector ranking table: (id, header, decimals)
+RANKING_COLUMNS = [
+    ("sector", "Sector", None),
+    ("country", "Country", None),
+    ("industry", "Industry", None),
+    ("output", "Output", 1),
+    ("output_multiplier", "Output multiplier", 3),
+    ("backward_linkage", "Backward linkage", 3),
+    ("forward_linkage", "Forward linkage", 3),
+    ("upstreamness", "Upstreamness", 3),
+    ("pagerank", "PageRank", 3),
+    ("eigenvector", "Eigenvector", 3),
+    ("betweenness", "Betweenness (%)", 4),
+]
+
+def selected_options(options, value):
+    """Just the option of ``value``; the rest are searched for once the tab is open (see app.register_option_search)."""
+    return [option for option in options if option["value"] == value]
+
+
+def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE, years=()):
     return html.Div(
         style={"flex": "1"},
         children=[
@@ -14,10 +35,109 @@ def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE):
                         label="Map",
                         value='tab-1',
                         children=[
-                            html.Div(
-                                dcc.Graph(id='io-map', style={"height": "80vh"}),
-                                style=CARD_STYLE
-                            )
+                            html.Div([
+                                html.Div([
+                                    dcc.RadioItems(
+                                        id='map-mode',
+                                        options=[
+                                            {'label': 'Importer inputs', 'value': 'importer'},
+                                            {'label': 'Top sector flows', 'value': 'sectors'},
+                                            {'label': 'Top country flows', 'value': 'countries'}
+                                        ],
+                                        value='importer',
+                                        inline=True,
+                                        inputStyle={"marginRight": "8px", "marginLeft": "12px"},
+                                        labelStyle={"marginRight": "25px"}
+                                    ),
+                                    dcc.RadioItems(
+                                        id='map-flow-industry',
+                                        options=[
+                                            {'label': 'All industries', 'value': 'all'},
+                                            {'label': 'Selected industry only', 'value': 'selected'}
+                                        ],
+                                        value='all',
+                                        inline=True,
+                                        inputStyle={"marginRight": "8px", "marginLeft": "12px"},
+                                        labelStyle={"marginRight": "25px"}
+                                    ),
+                                    dcc.Dropdown(
+                                        id='map-flow-count',
+                                        options=[{"label": f"Top {count}", "value": count}
+                                                 for count in (50, 100, 250, FLOW_INDEX_SIZE)],
+                                        value=100,
+                                        clearable=False,
+                                        style={"width": "120px"}
+                                    ),
+                                ], style={
+                                    "display": "flex",
+                                    "alignItems": "center",
+                                    "flexWrap": "wrap",
+                                    "gap": "20px",
+                                    "marginBottom": "10px"
+                                }),
+                                dcc.Graph(id='io-map', style={"height": "80vh"})
+                            ], style=CARD_STYLE)
+                        ]
+                    ),
+                    dcc.Tab(
+                        label="Supply chain",
+                        value='tab-8',
+                        children=[
+                            html.Div([
+                                html.H3(
+                                    "Upstream Supply Chain",
+                                    style={"marginBottom": "5px"}
+                                ),
+                                html.P(
+                                    "Follows the inputs of the selected importer and industry upstream, tier by tier: "
+                                    "each supplier's inputs are traced in proportion to what it sells along the chain. "
+                                    "Links below the minimum share of the selected industry's inputs are dropped, and "
+                                    "each tier keeps its largest suppliers until the node budget is used.",
+                                    style={"marginBottom": "20px", "color": "#555"}
+                                ),
+                                html.Div([
+                                    html.Div([
+                                        html.Label("Tiers:", style=LABEL_STYLE),
+                                        dcc.Slider(
+                                            id='tab8-depth',
+                                            min=1,
+                                            max=5,
+                                            step=1,
+                                            value=SANKEY_DEPTH,
+                                            marks={tier: str(tier) for tier in range(1, 6)}
+                                        ),
+                                    ], style={"width": "220px"}),
+                                    html.Div([
+                                        html.Label("Minimum share of inputs:", style=LABEL_STYLE),
+                                        dcc.Dropdown(
+                                            id='tab8-min-share',
+                                            options=[{"label": f"{share:.1%}", "value": share}
+                                                     for share in (0.005, 0.01, 0.02, 0.05, 0.1)],
+                                            value=SANKEY_MIN_SHARE,
+                                            clearable=False,
+                                            style={"width": "120px"}
+                                        ),
+                                    ]),
+                                    html.Div([
+                                        html.Label("Node budget:", style=LABEL_STYLE),
+                                        dcc.Dropdown(
+                                            id='tab8-node-budget',
+                                            options=[{"label": str(budget), "value": budget}
+                                                     for budget in (20, 40, 60, 120, 250)],
+                                            value=SANKEY_NODE_BUDGET,
+                                            clearable=False,
+                                            style={"width": "120px"}
+                                        ),
+                                    ]),
+                                ], style={
+                                    "display": "flex",
+                                    "alignItems": "flex-end",
+                                    "flexWrap": "wrap",
+                                    "gap": "30px",
+                                    "marginBottom": "20px"
+                                }),
+                                dcc.Graph(id='io-sankey', style={"height": "75vh"})
+                            ], style=CARD_STYLE)
                         ]
                     ),
                     dcc.Tab(
@@ -61,7 +181,7 @@ def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE):
                                     html.Label("Select Input:", style=LABEL_STYLE),
                                     dcc.Dropdown(
                                         id='tab2-dropdown-selection',
-                                        options=industry_options,
+                                        options=[],
                                         value="A01_02",
                                         style={
                                             "width": "300px",
@@ -80,6 +200,27 @@ def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE):
                             ], style=CARD_STYLE)
                         ]
                     ),
+                    dcc.Tab(
+                        label="Value added",
+                        value='tab-6',
+                        children=[
+                            html.Div([
+                                html.H3(
+                                    "Trade in Value Added",
+                                    style={"marginBottom": "5px"}
+                                ),
+                                html.P(
+                                    "Gross flows count intermediate inputs every time they cross a border. "
+                                    "The bars split the exports of each industry of the selected importer into the "
+                                    "value added at home and abroad; the diamonds show the industry's own value added "
+                                    "that ends up in final demand abroad. The pie shows which countries the value added "
+                                    "embodied in the selected industry's output comes from.",
+                                    style={"marginBottom": "20px", "color": "#555"}
+                                ),
+                                dcc.Graph(id='io-value-added', style={"height": "75vh", "width": "100%"})
+                            ], style=CARD_STYLE)
+                        ]
+                    ),
                     dcc.Tab(
                         label="Risk profile",
                         value='tab-3',
@@ -175,6 +316,54 @@ def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE):
                             ], style=CARD_STYLE)
                         ]
                     ),
+                    dcc.Tab(
+                        label="Compare",
+                        value='tab-9',
+                        children=[
+                            html.Div([
+                                html.H3(
+                                    "Compare Two Importers",
+                                    style={"marginBottom": "5px"}
+                                ),
+                                html.P(
+                                    "Compares the selected importer and industry with a second one: input industry "
+                                    "shares, supplier country shares (each importer's own country counted as "
+                                    "domestic), and the weighted HHI of the Risk tab, using its current weights. "
+                                    "The overlap table shows how much of the two foreign supply bases is shared.",
+                                    style={"marginBottom": "20px", "color": "#555"}
+                                ),
+                                html.Div([
+                                    html.Div([
+                                        html.Label("Compare with country:", style=LABEL_STYLE),
+                                        dcc.Dropdown(
+                                            id='tab9-country',
+                                            options=selected_options(country_options, "AUS"),
+                                            value="AUS",
+                                            clearable=False,
+                                            style={"width": "200px"}
+                                        ),
+                                    ]),
+                                    html.Div([
+                                        html.Label("Compare with industry:", style=LABEL_STYLE),
+                                        dcc.Dropdown(
+                                            id='tab9-industry',
+                                            options=[],
+                                            value=None,
+                                            placeholder="Same industry",
+                                            style={"width": "300px"}
+                                        ),
+                                    ]),
+                                ], style={
+                                    "display": "flex",
+                                    "alignItems": "flex-end",
+                                    "flexWrap": "wrap",
+                                    "gap": "30px",
+                                    "marginBottom": "20px"
+                                }),
+                                dcc.Graph(id='io-compare', style={"height": "85vh"})
+                            ], style=CARD_STYLE)
+                        ]
+                    ),
                     dcc.Tab(
                         label="Heatmap",
                         value='tab-4',
@@ -200,7 +389,7 @@ def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE):
                                         html.Label("Select reference country:", style=LABEL_STYLE),
                                         dcc.Dropdown(
                                             id='tab4-dropdown-selection',
-                                            options=country_options,
+                                            options=selected_options(country_options, "CN1"),
                                             value="CN1",
                                             clearable=False,
                                             style={
@@ -257,9 +446,150 @@ def get_tabs_layout(industry_options, country_options, CARD_STYLE, LABEL_STYLE):
 
                             ], style=CARD_STYLE)
                         ]
-                    )
-
+                    ),
+                    dcc.Tab(
+                        label="Trends",
+                        value='tab-5',
+                        children=[
+                            html.Div([
+                                html.H3(
+                                    "Supplier Shares Over Time",
+                                    style={"marginBottom": "8px"}
+                                ),
+                                html.P(
+                                    "The line chart shows how the source countries of the selected input industry "
+                                    "evolved across all available years for the importer and industry chosen on the left. "
+                                    "The heatmap below shows how each flow from the importer to the reference country "
+                                    "changed between two years, as a difference or a percentage change.",
+                                    style={"marginBottom": "25px", "color": "#555"}
+                                ),
+                                html.Div([
+                                    html.Label("Select Input:", style=LABEL_STYLE),
+                                    dcc.Dropdown(
+                                        id='tab5-input-industry',
+                                        options=selected_options(industry_options, "C20"),
+                                        value="C20",
+                                        clearable=False,
+                                        style={"width": "300px", "marginBottom": "20px"}
+                                    ),
+                                ]),
+                                dcc.Graph(id='io-trends', style={"height": "60vh"}),
 
+                                html.Div([
+                                    html.Div([
+                                        html.Label("Select reference country:", style=LABEL_STYLE),
+                                        dcc.Dropdown(
+                                            id='tab5-reference-country',
+                                            options=selected_options(country_options, "CN1"),
+                                            value="CN1",
+                                            clearable=False,
+                                            style={"width": "200px"}
+                                        ),
+                                    ]),
+                                    html.Div([
+                                        html.Label("From year:", style=LABEL_STYLE),
+                                        dcc.Dropdown(
+                                            id='tab5-year-from',
+                                            options=[{"label": str(y), "value": y} for y in years],
+                                            value=years[0] if years else None,
+                                            clearable=False,
+                                            style={"width": "120px"}
+                                        ),
+                                    ]),
+                                    html.Div([
+                                        html.Label("To year:", style=LABEL_STYLE),
+                                        dcc.Dropdown(
+                                            id='tab5-year-to',
+                                            options=[{"label": str(y), "value": y} for y in years],
+                                            value=years[-1] if years else None,
+                                            clearable=False,
+                                            style={"width": "120px"}
+                                        ),
+                                    ]),
+                                    html.Div([
+                                        html.Label("Change:", style=LABEL_STYLE),
+                                        dcc.RadioItems(
+                                            id='tab5-change-mode',
+                                            options=[
+                                                {'label': 'Difference', 'value': 'delta'},
+                                                {'label': 'Percentage', 'value': 'pct'}
+                                            ],
+                                            value='delta',
+                                            inline=True,
+                                            inputStyle={"marginRight": "8px", "marginLeft": "12px"},
+                                            labelStyle={"marginRight": "25px"}
+                                        )
+                                    ]),
+                                ], style={
+                                    "display": "flex",
+                                    "alignItems": "flex-end",
+                                    "flexWrap": "wrap",
+                                    "gap": "20px",
+                                    "marginTop": "25px",
+                                    "marginBottom": "25px"
+                                }),
+                                dcc.Graph(
+                                    id='io-change-heatmap',
+                                    style={"height": "80vh", "width": "80vh"}
+                                )
+                            ], style=CARD_STYLE)
+                        ]
+                    ),
+                    dcc.Tab(
+                        label="Rankings",
+                        value='tab-7',
+                        children=[
+                            html.Div([
+                                html.H3(
+                                    "Sector Positions in Value Chains",
+                                    style={"marginBottom": "8px"}
+                                ),
+                                html.P(
+                                    "Output multiplier: output needed across all sectors per unit of final demand "
+                                    "for the sector. Backward and forward linkages: the sector's pull on its suppliers "
+                                    "and push to its customers relative to the average sector. Upstreamness: average "
+                                    "number of production stages between the sector and final demand. "
+                                    "PageRank (1 = average sector), eigenvector and betweenness centrality are "
+                                    "measured on the graph of flows worth at least 1% of the buyer's inputs. "
+                                    "Click a column header to sort.",
+                                    style={"marginBottom": "20px", "color": "#555"}
+                                ),
+                                dcc.RadioItems(
+                                    id='tab7-scope',
+                                    options=[
+                                        {'label': 'All sectors', 'value': 'all'},
+                                        {'label': 'Selected importer only', 'value': 'importer'}
+                                    ],
+                                    value='all',
+                                    inline=True,
+                                    inputStyle={"marginRight": "8px", "marginLeft": "12px"},
+                                    labelStyle={"marginRight": "25px"},
+                                    style={"marginBottom": "15px"}
+                                ),
+                                html.Div(id='rankings-status', style={"marginBottom": "10px", "color": "#b35900"}),
+                                dash_table.DataTable(
+                                    id='rankings-table',
+                                    columns=[
+                                        {"name": name, "id": col_id}
+                                        if decimals is None else
+                                        {"name": name, "id": col_id, "type": "numeric",
+                                         "format": dash_table.Format.Format(precision=decimals,
+                                                                            scheme=dash_table.Format.Scheme.fixed)}
+                                        for col_id, name, decimals in RANKING_COLUMNS
+                                    ],
+                                    page_action='custom',
+                                    page_current=0,
+                                    page_size=RANKING_PAGE_SIZE,
+                                    sort_action='custom',
+                                    sort_mode='single',
+                                    sort_by=[{"column_id": "upstreamness", "direction": "desc"}],
+                                    style_cell={"fontFamily": "Arial, sans-serif", "fontSize": "13px",
+                                                "padding": "6px", "textAlign": "left"},
+                                    style_header={"fontWeight": "bold", "backgroundColor": "#f1f3f5"}
+                                )
+                            ], style=CARD_STYLE)
+                        ]
+                    )
                 ]
             )
         ]
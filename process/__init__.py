@@ -1,8 +1,88 @@
+from os import environ
+
 # Obtained from https://www.oecd.org/en/data/datasets/inter-country-input-output-tables.html
-INTER_COUNTRY_INPUT_OUTPUT_TABLES = "etc/2020.csv"
+# One table per year (1995-2020), e.g. etc/2019.csv; DEFAULT_YEAR is shown until another is picked
+INTER_COUNTRY_INPUT_OUTPUT_TABLE_PATTERN = "etc/{year}.csv"
+DEFAULT_YEAR = 2020
+INTER_COUNTRY_INPUT_OUTPUT_TABLES = INTER_COUNTRY_INPUT_OUTPUT_TABLE_PATTERN.format(year=DEFAULT_YEAR)
 INTER_COUNTRY_INPUT_OUTPUT_METADATA = "etc/metadata.csv"
 INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE = "etc/country_code.csv"
 
+# IO_CACHE=off disables memoisation and prefetching, e.g. to load-test the uncached paths
+CACHE_ENABLED = environ.get("IO_CACHE", "on") != "off"
+
+# IO_COMPACT=1 keeps the table as float32 with compact labels and metadata (see process.data.compact_data)
+COMPACT_DATA = environ.get("IO_COMPACT", "0") == "1"
+
+# Seconds a request waits for the background data load before failing
+DATA_LOAD_TIMEOUT = 300
+
+# Bytes of tables for years other than DEFAULT_YEAR kept loaded; least recently used years are dropped beyond it
+YEAR_MEMORY_BUDGET = int(environ.get("IO_YEAR_BUDGET_MB", "1024")) * 1024 * 1024
+
+# Seconds between checks for a changed IO table (hot reload); IO_RELOAD_POLL=0 turns polling off
+RELOAD_POLL_SECONDS = int(environ.get("IO_RELOAD_POLL", "30"))
+
+# Maximum number of (country, industry, deps, filter) extractions kept in memory
+INPUTS_CACHE_SIZE = 512 if CACHE_ENABLED else 0
+
+# Maximum number of rendered figures kept in memory (shared by callbacks and the prefetcher)
+FIGURE_CACHE_SIZE = 256 if CACHE_ENABLED else 0
+
+# Background prefetch budget: worker threads, industries either side of the
+# current one, recently viewed countries, and queued figures per selection
+PREFETCH_MAX_WORKERS = 2
+PREFETCH_NEIGHBOURS = 1
+PREFETCH_RECENT_COUNTRIES = 3
+PREFETCH_MAX_TASKS = 12 if CACHE_ENABLED else 0
+# Browser sessions whose queued prefetches and recently viewed countries are remembered
+PREFETCH_MAX_SESSIONS = 1024
+
+# On-demand callback profiling: dumps are kept in PROFILE_DIR, oldest deleted beyond PROFILE_MAX_DUMPS
+PROFILE_DIR = "etc/profiles"
+PROFILE_MAX_DUMPS = 50
+
+# Offline artifacts written by `python cli.py precompute` and memory-mapped by the web workers
+PRECOMPUTE_DIR = "etc/precompute"
+# Versions of each year's table whose artifacts are kept; older ones are deleted when a new build is published
+PRECOMPUTE_KEEP_VERSIONS = 2
+TOPK_SIZE = 50
+# Approximate bytes of CSV rows parsed at a time by the streaming ingest (process.ingest)
+INGEST_CHUNK_BYTES = 64 * 1024 * 1024
+# Source countries drawn separately in the Trends chart; the rest are summed as "Other"
+TREND_TOP_SUPPLIERS = 8
+# Origin countries drawn separately in the value-added pie; the rest are summed as "Other"
+VA_TOP_ORIGINS = 8
+# Rows per page of the sector ranking table
+RANKING_PAGE_SIZE = 25
+# Inter-sector graph for centrality (process.centrality): a flow is an edge when it is at least this share of the
+# buyer's intermediate inputs; PageRank damping; sampled sources for approximate betweenness
+CENTRALITY_MIN_SHARE = 0.01
+CENTRALITY_DAMPING = 0.85
+CENTRALITY_PIVOTS = 64
+# Upstream supply-chain Sankey (process.sankey): default tiers, smallest link as a share of the selected sector's
+# inputs and most nodes drawn; pruned traversals are cached per selection
+SANKEY_DEPTH = 3
+SANKEY_MIN_SHARE = 0.02
+SANKEY_NODE_BUDGET = 60
+SANKEY_CACHE_SIZE = 64 if CACHE_ENABLED else 0
+# Largest cross-border flows kept per buyer industry, and for all industries, by the flow index (process.flows)
+FLOW_INDEX_SIZE = 500
+# Options a searchable dropdown shows at most (process.search); indexes are kept per (table version, option kind)
+SEARCH_LIMIT = 100
+SEARCH_CACHE_SIZE = 16 if CACHE_ENABLED else 0
+# Region and industry-group definitions (see process.groups); IO_GROUPINGS points at another spec file
+GROUPINGS_PATH = environ.get("IO_GROUPINGS", "etc/groupings.json")
+# Aggregated tables kept per (table version, grouping); one is a fraction of the raw table's size
+GROUPED_CACHE_SIZE = 8 if CACHE_ENABLED else 0
+POPULAR_SELECTIONS = [
+    ("NZL", "A01_02"),
+    ("NZL", "C10T12"),
+    ("AUS", "A01_02"),
+    ("USA", "C26"),
+    ("CN1", "C26"),
+]
+
 COUNTRY_COORDS = {
     "ARG": [-34.61, -58.38],
     "AUS": [-35.28, 149.13],
@@ -0,0 +1,479 @@
+from contextlib import contextmanager
+from json import dump, load
+from os import fstat, getpid, listdir, makedirs, remove, rename, replace, stat
+from os.path import exists, getmtime, isdir, join
+from shutil import rmtree
+
+import numpy as np
+from pandas import DataFrame, Index
+
+from process import PRECOMPUTE_DIR, PRECOMPUTE_KEEP_VERSIONS
+
+try:
+    from fcntl import LOCK_EX, LOCK_NB, LOCK_UN, flock
+except ImportError:
+    # No fcntl (Windows): builds are not coordinated between processes
+    flock = None
+
+MANIFEST_FILE = "manifest.json"
+DATA_FILE = "data.npy"
+TOPK_INDEX_FILE = "topk_index.npy"
+TOPK_VALUES_FILE = "topk_values.npy"
+RISK_CUBE_FILE = "risk_cube.npy"
+HEATMAP_BLOCKS_FILE = "heatmap_blocks.npy"
+YEAR_CUBE_FILE = "year_cube.npy"
+TIVA_ORIGIN_FILE = "tiva_origin.npy"
+TIVA_ABSORPTION_FILE = "tiva_absorption.npy"
+TIVA_SECTORS_FILE = "tiva_sectors.npy"
+LINKAGES_FILE = "linkages.npy"
+CENTRALITY_FILE = "centrality.npy"
+LEONTIEF_COLUMNS_FILE = "leontief_columns.npy"
+LEONTIEF_OUTPUT_FILE = "leontief_output.npy"
+FLOW_CELLS_FILE = "flow_cells.npy"
+FLOW_VALUES_FILE = "flow_values.npy"
+COUNTRY_FLOWS_FILE = "country_flows.npy"
+FIGURES_DIR = "figures"
+
+
+def version_dir(version, directory=PRECOMPUTE_DIR):
+    """Artifacts for each table version live in their own sub-directory."""
+    return join(directory, version)
+
+
+def derived_version(version, kind):
+    """
+    Version of the ``kind`` artifacts built from table ``version``, e.g.
+    ``2020.tiva-<size>-<mtime>``. They get their own directory, published
+    and pruned like the table's, so they can be built after it.
+    """
+    table, size, mtime = version.rsplit("-", 2)
+    return f"{table}.{kind}-{size}-{mtime}"
+
+
+def staging_dir(version, directory=PRECOMPUTE_DIR):
+    """
+    Private artifact root a build writes ``version`` into (laid out like
+    ``directory``, so the readers below accept it) before ``publish``.
+    """
+    return join(directory, f".build-{version}-{getpid()}")
+
+
+def publish(staging, version, directory=PRECOMPUTE_DIR, keep=PRECOMPUTE_KEEP_VERSIONS):
+    """
+    Move a finished build into place for ``version`` with directory
+    renames, so readers see either the previous or the new artifacts,
+    never a mix. Replaced files are unlinked rather than overwritten, so
+    workers that still have them memory-mapped keep valid pages.
+    """
+    target = version_dir(version, directory)
+    retired = None
+    if exists(target):
+        retired = join(directory, f".old-{version}-{getpid()}")
+        rename(target, retired)
+    rename(version_dir(version, staging), target)
+    rmtree(staging, ignore_errors=True)
+    if retired is not None:
+        rmtree(retired, ignore_errors=True)
+    prune_versions(directory, keep)
+    return target
+
+
+def prune_versions(directory=PRECOMPUTE_DIR, keep=PRECOMPUTE_KEEP_VERSIONS):
+    """Delete all but the ``keep`` most recently built versions of each table (year)."""
+    tables = {}
+    for name in listdir(directory):
+        if not name.startswith(".") and isdir(join(directory, name)):
+            tables.setdefault(name.rsplit("-", 2)[0], []).append(name)
+    for versions in tables.values():
+        for name in sorted(versions, key=lambda name: getmtime(join(directory, name)), reverse=True)[keep:]:
+            rmtree(join(directory, name), ignore_errors=True)
+            _remove_lock(join(directory, f".lock-{name}"))
+
+
+def _is_current(fid, path):
+    """True when the open file ``fid`` is still the file at ``path`` (not unlinked or replaced)."""
+    try:
+        return stat(path).st_ino == fstat(fid.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _remove_lock(path):
+    """
+    Delete a lock file, but only while holding its lock, and leave it when
+    a builder holds it. Processes that were waiting on the deleted file
+    see it is gone once they get the lock and lock the new one instead (see
+    ``build_lock``). Without fcntl lock files are left in place.
+    """
+    if flock is None or not exists(path):
+        return
+    with open(path, "a") as fid:
+        try:
+            flock(fid, LOCK_EX | LOCK_NB)
+        except OSError:
+            return
+        try:
+            if _is_current(fid, path):
+                remove(path)
+        finally:
+            flock(fid, LOCK_UN)
+
+
+@contextmanager
+def build_lock(version, directory=PRECOMPUTE_DIR):
+    """
+    Exclusive lock, across processes, for building the artifacts of
+    ``version``. Whoever holds it parses the CSV; the others wait and then
+    memory-map what it published.
+    """
+    makedirs(directory, exist_ok=True)
+    path = join(directory, f".lock-{version}")
+    while True:
+        fid = open(path, "a")
+        if flock is None:
+            break
+        flock(fid, LOCK_EX)
+        # prune_versions may have deleted the file while we waited; another process can then lock a new one
+        if _is_current(fid, path):
+            break
+        fid.close()
+    try:
+        yield
+    finally:
+        if flock is not None:
+            flock(fid, LOCK_UN)
+        fid.close()
+
+
+def read_manifest(directory=PRECOMPUTE_DIR):
+    path = join(directory, MANIFEST_FILE)
+    if not exists(path):
+        return None
+    with open(path) as fid:
+        return load(fid)
+
+
+def write_manifest(manifest, directory=PRECOMPUTE_DIR):
+    """Write the manifest atomically so readers never see a partial file."""
+    makedirs(directory, exist_ok=True)
+    tmp_path = join(directory, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w") as fid:
+        dump(manifest, fid)
+    replace(tmp_path, join(directory, MANIFEST_FILE))
+
+
+def _open_manifest(version, directory, required=()):
+    """
+    The manifest and directory of ``version``'s artifacts, or None unless
+    they were published for ``version`` and list every file in ``required``.
+    """
+    directory = version_dir(version, directory)
+    manifest = read_manifest(directory)
+    if manifest is None or manifest["version"] != version or not set(required) <= set(manifest["artifacts"]):
+        return None
+    return manifest, directory
+
+
+def create_array(name, shape, dtype, directory=PRECOMPUTE_DIR, fill=None):
+    """Preallocate a ``.npy`` file that pool workers fill in place."""
+    makedirs(directory, exist_ok=True)
+    array = np.lib.format.open_memmap(join(directory, name), mode="w+", dtype=dtype, shape=shape)
+    if fill is not None:
+        array[:] = fill
+    return array
+
+
+def open_array(name, directory=PRECOMPUTE_DIR, mode="r"):
+    path = join(directory, name)
+    if not exists(path):
+        return None
+    return np.load(path, mmap_mode=mode)
+
+
+def save_data_cache(df, version, directory=PRECOMPUTE_DIR):
+    """
+    Dump the filtered IO table as a raw float64 matrix plus its labels and
+    start a fresh manifest for ``version``.
+    """
+    directory = version_dir(version, directory)
+    matrix = create_array(DATA_FILE, df.shape, np.float64, directory)
+    matrix[:] = df.to_numpy(dtype=np.float64)
+    matrix.flush()
+    manifest = {
+        "version": version,
+        "rows": list(df.index),
+        "columns": list(df.columns),
+        "artifacts": [DATA_FILE],
+        "figures": []
+    }
+    write_manifest(manifest, directory)
+    return manifest
+
+
+def open_data_cache(version, directory=PRECOMPUTE_DIR):
+    """
+    Return the IO table as a DataFrame backed by a read-only memory map, or
+    None when no artifacts exist for ``version``.
+    """
+    opened = _open_manifest(version, directory, (DATA_FILE,))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    matrix = open_array(DATA_FILE, directory)
+    if matrix is None:
+        return None
+    df = DataFrame(matrix, index=manifest["rows"], columns=manifest["columns"], copy=False)
+    df.attrs["mapped"] = True
+    return df
+
+
+class HeatmapBlocks:
+    """
+    Country-by-country industry blocks of the IO table, stored as a
+    (country, industry, country, industry) array in metadata order.
+    """
+
+    def __init__(self, values, countries):
+        self.values = values
+        self.positions = {country: pos for pos, country in enumerate(countries)}
+
+    def get(self, selected_country, reference_country):
+        row_pos = self.positions.get(selected_country)
+        col_pos = self.positions.get(reference_country)
+        if row_pos is None or col_pos is None:
+            return None
+        return self.values[row_pos, :, col_pos, :]
+
+
+def open_heatmap_blocks(version, directory=PRECOMPUTE_DIR):
+    opened = _open_manifest(version, directory, (HEATMAP_BLOCKS_FILE,))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    return HeatmapBlocks(open_array(HEATMAP_BLOCKS_FILE, directory), manifest["countries"])
+
+
+class TopKIndex:
+    """
+    The ``TOPK_SIZE`` largest foreign suppliers of every column of one
+    table version (see process.precompute). ``index`` is (column, rank):
+    row positions in ``rows``, largest first, -1 past the last supplier,
+    with ``values`` alongside; ``risk_cube`` is (column, industry): the
+    default-weight HHI of each input industry over those suppliers, in
+    ``industries`` order, NaN for industries with none.
+    """
+
+    def __init__(self, index, values, risk_cube, version, rows, columns, industries):
+        self.index = index
+        self.values = values
+        self.risk_cube = risk_cube
+        self.version = version
+        self.rows = Index(rows)
+        self.positions = {label: pos for pos, label in enumerate(columns)}
+        self.industries = list(industries)
+
+    def column(self, label):
+        """Position of column ``label``, or None when it is not in the table."""
+        return self.positions.get(label)
+
+
+def open_topk_index(version, directory=PRECOMPUTE_DIR):
+    opened = _open_manifest(version, directory, (TOPK_INDEX_FILE, TOPK_VALUES_FILE, RISK_CUBE_FILE))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    return TopKIndex(open_array(TOPK_INDEX_FILE, directory), open_array(TOPK_VALUES_FILE, directory),
+                     open_array(RISK_CUBE_FILE, directory), version, manifest["rows"], manifest["columns"],
+                     manifest["industries"])
+
+
+class YearCube:
+    """
+    The IO tables of several years stacked as a (column, year, row) array,
+    so the history of one column across all years is a single contiguous
+    read. Row and column labels are the union over the years; flows a
+    year's table does not have are NaN.
+    """
+
+    def __init__(self, values, version, years, rows, columns):
+        self.values = values
+        self.version = version
+        self.years = list(years)
+        self.rows = rows
+        self.columns = columns
+        self.row_countries = np.array([label.split("_", 1)[0] for label in rows])
+        self.row_industries = np.array([label.split("_", 1)[1] if "_" in label else "" for label in rows])
+        self.row_positions = {label: pos for pos, label in enumerate(rows)}
+        self.column_positions = {label: pos for pos, label in enumerate(columns)}
+
+    def history(self, column):
+        """(year, row) values of ``column``; raises ValueError for an unknown column."""
+        pos = self.column_positions.get(column)
+        if pos is None:
+            raise ValueError(f"Column {column} not found in DataFrame")
+        return self.values[pos]
+
+
+def open_year_cube(version, directory=PRECOMPUTE_DIR):
+    opened = _open_manifest(version, directory, (YEAR_CUBE_FILE,))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    return YearCube(open_array(YEAR_CUBE_FILE, directory), version, manifest["years"],
+                    manifest["rows"], manifest["columns"])
+
+
+class SectorTable:
+    """
+    Measures per sector, stored as a (sector, measure) array with the
+    sector labels and measure names from the manifest.
+    """
+
+    def __init__(self, values, version, labels, measures):
+        self.values = values
+        self.version = version
+        self.labels = labels
+        self.measures = list(measures)
+        self.positions = {label: pos for pos, label in enumerate(labels)}
+
+    def get(self, label, measure):
+        """One measure of one sector; NaN for a sector the table does not have."""
+        pos = self.positions.get(label)
+        return float(self.values[pos, self.measures.index(measure)]) if pos is not None else float("nan")
+
+    def frame(self):
+        """The table as a DataFrame indexed by sector label."""
+        return DataFrame(np.asarray(self.values), index=self.labels, columns=self.measures)
+
+
+def open_sector_table(version, name, directory=PRECOMPUTE_DIR):
+    opened = _open_manifest(version, directory, (name,))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    return SectorTable(open_array(name, directory), version, manifest["rows"], manifest["measures"])
+
+
+class LeontiefColumns:
+    """
+    The Leontief inverse L = (I - A)⁻¹ of one table version (see
+    process.extraction), stored transposed so that ``columns[k]``, column k
+    of L, is one contiguous row. ``output`` is gross output per sector.
+    """
+
+    def __init__(self, columns, output, version, labels):
+        self.columns = columns
+        self.output = output
+        self.version = version
+        self.labels = labels
+        self.positions = {label: pos for pos, label in enumerate(labels)}
+
+    def sector(self, label):
+        """Position of sector ``label``; raises ValueError for an unknown sector."""
+        pos = self.positions.get(label)
+        if pos is None:
+            raise ValueError(f"Column {label} not found in DataFrame")
+        return pos
+
+
+def open_leontief(version, directory=PRECOMPUTE_DIR):
+    opened = _open_manifest(version, directory, (LEONTIEF_COLUMNS_FILE, LEONTIEF_OUTPUT_FILE))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    return LeontiefColumns(open_array(LEONTIEF_COLUMNS_FILE, directory), open_array(LEONTIEF_OUTPUT_FILE, directory),
+                           version, manifest["rows"])
+
+
+class FlowIndex:
+    """
+    The largest cross-border intermediate flows of one table version (see
+    process.flows). ``cells`` is (industry, rank, 2): the supplier and
+    buyer sector positions in ``labels`` of the top flows into each buyer
+    industry, largest first, with ``values`` (industry, rank) and -1 / 0
+    past the last flow. ``country_flows`` is (industry, supplier country,
+    buyer country). The last industry row covers all industries.
+    """
+
+    def __init__(self, cells, values, country_flows, version, labels, industries, countries):
+        self.cells = cells
+        self.values = values
+        self.country_flows = country_flows
+        self.version = version
+        self.labels = labels
+        self.industries = list(industries)
+        self.countries = list(countries)
+
+    def industry(self, code):
+        """Row of buyer industry ``code`` (None for all industries); raises ValueError for an unknown one."""
+        if code is None:
+            return len(self.industries)
+        if code not in self.industries:
+            raise ValueError(f"Industry {code} not found in DataFrame")
+        return self.industries.index(code)
+
+
+def open_flow_index(version, directory=PRECOMPUTE_DIR):
+    opened = _open_manifest(version, directory, (FLOW_CELLS_FILE, FLOW_VALUES_FILE, COUNTRY_FLOWS_FILE))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    return FlowIndex(open_array(FLOW_CELLS_FILE, directory), open_array(FLOW_VALUES_FILE, directory),
+                     open_array(COUNTRY_FLOWS_FILE, directory), version, manifest["rows"],
+                     manifest["industries"], manifest["countries"])
+
+
+class TivaTables:
+    """
+    Value-added decomposition of one table version (see process.tiva).
+
+    ``origin`` is (country, sector): value added from each country per unit
+    of a sector's output. ``absorption`` is (sector, country): value added
+    generated in a sector that ends up in each country's final demand.
+    ``sectors`` is (sector, measure) with the measures in ``measures``.
+    """
+
+    def __init__(self, origin, absorption, sectors, version, countries, labels, measures):
+        self.origin = origin
+        self.absorption = absorption
+        self.sectors = sectors
+        self.version = version
+        self.countries = list(countries)
+        self.labels = labels
+        self.measures = list(measures)
+        self.positions = {label: pos for pos, label in enumerate(labels)}
+        self.country_positions = {country: pos for pos, country in enumerate(self.countries)}
+
+    def sector(self, label):
+        """Position of sector ``label``; raises ValueError for an unknown sector."""
+        pos = self.positions.get(label)
+        if pos is None:
+            raise ValueError(f"Column {label} not found in DataFrame")
+        return pos
+
+    def measure(self, name):
+        """One measure for every sector, in ``labels`` order."""
+        return self.sectors[:, self.measures.index(name)]
+
+
+def open_tiva(version, directory=PRECOMPUTE_DIR):
+    opened = _open_manifest(version, directory, (TIVA_ORIGIN_FILE, TIVA_ABSORPTION_FILE, TIVA_SECTORS_FILE))
+    if opened is None:
+        return None
+    manifest, directory = opened
+    return TivaTables(open_array(TIVA_ORIGIN_FILE, directory), open_array(TIVA_ABSORPTION_FILE, directory),
+                      open_array(TIVA_SECTORS_FILE, directory), version, manifest["countries"],
+                      manifest["rows"], manifest["measures"])
+
+
+def precomputed_figures(version, directory=PRECOMPUTE_DIR):
+    """Return (figure key, JSON path) pairs written by ``precompute`` for ``version``."""
+    opened = _open_manifest(version, directory, ())
+    if opened is None:
+        return []
+    manifest, directory = opened
+    return [
+        (tuple(tuple(part) if isinstance(part, list) else part for part in entry["key"]),
+         join(directory, entry["file"]))
+        for entry in manifest["figures"]
+    ]
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used cache.
+
+    Concurrent callers asking for the same missing key share a single
+    computation: the first caller runs ``func`` while the others wait on
+    its result, so Dash callbacks fired together for one selection do the
+    pandas work only once.
+
+    Keys are tuples whose first element is the data version, which lets
+    ``discard_version`` drop every entry built from an outdated table.
+
+    A cache of size 0 (``IO_CACHE=off``) is a pass-through: every caller
+    runs ``func`` itself, without sharing concurrent computations either.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get_or_compute(self, key, func):
+        """
+        Return the cached value for ``key``, computing it with ``func()``
+        on a miss. Exceptions raised by ``func`` are propagated to every
+        waiting caller and nothing is cached.
+        """
+        if self.maxsize <= 0:
+            with self._lock:
+                self.misses += 1
+            return func()
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = Future()
+            else:
+                self.hits += 1
+
+        if not owner:
+            return pending.result()
+
+        try:
+            value = func()
+        except BaseException as exc:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set_exception(exc)
+            raise
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._pending.pop(key, None)
+        pending.set_result(value)
+        return value
+
+    def items(self):
+        """Snapshot of the cached (key, value) pairs, oldest first."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def discard_version(self, version):
+        """
+        Drop every entry whose key was built from ``version``, including
+        tables derived from it (versions ``<version>/...``, see process.groups).
+        """
+        derived = f"{version}/"
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == version or str(k[0]).startswith(derived)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def data_version(df):
+    """
+    Return the version token that ``load_data`` attached to ``df``, or None
+    for frames that did not come from it (these are never cached).
+    """
+    return df.attrs.get("data_version")
+
+
+def version_caches():
+    """
+    Every cache keyed by data version, by name: what a table swap or an
+    evicted year discards, and what ``/metrics`` reports. The modules are
+    imported on use, since they import this one.
+    """
+    from process.flows import flows_cache
+    from process.groups import grouped_cache
+    from process.prefetch import figure_cache
+    from process.rankings import metrics_cache
+    from process.sankey import sankey_cache
+    from process.search import search_cache
+    from process.tiva import tiva_cache
+    from process.utils import inputs_cache
+    return [("inputs", inputs_cache), ("figures", figure_cache), ("grouped", grouped_cache), ("tiva", tiva_cache),
+            ("metrics", metrics_cache), ("sankey", sankey_cache), ("flows", flows_cache), ("search", search_cache)]
@@ -0,0 +1,175 @@
+import numpy as np
+
+from process import CENTRALITY_DAMPING, CENTRALITY_MIN_SHARE, CENTRALITY_PIVOTS, PRECOMPUTE_DIR
+from process.artifacts import (
+    CENTRALITY_FILE,
+    build_lock,
+    create_array,
+    derived_version,
+    open_sector_table,
+    publish,
+    staging_dir,
+    version_dir,
+    write_manifest
+)
+from process.leontief import io_system, safe_divide
+from process.startup import timeline
+
+# Columns of the centrality table, in order
+CENTRALITY_MEASURES = ["pagerank", "eigenvector", "betweenness"]
+
+# Power iterations stop when the scores move less than this (L1), or after MAX_ITERATIONS
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 500
+
+
+def flow_graph(df, min_share=CENTRALITY_MIN_SHARE):
+    """
+    The thresholded inter-sector graph of a ``load_data`` table as sparse
+    edge arrays, sorted by supplier (CSR by row): an edge supplier -> buyer
+    for every flow that is at least ``min_share`` of the buyer's
+    intermediate inputs, self-flows excluded.
+
+    Returns ``(indptr, suppliers, buyers, flows, x)``, with ``x`` gross output.
+    """
+    system = io_system(df)
+    Z, x = system["Z"], system["x"]
+    n = len(x)
+    Z[np.diag_indices(n)] = 0.0
+    # Compared against scaled column totals, so the only n x n temporary is a boolean mask
+    suppliers, buyers = np.nonzero((Z > 0) & (Z >= min_share * Z.sum(axis=0)[None, :]))
+    flows = Z[suppliers, buyers]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(suppliers, minlength=n))])
+    return indptr, suppliers, buyers, flows, x
+
+
+def pagerank(n, suppliers, buyers, flows, damping=CENTRALITY_DAMPING):
+    """
+    Weighted PageRank for a walk from each buyer to its suppliers in
+    proportion to what it buys from them. A sector ranks high when important
+    sectors depend on it. Buyers left without inputs restart uniformly.
+    Scaled so the average sector scores 1.
+    """
+    out = np.bincount(buyers, weights=flows, minlength=n)
+    step = flows / out[buyers]
+    dangling = out == 0
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        updated = damping * np.bincount(suppliers, weights=step * scores[buyers], minlength=n)
+        updated += (1.0 - damping + damping * scores[dangling].sum()) / n
+        converged = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if converged:
+            break
+    return scores * n
+
+
+def eigenvector(n, suppliers, buyers, flows, x):
+    """
+    Eigenvector centrality of the thresholded technical-coefficient matrix
+    A (A_ij = flow_ij / x_j): a sector is central when it supplies a large
+    part of the inputs of central sectors. Power iteration on A + I, which
+    has the same Perron vector and cannot oscillate. Scaled to a maximum of 1.
+    """
+    coefficients = safe_divide(flows, x[buyers])
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        updated = scores + np.bincount(suppliers, weights=coefficients * scores[buyers], minlength=n)
+        updated /= updated.sum()
+        converged = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if converged:
+            break
+    return scores / scores.max() if scores.max() > 0 else scores
+
+
+def _edges_of(frontier, indptr):
+    """Positions, in the CSR arrays, of every edge leaving a node of ``frontier``."""
+    starts, counts = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+    offsets = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(offsets, counts) + np.repeat(starts, counts)
+
+
+def betweenness(n, indptr, buyers, pivots=CENTRALITY_PIVOTS, seed=0):
+    """
+    Approximate betweenness (Brandes-Pich): Brandes' accumulation from
+    ``pivots`` sampled sources over the unweighted directed graph, scaled
+    to all sources. Each breadth-first search advances a whole level per
+    step with array operations rather than one node at a time. Returned as
+    the percentage of the (n-1)(n-2) shortest paths through each sector.
+    """
+    suppliers = np.repeat(np.arange(n), np.diff(indptr))
+    sources = np.random.default_rng(seed).choice(n, size=min(pivots, n), replace=False)
+    scores = np.zeros(n)
+    for source in sources:
+        dist = np.full(n, -1)
+        sigma = np.zeros(n)
+        dist[source], sigma[source] = 0, 1.0
+        frontier, level, levels = np.array([source]), 0, []
+        while frontier.size:
+            edges = _edges_of(frontier, indptr)
+            targets = buyers[edges]
+            fresh = np.unique(targets[dist[targets] < 0])
+            dist[fresh] = level + 1
+            on_path = dist[targets] == level + 1
+            tails, heads = suppliers[edges][on_path], targets[on_path]
+            sigma += np.bincount(heads, weights=sigma[tails], minlength=n)
+            levels.append((tails, heads))
+            frontier, level = fresh, level + 1
+        delta = np.zeros(n)
+        for tails, heads in reversed(levels):
+            delta += np.bincount(tails, weights=sigma[tails] / sigma[heads] * (1.0 + delta[heads]), minlength=n)
+        delta[source] = 0.0
+        scores += delta
+    pairs = max((n - 1) * (n - 2), 1)
+    return 100.0 * scores * (n / len(sources)) / pairs if len(sources) else scores
+
+
+def compute_centrality(df):
+    """(sector, measure) array of ``CENTRALITY_MEASURES`` for a ``load_data`` table."""
+    with timeline.phase("centrality: graph"):
+        indptr, suppliers, buyers, flows, x = flow_graph(df)
+    n = len(x)
+    with timeline.phase("centrality: scores"):
+        return np.column_stack([
+            pagerank(n, suppliers, buyers, flows),
+            eigenvector(n, suppliers, buyers, flows, x),
+            betweenness(n, indptr, buyers)
+        ])
+
+
+def build_centrality(data, version, directory=PRECOMPUTE_DIR):
+    """Score the sectors of ``data`` and publish the table as ``version``."""
+    values = compute_centrality(data["data"])
+    staging = staging_dir(version, directory)
+    target = version_dir(version, staging)
+    array = create_array(CENTRALITY_FILE, values.shape, np.float64, target)
+    array[:] = values
+    array.flush()
+    write_manifest({
+        "version": version,
+        "table_version": data["version"],
+        "rows": [str(label) for label in data["data"].index],
+        "measures": CENTRALITY_MEASURES,
+        "min_share": CENTRALITY_MIN_SHARE,
+        "artifacts": [CENTRALITY_FILE],
+        "figures": []
+    }, target)
+    publish(staging, version, directory)
+
+
+def ensure_centrality(data, directory=PRECOMPUTE_DIR):
+    """
+    Open the centrality table of ``data``, scoring it first if needed, under
+    ``build_lock`` like the linkages table.
+    """
+    version = derived_version(data["version"], "centrality")
+    centrality = open_sector_table(version, CENTRALITY_FILE, directory)
+    if centrality is None:
+        with build_lock(version, directory):
+            centrality = open_sector_table(version, CENTRALITY_FILE, directory)
+            if centrality is None:
+                with timeline.phase("build centrality"):
+                    build_centrality(data, version, directory)
+                centrality = open_sector_table(version, CENTRALITY_FILE, directory)
+    return centrality
@@ -0,0 +1,202 @@
+import numpy as np
+import plotly.graph_objects as go
+from pandas import DataFrame
+from plotly.subplots import make_subplots
+
+from process.instrument import extraction
+
+# Foreign suppliers per importer the HHI is computed over, as on the Risk tab (see process.risk.weighted_risk)
+RISK_SUPPLIERS = 50
+# Bars drawn per panel; the rest of the industries and countries are left out of the chart, not the numbers
+COMPARE_TOP = 15
+
+
+@extraction
+def compare_inputs(df, first, second, risk_weights_data=None):
+    """
+    Compare the supply structures of two country-industry pairs, ``first``
+    and ``second`` as (country, industry), from one gather of both columns.
+
+    Returns a dict:
+
+    - ``industries``: each input industry's share of total intermediate
+      inputs for both pairs and the difference (second - first, in
+      percentage points), with the weighted HHI of both and its delta;
+    - ``countries``: the same shares by supplier country, with each
+      importer's own country counted as "Domestic" so they line up;
+    - ``overlap``: the weighted overlap of foreign suppliers (the sum over
+      supplier sectors of the smaller of the two foreign shares, 1 for
+      identical structures), the Jaccard index of the two sets of
+      ``RISK_SUPPLIERS`` largest foreign suppliers, and both totals.
+
+    The HHI mirrors ``weighted_risk``: the ``RISK_SUPPLIERS`` largest
+    foreign suppliers of each pair plus its domestic suppliers in the same
+    industries, every country weighted 1.0 and the importer 0.0 unless
+    ``risk_weights_data`` says otherwise. Raises
+    ValueError when a pair has no column in ``df``.
+    """
+    labels = [f"{country}_{industry}" for country, industry in (first, second)]
+    positions = df.columns.get_indexer(labels)
+    for label, pos in zip(labels, positions):
+        if pos < 0:
+            raise ValueError(f"Column {label} not found in DataFrame")
+
+    # Both columns in one gather; rows are supplier sectors
+    values = np.asarray(df.to_numpy()[:, positions], dtype=np.float64)
+    values[values < 0] = 0.0
+    split = df.index.astype(str).str.split("_", n=1)
+    supplier_countries = np.asarray(split.str[0])
+    supplier_industries = np.asarray(split.str[1])
+    industries, industry_pos = np.unique(supplier_industries, return_inverse=True)
+
+    domestic = supplier_countries[:, None] == np.array([first[0], second[0]])[None, :]
+    totals = values.sum(axis=0)
+    shares = np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+
+    # Shares by input industry, and weighted HHI over each pair's largest foreign suppliers
+    industry_shares = np.column_stack([np.bincount(industry_pos, weights=shares[:, pair], minlength=len(industries))
+                                       for pair in range(2)])
+    foreign = np.where(domestic, 0.0, values)
+    hhi = np.full((len(industries), 2), np.nan)
+    top_sets = []
+    for pair, (country, _) in enumerate((first, second)):
+        k = min(RISK_SUPPLIERS, int((foreign[:, pair] > 0).sum()))
+        top = np.argpartition(-foreign[:, pair], k - 1)[:k] if k else np.zeros(0, dtype=int)
+        top_sets.append(set(df.index[top]))
+        weights = {code: 1.0 for code in np.unique(supplier_countries[top])}
+        weights[country] = 0.0
+        weights.update(risk_weights_data or {})
+        home = np.flatnonzero(domestic[:, pair] & (values[:, pair] > 0) & np.isin(industry_pos, industry_pos[top]))
+        top = np.concatenate([top, home])
+        weighted = values[top, pair] * np.array([weights.get(code, 1.0) for code in supplier_countries[top]])
+        sums = np.bincount(industry_pos[top], weights=weighted, minlength=len(industries))
+        squares = np.bincount(industry_pos[top], weights=weighted ** 2, minlength=len(industries))
+        present = np.bincount(industry_pos[top], minlength=len(industries)) > 0
+        hhi[present, pair] = np.divide(squares[present], sums[present] ** 2,
+                                       out=np.full(present.sum(), np.nan), where=sums[present] > 0)
+
+    industry_frame = DataFrame({
+        "industry": industries,
+        "share_first": 100 * industry_shares[:, 0],
+        "share_second": 100 * industry_shares[:, 1],
+        "share_diff": 100 * (industry_shares[:, 1] - industry_shares[:, 0]),
+        "hhi_first": hhi[:, 0],
+        "hhi_second": hhi[:, 1],
+        "hhi_delta": hhi[:, 1] - hhi[:, 0]
+    })
+    industry_frame = industry_frame[(industry_shares > 0).any(axis=1)]
+
+    country_keys = np.where(domestic, "Domestic", supplier_countries[:, None])
+    country_frame = DataFrame({
+        "country": np.concatenate([country_keys[:, 0], country_keys[:, 1]]),
+        "pair": np.repeat([0, 1], len(values)),
+        "share": 100 * np.concatenate([shares[:, 0], shares[:, 1]])
+    }).pivot_table(index="country", columns="pair", values="share", aggfunc="sum", fill_value=0.0)
+    country_frame = DataFrame({
+        "country": country_frame.index,
+        "share_first": country_frame[0].to_numpy(),
+        "share_second": country_frame[1].to_numpy(),
+        "share_diff": (country_frame[1] - country_frame[0]).to_numpy()
+    })
+    country_frame = country_frame[(country_frame[["share_first", "share_second"]] > 0).any(axis=1)]
+
+    foreign_totals = foreign.sum(axis=0)
+    foreign_shares = np.divide(foreign, foreign_totals, out=np.zeros_like(foreign), where=foreign_totals > 0)
+    union = top_sets[0] | top_sets[1]
+    overlap = {
+        "weighted_overlap": float(np.minimum(foreign_shares[:, 0], foreign_shares[:, 1]).sum()),
+        "jaccard": len(top_sets[0] & top_sets[1]) / len(union) if union else float("nan"),
+        "shared_suppliers": len(top_sets[0] & top_sets[1]),
+        "total_first": float(totals[0]),
+        "total_second": float(totals[1]),
+        "foreign_share_first": 100 * float(foreign_totals[0] / totals[0]) if totals[0] else float("nan"),
+        "foreign_share_second": 100 * float(foreign_totals[1] / totals[1]) if totals[1] else float("nan")
+    }
+    return {
+        "industries": industry_frame.sort_values("share_diff", key=np.abs, ascending=False,
+                                                 kind="stable").reset_index(drop=True),
+        "countries": country_frame.sort_values("share_diff", key=np.abs, ascending=False,
+                                               kind="stable").reset_index(drop=True),
+        "overlap": overlap
+    }
+
+
+def create_comparison_chart(comparison, first, second, metadata, country_info):
+    """
+    Combined summary and risk figure for two country-industry pairs: input
+    industry shares side by side (as the Share tab's bar chart), supplier
+    country share differences, weighted HHI side by side (as the Risk
+    tab's bars) and a table of the overlap measures.
+    """
+    industry_names = metadata.set_index("Code")["Industry"]
+    country_names = country_info.set_index("Code")["countries"]
+    names = [f"{country} {industry_names.get(industry, industry)}" for country, industry in (first, second)]
+    industries = comparison["industries"].head(COMPARE_TOP)
+    industry_labels = [industry_names.get(code, code) for code in industries["industry"]]
+    countries = comparison["countries"].head(COMPARE_TOP)
+    hhi = comparison["industries"].dropna(subset=["hhi_first", "hhi_second"], how="all")
+    hhi = hhi.sort_values("hhi_delta", key=np.abs, ascending=False, na_position="last").head(COMPARE_TOP)
+    overlap = comparison["overlap"]
+
+    fig = make_subplots(
+        rows=2, cols=2,
+        column_widths=[0.6, 0.4],
+        specs=[[{"type": "xy"}, {"type": "xy"}], [{"type": "xy"}, {"type": "table"}]],
+        subplot_titles=(
+            "Share of intermediate inputs by input industry (%)",
+            "Supplier country share difference (pp)",
+            "Weighted HHI by input industry",
+            "Supplier overlap"
+        ),
+        vertical_spacing=0.22,
+        horizontal_spacing=0.08
+    )
+    for pair, (column, color) in enumerate((("share_first", "skyblue"), ("share_second", "orange"))):
+        fig.add_trace(go.Bar(x=industry_labels, y=industries[column], name=names[pair], marker_color=color,
+                             legendgroup=str(pair)), row=1, col=1)
+    fig.add_trace(go.Bar(
+        x=[country_names.get(code, code) for code in countries["country"]],
+        y=countries["share_diff"],
+        marker_color=["orange" if diff > 0 else "skyblue" for diff in countries["share_diff"]],
+        customdata=countries[["share_first", "share_second"]].to_numpy(),
+        hovertemplate="%{x}: %{customdata[0]:.2f}% -> %{customdata[1]:.2f}%<extra></extra>",
+        showlegend=False
+    ), row=1, col=2)
+    for pair, (column, color) in enumerate((("hhi_first", "skyblue"), ("hhi_second", "orange"))):
+        fig.add_trace(go.Bar(
+            x=[industry_names.get(code, code) for code in hhi["industry"]],
+            y=hhi[column],
+            text=hhi[column].round(3),
+            textposition="outside",
+            marker_color=color,
+            name=names[pair],
+            legendgroup=str(pair),
+            showlegend=False
+        ), row=2, col=1)
+    fig.add_trace(go.Table(
+        header=dict(values=["Measure", "Value"], fill_color='lightgrey', align='center',
+                    font=dict(size=12, color='black')),
+        cells=dict(
+            values=[
+                ["Weighted foreign supplier overlap", "Shared top suppliers (Jaccard)", "Shared top suppliers",
+                 f"Total inputs, {first[0]}", f"Total inputs, {second[0]}",
+                 f"Foreign share, {first[0]}", f"Foreign share, {second[0]}"],
+                [f"{overlap['weighted_overlap']:.1%}", f"{overlap['jaccard']:.2f}", overlap["shared_suppliers"],
+                 f"{overlap['total_first']:,.1f}", f"{overlap['total_second']:,.1f}",
+                 f"{overlap['foreign_share_first']:.1f}%", f"{overlap['foreign_share_second']:.1f}%"]
+            ],
+            align='center', font=dict(size=11), fill_color='white'
+        )
+    ), row=2, col=2)
+
+    fig.update_annotations(font_size=11)
+    fig.update_layout(
+        title_text=" vs ".join(f"<b>{country_names.get(country, country)}</b> - {industry_names.get(industry, industry)}"
+                               for country, industry in (first, second)),
+        barmode="group",
+        template="plotly_white",
+        legend=dict(orientation="h", y=1.08, x=0.5, xanchor="center"),
+        margin=dict(l=40, r=40, t=110, b=40)
+    )
+    fig.update_yaxes(range=[0, 1.2], row=2, col=1)
+    return fig
@@ -1,26 +1,180 @@
-from process import INTER_COUNTRY_INPUT_OUTPUT_TABLES, INTER_COUNTRY_INPUT_OUTPUT_METADATA, INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE
-from pandas import read_csv
+from process import INTER_COUNTRY_INPUT_OUTPUT_TABLES, INTER_COUNTRY_INPUT_OUTPUT_METADATA, INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE, COMPACT_DATA, PRECOMPUTE_DIR
+from numpy import float32
+from pandas import CategoricalIndex, DataFrame, Index, read_csv
+from os import stat
+from os.path import basename, splitext
+from process.artifacts import CENTRALITY_FILE, LINKAGES_FILE, build_lock, derived_version, open_data_cache, open_flow_index, open_heatmap_blocks, open_sector_table, open_topk_index
+from process.ingest import ingest_data_cache
+from process.startup import timeline
+from process.utils import register_topk_index
 
-def read_input_output_table():
+def read_input_output_table(
+        table_path=INTER_COUNTRY_INPUT_OUTPUT_TABLES,
+        metadata_path=INTER_COUNTRY_INPUT_OUTPUT_METADATA,
+        countrycode_path=INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE):
 
     output = {
-        "table": read_csv(INTER_COUNTRY_INPUT_OUTPUT_TABLES),
-        "metadata": read_csv(INTER_COUNTRY_INPUT_OUTPUT_METADATA),
-        "countrycode": read_csv(INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE)
+        "table": read_csv(table_path),
+        "metadata": read_csv(metadata_path),
+        "countrycode": read_csv(countrycode_path)
     }
 
     return output
 
-def load_data():
-    data = read_input_output_table()
-    input_output_table = data["table"].set_index("V1")
-    all_countries = list(data["countrycode"]["Code"])
+def table_version(path=INTER_COUNTRY_INPUT_OUTPUT_TABLES):
+    """
+    Version token for an IO table: the file name (i.e. the year), size and
+    modification time, so tables of different years never share a version.
+    """
+    info = stat(path)
+    return f"{splitext(basename(path))[0]}-{info.st_size:x}-{info.st_mtime_ns:x}"
 
-    df = input_output_table[[col for col in input_output_table.columns if any(col.startswith(prefix) for prefix in all_countries)]]
-    mask = df.index.str.startswith(tuple(all_countries))
-    df = df[mask]
-    df.index.name = None
 
-    metadata = data["metadata"]
+def _compact_labels(labels):
+    """Categorical codes when labels repeat, otherwise the packed string dtype."""
+    if labels.has_duplicates:
+        return CategoricalIndex(labels)
+    return Index(labels, dtype="str")
 
-    return {"data": df, "metadata": metadata, "all_countries": data["countrycode"]}
+
+def _compact_frame(frame):
+    """Float columns as float32, string columns as categoricals when values repeat."""
+    columns = {}
+    for col in frame.columns:
+        values = frame[col]
+        if values.dtype.kind == "f":
+            values = values.astype(float32)
+        elif values.dtype.kind in "OT" or str(values.dtype) == "str":
+            values = values.astype("category" if values.nunique() < len(values) / 2 else "str")
+        columns[col] = values
+    return DataFrame(columns)
+
+
+def compact_data(data):
+    """
+    Return ``data`` with the IO matrix stored as one float32 block, compact
+    row/column labels and compact metadata frames. This halves the matrix
+    footprint at the cost of ~7 significant digits, which is far below what
+    the charts show. A memory-mapped table becomes a private float32 copy,
+    so compaction pays off mainly for workers that parse the CSV.
+    """
+    df = data["data"]
+    compact = DataFrame(
+        df.to_numpy(dtype=float32),
+        index=_compact_labels(df.index),
+        columns=_compact_labels(df.columns),
+        copy=False
+    )
+    compact.attrs["data_version"] = df.attrs.get("data_version")
+    return {
+        **data,
+        "data": compact,
+        "metadata": _compact_frame(data["metadata"]),
+        "all_countries": _compact_frame(data["all_countries"])
+    }
+
+
+def load_data(
+        use_precomputed: bool = True,
+        table_path=INTER_COUNTRY_INPUT_OUTPUT_TABLES,
+        metadata_path=INTER_COUNTRY_INPUT_OUTPUT_METADATA,
+        countrycode_path=INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE,
+        compact: bool = COMPACT_DATA,
+        directory=PRECOMPUTE_DIR):
+    """
+    Load the IO table together with the industry and country metadata.
+
+    When ``python cli.py precompute`` has written artifacts for the current
+    table version, the matrix is memory-mapped from them instead of parsing
+    the CSV, so workers share pages and start without the pandas parse.
+    ``directory`` is the artifact root (see ``process.artifacts``); a
+    top-K index among them is registered for ``obtain_inputs``.
+    With ``compact`` (``IO_COMPACT=1``) the result goes through ``compact_data``.
+    """
+    version = table_version(table_path)
+    with timeline.phase("open precomputed table"):
+        df = open_data_cache(version, directory) if use_precomputed else None
+
+    if df is None:
+        with timeline.phase("parse csv"):
+            data = read_input_output_table(table_path, metadata_path, countrycode_path)
+        with timeline.phase("filter table"):
+            input_output_table = data["table"].set_index("V1")
+            all_countries = list(data["countrycode"]["Code"])
+
+            df = input_output_table[[col for col in input_output_table.columns if any(col.startswith(prefix) for prefix in all_countries)]]
+            mask = df.index.str.startswith(tuple(all_countries))
+            df = df[mask]
+            df.index.name = None
+        metadata = data["metadata"]
+        countrycode = data["countrycode"]
+    else:
+        with timeline.phase("read metadata"):
+            metadata = read_csv(metadata_path)
+            countrycode = read_csv(countrycode_path)
+
+    df.attrs["data_version"] = version
+
+    with timeline.phase("open heatmap blocks"):
+        heatmap_blocks = open_heatmap_blocks(version, directory) if use_precomputed else None
+        linkages = open_sector_table(derived_version(version, "linkages"), LINKAGES_FILE, directory) \
+            if use_precomputed else None
+        centrality = open_sector_table(derived_version(version, "centrality"), CENTRALITY_FILE, directory) \
+            if use_precomputed else None
+        flows = open_flow_index(derived_version(version, "flows"), directory) if use_precomputed else None
+        # Row positions in the top-K index refer to the mapped matrix, so a parsed or compacted table keeps scanning
+        topk = open_topk_index(version, directory) if use_precomputed and df.attrs.get("mapped") and not compact \
+            else None
+    if topk is not None:
+        register_topk_index(topk)
+    data = {
+        "data": df,
+        "metadata": metadata,
+        "all_countries": countrycode,
+        "version": version,
+        "heatmap_blocks": heatmap_blocks,
+        "linkages": linkages,
+        "centrality": centrality,
+        "flows": flows
+    }
+    if compact:
+        with timeline.phase("compact"):
+            data = compact_data(data)
+    return data
+
+
+def ensure_data_cache(directory=PRECOMPUTE_DIR, table_path=INTER_COUNTRY_INPUT_OUTPUT_TABLES):
+    """
+    Make sure the current version of ``table_path`` has a memory-mappable
+    data cache and return the version. Under ``build_lock`` only the first
+    process streams the CSV into the cache (see ``process.ingest``) and
+    publishes it; processes that waited on the lock find it published and
+    map it instead of parsing again.
+    """
+    version = table_version(table_path)
+    if open_data_cache(version, directory) is None:
+        with build_lock(version, directory):
+            if open_data_cache(version, directory) is None:
+                with timeline.phase("build data cache"):
+                    # Only reached when the version has no usable data cache, so nothing built on it survives anyway
+                    ingest_data_cache(table_path, version, directory, replace=True)
+    return version
+
+
+def load_shared_data(directory=PRECOMPUTE_DIR, table_path=INTER_COUNTRY_INPUT_OUTPUT_TABLES):
+    """
+    ``load_data`` for processes that serve the same table: the first one
+    to see a new table version writes the data cache, the rest (and any
+    reload of the same version) memory-map it. Falls back to parsing the
+    CSV privately when the artifact directory is not writable.
+
+    The linkages, centrality and flow index tables are only mapped, never
+    built here: ``python cli.py precompute`` builds them offline, and until
+    it has, the views that use them go without (see ``process.rankings``
+    and ``process.flows``).
+    """
+    try:
+        ensure_data_cache(directory, table_path)
+    except OSError:
+        pass
+    return load_data(table_path=table_path, directory=directory)
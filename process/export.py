@@ -0,0 +1,192 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from json import dumps, loads
+from os import cpu_count, makedirs
+from os.path import exists, join
+from time import time
+
+from pandas import DataFrame
+
+from process.data import ensure_data_cache, load_data, table_version
+from process.map import create_io_map
+from process.risk import compute_industry_risk, update_risk_chart
+from process.summary import create_io_summary, get_input_industry_options
+from process.utils import obtain_inputs
+
+EXPORT_FORMATS = ("json", "png", "svg", "metrics")
+EXPORT_FIGURES = ("map", "summary", "risk")
+CHECKPOINT_FILE = "checkpoint.jsonl"
+EXPORT_BATCH_SIZE = 20
+
+# Per-process state for pool workers, filled by _init_worker
+_worker = {}
+
+
+def _init_worker():
+    # load_data memory-maps the shared matrix written by ensure_data_cache,
+    # so nothing large is pickled to the workers
+    _worker["data"] = load_data()
+
+
+def list_pairs(data):
+    """All importer-industry pairs that have a column in the IO table."""
+    columns = set(data["data"].columns)
+    return [
+        (country, industry)
+        for country in data["all_countries"]["Code"]
+        for industry in data["metadata"]["Code"]
+        if f"{country}_{industry}" in columns
+    ]
+
+
+def read_checkpoint(output_dir, version):
+    """
+    Export formats already written for each pair from table ``version`` by
+    earlier (possibly interrupted) runs, as {(country, industry): formats}.
+    Entries of another version of the table, of a run that did not record
+    its version and formats, or whose files are gone are left out, so those
+    pairs are exported again.
+    """
+    path = join(output_dir, CHECKPOINT_FILE)
+    if not exists(path):
+        return {}
+    done = {}
+    with open(path) as fid:
+        for line in fid:
+            if line.strip():
+                entry = loads(line)
+                if entry.get("version") != version or "formats" not in entry:
+                    continue
+                pair_dir = join(output_dir, entry["country"], entry["industry"])
+                if all(exists(join(pair_dir, name)) for name in entry["files"]):
+                    done.setdefault((entry["country"], entry["industry"]), set()).update(entry["formats"])
+    return done
+
+
+def pair_metrics(df, selected_country, selected_industry, metadata):
+    """Default-weight risk metrics per input industry, as shown on the Risk tab."""
+    inputs = obtain_inputs(df, selected_industry, 50, selected_country=selected_country, run_filter=False)
+    risk_weights = {c: 1.0 for c in inputs.index.str.split('_').str[0].unique()}
+    risk_weights[selected_country] = 0.0
+
+    metrics = compute_industry_risk(inputs, risk_weights)
+    sources = inputs.reset_index()
+    sources.columns = ["source", "value"]
+    sources["industry"] = sources["source"].str.split('_', n=1).str[1]
+    totals = sources.groupby("industry").agg(
+        total_inputs=("value", "sum"),
+        num_sources=("value", "size"),
+        top_source=("source", "first")
+    ).reset_index()
+
+    metrics = metrics.merge(totals, on="industry", how="left").merge(
+        metadata.rename(columns={"Code": "industry", "Industry": "industry_name"}), on="industry", how="left"
+    )
+    metrics.insert(0, "industry_code", f"{selected_country}_{selected_industry}")
+    return metrics
+
+
+def _export_pair(data, selected_country, selected_industry, output_dir, formats):
+    df, metadata, country_info = data["data"], data["metadata"], data["all_countries"]
+    pair_dir = join(output_dir, selected_country, selected_industry)
+    makedirs(pair_dir, exist_ok=True)
+
+    written = []
+    if "metrics" in formats:
+        pair_metrics(df, selected_country, selected_industry, metadata).to_csv(
+            join(pair_dir, "metrics.csv"), index=False)
+        written.append("metrics.csv")
+
+    figure_formats = [fmt for fmt in formats if fmt != "metrics"]
+    if not figure_formats:
+        return written
+
+    options = get_input_industry_options(df, metadata, selected_country, selected_industry)
+    builders = {
+        "map": lambda: create_io_map(df, selected_country, selected_industry, 10, metadata, country_info,
+                                     selected_sec_deps=False, use_thickness=True),
+        "summary": lambda: create_io_summary(df, selected_country, selected_industry,
+                                             options[0]["value"] if options else None, metadata, country_info),
+        "risk": lambda: update_risk_chart(df, None, selected_country, selected_industry, metadata, country_info),
+    }
+    for name in EXPORT_FIGURES:
+        try:
+            fig = builders[name]()
+        except Exception:
+            # Same selections the dashboard answers with an error figure
+            continue
+        if fig is None:
+            continue
+        for fmt in figure_formats:
+            file_name = f"{name}.{fmt}"
+            if fmt == "json":
+                fig.write_json(join(pair_dir, file_name))
+            else:
+                fig.write_image(join(pair_dir, file_name))
+            written.append(file_name)
+    return written
+
+
+def _export_batch(pairs, output_dir, formats):
+    results = []
+    for selected_country, selected_industry in pairs:
+        try:
+            files = _export_pair(_worker["data"], selected_country, selected_industry, output_dir, formats)
+            results.append({"country": selected_country, "industry": selected_industry, "files": files,
+                            "formats": list(formats), "version": _worker["data"]["version"]})
+        except Exception as exc:
+            results.append({"country": selected_country, "industry": selected_industry, "error": repr(exc)})
+    return results
+
+
+def run_export(output_dir, formats=("json", "metrics"), workers=None, progress=print, pairs=None):
+    """
+    Export figures and metric tables for every importer-industry pair.
+
+    Pairs are fanned out in batches over a process pool whose workers
+    memory-map the shared data cache. Every finished pair is appended to
+    ``checkpoint.jsonl`` in ``output_dir`` with the table version it was
+    exported from and the formats written; re-running the export skips
+    the pairs that have every requested format for the current version,
+    so an interrupted run resumes where it stopped, while a changed table
+    or a new format is exported again. Pairs that fail are reported but not
+    checkpointed, so they are retried next time.
+    """
+    unknown = set(formats) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown export formats: {sorted(unknown)}")
+    if {"png", "svg"} & set(formats):
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            raise ImportError("Static image export needs the kaleido package (pip install kaleido)")
+
+    start_time = time()
+    ensure_data_cache()
+    makedirs(output_dir, exist_ok=True)
+
+    if pairs is None:
+        pairs = list_pairs(load_data())
+    done = read_checkpoint(output_dir, table_version())
+    pending = [pair for pair in pairs if not set(formats) <= done.get(pair, set())]
+    progress(f"{len(pairs)} pairs, {len(pairs) - len(pending)} already exported, {len(pending)} to go")
+
+    batches = [pending[pos:pos + EXPORT_BATCH_SIZE] for pos in range(0, len(pending), EXPORT_BATCH_SIZE)]
+    exported, failed = 0, []
+    with ProcessPoolExecutor(max_workers=workers or cpu_count() or 1, initializer=_init_worker) as executor, \
+            open(join(output_dir, CHECKPOINT_FILE), "a") as checkpoint:
+        futures = [executor.submit(_export_batch, batch, output_dir, tuple(formats)) for batch in batches]
+        for future in as_completed(futures):
+            for result in future.result():
+                if "error" in result:
+                    failed.append(result)
+                    continue
+                checkpoint.write(dumps(result) + "\n")
+                exported += 1
+            checkpoint.flush()
+            progress(f"[{exported + len(failed)}/{len(pending)}] exported ({time() - start_time:.1f}s)")
+
+    if failed:
+        DataFrame(failed).to_csv(join(output_dir, "failed.csv"), index=False)
+        progress(f"{len(failed)} pairs failed, see {join(output_dir, 'failed.csv')}")
+    progress(f"done: {exported} pairs exported to {output_dir} ({time() - start_time:.1f}s)")
+    return exported, failed
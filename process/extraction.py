@@ -0,0 +1,190 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+import numpy as np
+from pandas import DataFrame
+
+from process import PRECOMPUTE_DIR
+from process.artifacts import (
+    LEONTIEF_COLUMNS_FILE,
+    LEONTIEF_OUTPUT_FILE,
+    build_lock,
+    create_array,
+    derived_version,
+    open_leontief,
+    publish,
+    staging_dir,
+    version_dir,
+    write_manifest
+)
+from process.leontief import io_system, safe_divide
+from process.startup import timeline
+
+# Extracted sectors evaluated per pool task
+EXTRACTION_CHUNK_SIZE = 64
+
+# Per-process state for pool workers, filled by _init_worker
+_worker = {}
+
+
+def build_leontief(data, version, directory=PRECOMPUTE_DIR):
+    """
+    Invert I - A for ``data`` and publish L = (I - A)⁻¹ as ``version``. The
+    one LU factorisation of the whole run happens here; every extraction
+    afterwards is a correction computed from a single column of L.
+    """
+    system = io_system(data["data"])
+    Z, x = system["Z"], system["x"]
+    n = len(x)
+    # I - A in place of Z, as in process.linkages
+    Z *= -safe_divide(1.0, x)[None, :]
+    Z[np.diag_indices(n)] += 1.0
+    with timeline.phase("extraction: invert"):
+        # (I - A)⁻ᵀ = Lᵀ, so column k of L is row k of the stored array
+        inverse = np.linalg.inv(Z.T)
+    del Z
+
+    staging = staging_dir(version, directory)
+    target = version_dir(version, staging)
+    for name, values in ((LEONTIEF_COLUMNS_FILE, inverse), (LEONTIEF_OUTPUT_FILE, x)):
+        array = create_array(name, values.shape, np.float64, target)
+        array[:] = values
+        array.flush()
+    write_manifest({
+        "version": version,
+        "table_version": data["version"],
+        "rows": [str(label) for label in data["data"].index],
+        "artifacts": [LEONTIEF_COLUMNS_FILE, LEONTIEF_OUTPUT_FILE],
+        "figures": []
+    }, target)
+    publish(staging, version, directory)
+
+
+def ensure_leontief(data, directory=PRECOMPUTE_DIR):
+    """Open the Leontief inverse of ``data``, inverting first if needed, under ``build_lock``."""
+    version = derived_version(data["version"], "leontief")
+    leontief = open_leontief(version, directory)
+    if leontief is None:
+        with build_lock(version, directory):
+            leontief = open_leontief(version, directory)
+            if leontief is None:
+                with timeline.phase("build leontief inverse"):
+                    build_leontief(data, version, directory)
+                leontief = open_leontief(version, directory)
+    return leontief
+
+
+def extraction_losses(leontief, positions):
+    """
+    Output lost in every sector when each sector of ``positions`` is
+    extracted, as a (extracted sector, sector) array.
+
+    Complete extraction removes row and column k of A and sector k's final
+    demand, a rank-two change to I - A. By the Schur complement of L_kk,
+    the reduced system's inverse is L₋ₖ₋ₖ - L₋ₖₖ·Lₖ₋ₖ / L_kk, which makes
+    the output lost in sector i ≠ k L_ik·x_k / L_kk, one column of L
+    scaled. Sector k loses all of its output x_k.
+    """
+    positions = np.asarray(positions, dtype=np.intp)
+    rows = np.arange(len(positions))
+    columns = np.asarray(leontief.columns[positions], dtype=np.float64)
+    output = np.asarray(leontief.output, dtype=np.float64)
+    losses = columns * (output[positions] / columns[rows, positions])[:, None]
+    losses[rows, positions] = output[positions]
+    return losses
+
+
+def _init_worker(version, directory):
+    # The inverse is memory-mapped read-only, so every worker shares the
+    # page cache's copy and nothing large is pickled
+    _worker["leontief"] = open_leontief(version, directory)
+
+
+def _summarise_chunk(positions):
+    """One row of the impact table per extracted sector in ``positions``."""
+    leontief = _worker["leontief"]
+    labels = leontief.labels
+    countries = np.array([label.split("_", 1)[0] for label in labels])
+    country_codes, country_pos = np.unique(countries, return_inverse=True)
+    output = np.asarray(leontief.output, dtype=np.float64)
+
+    losses = extraction_losses(leontief, positions)
+    country_losses = np.zeros((len(positions), len(country_codes)))
+    for pos in range(len(country_codes)):
+        country_losses[:, pos] = losses[:, country_pos == pos].sum(axis=1)
+
+    rows = np.arange(len(positions))
+    own_country = country_pos[positions]
+    total = losses.sum(axis=1)
+    domestic = country_losses[rows, own_country]
+    losses[rows, positions] = -np.inf
+    country_losses[rows, own_country] = -np.inf
+    top_sector = losses.argmax(axis=1)
+    top_country = country_losses.argmax(axis=1)
+    return [
+        {
+            "sector": labels[k],
+            "output": output[k],
+            "total_loss": total[row],
+            "loss_share": 100.0 * total[row] / output.sum(),
+            "domestic_spillover": domestic[row] - output[k],
+            "foreign_spillover": total[row] - domestic[row],
+            "most_affected_sector": labels[top_sector[row]],
+            "most_affected_sector_loss": losses[row, top_sector[row]],
+            "most_affected_foreign_country": str(country_codes[top_country[row]]),
+            "most_affected_foreign_country_loss": country_losses[row, top_country[row]]
+        }
+        for row, k in enumerate(positions)
+    ]
+
+
+def run_extractions(leontief, sectors=None, workers=None, directory=PRECOMPUTE_DIR):
+    """
+    Extract each sector of ``sectors`` (labels; all sectors by default) in
+    turn and rank them by the output the world economy loses.
+
+    Chunks of sectors are spread over a process pool whose workers map the
+    published inverse ``leontief`` read-only. Returns a DataFrame with the
+    extracted sector, its own output, the total loss (also as a percentage
+    of world output), the spillover to other sectors at home and abroad,
+    and the hardest-hit other sector and foreign country.
+    """
+    labels = leontief.labels if sectors is None else sectors
+    positions = [leontief.sector(label) for label in labels]
+    chunks = [positions[start:start + EXTRACTION_CHUNK_SIZE]
+              for start in range(0, len(positions), EXTRACTION_CHUNK_SIZE)]
+
+    workers = min(workers or cpu_count() or 1, max(len(chunks), 1))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(leontief.version, directory)) as executor:
+            records = [record for chunk in executor.map(_summarise_chunk, chunks) for record in chunk]
+    else:
+        _worker["leontief"] = leontief
+        records = [record for chunk in chunks for record in _summarise_chunk(chunk)]
+
+    table = DataFrame(records, columns=["sector", "output", "total_loss", "loss_share", "domestic_spillover",
+                                        "foreign_spillover", "most_affected_sector", "most_affected_sector_loss",
+                                        "most_affected_foreign_country", "most_affected_foreign_country_loss"])
+    return table.sort_values("total_loss", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def affected_sectors(leontief, sector, top=20):
+    """
+    The ``top`` sectors that lose the most output when ``sector`` is
+    extracted, with the loss as a percentage of their own output, and the
+    loss per country. Raises ValueError for an unknown sector.
+    """
+    k = leontief.sector(sector)
+    losses = extraction_losses(leontief, [k])[0]
+    losses[k] = 0.0
+    output = np.asarray(leontief.output, dtype=np.float64)
+    frame = DataFrame({
+        "sector": leontief.labels,
+        "loss": losses,
+        "loss_share": 100.0 * safe_divide(losses, output)
+    })
+    frame["country"] = frame["sector"].str.split("_", n=1).str[0]
+    by_country = frame.groupby("country", sort=False)["loss"].sum().sort_values(ascending=False, kind="stable")
+    sectors = frame.drop(columns="country").sort_values("loss", ascending=False, kind="stable").head(top)
+    return sectors.reset_index(drop=True), by_country.reset_index()
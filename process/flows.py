@@ -0,0 +1,209 @@
+import numpy as np
+from pandas import DataFrame
+
+from process import FLOW_INDEX_SIZE, PRECOMPUTE_DIR
+from process.artifacts import (
+    COUNTRY_FLOWS_FILE,
+    FLOW_CELLS_FILE,
+    FLOW_VALUES_FILE,
+    FlowIndex,
+    build_lock,
+    create_array,
+    derived_version,
+    open_flow_index,
+    publish,
+    staging_dir,
+    version_dir,
+    write_manifest
+)
+from process.cache import LRUCache
+from process.instrument import extraction
+from process.startup import timeline
+
+# In-memory indexes of tables without a published one (aggregated groupings), by data version
+flows_cache = LRUCache(4)
+
+# Supplier rows scanned at a time, so only one block of the matrix is ever copied
+FLOW_CHUNK_ROWS = 256
+
+
+def _merge_top(values, cells, new_values, new_cells, size):
+    """The ``size`` largest of two candidate sets, unsorted."""
+    values = np.concatenate([values, new_values])
+    cells = np.concatenate([cells, new_cells])
+    if len(values) > size:
+        keep = np.argpartition(-values, size - 1)[:size]
+        values, cells = values[keep], cells[keep]
+    return values, cells
+
+
+def compute_flow_index(df, size=FLOW_INDEX_SIZE, chunk_rows=FLOW_CHUNK_ROWS):
+    """
+    Scan the sector-by-sector block of a ``load_data`` table once, in row
+    chunks, and keep the ``size`` largest cross-border flows into each
+    buyer industry plus the flows summed per (industry, supplier country,
+    buyer country). Flows within a country are left out.
+
+    Returns the arrays and labels of a ``FlowIndex``; the top flows of all
+    industries together are merged from the per-industry ones, which
+    always contain them.
+    """
+    labels = [str(label) for label in df.index]
+    sector_cols = df.columns.get_indexer(df.index)
+    if (sector_cols < 0).any():
+        raise ValueError(f"Column {df.index[np.argmax(sector_cols < 0)]} not found in DataFrame")
+    sector_countries = [label.split("_", 1)[0] for label in labels]
+    sector_industries = [label.split("_", 1)[1] if "_" in label else "" for label in labels]
+    countries = list(dict.fromkeys(sector_countries))
+    industries = list(dict.fromkeys(sector_industries))
+    country_pos = np.array([countries.index(code) for code in sector_countries])
+    industry_pos = np.array([industries.index(code) for code in sector_industries])
+    n, n_countries, n_industries = len(labels), len(countries), len(industries)
+
+    # Buyer columns grouped by industry, so each industry is one contiguous slice of the block
+    order = np.argsort(industry_pos, kind="stable")
+    bounds = np.searchsorted(industry_pos[order], np.arange(n_industries + 1))
+    # Flat (industry, supplier country, buyer country) keys: the buyer's part here, the supplier's per row
+    buyer_keys = industry_pos * n_countries * n_countries + country_pos
+
+    top = [(np.zeros(0), np.zeros(0, dtype=np.int64)) for _ in range(n_industries)]
+    country_flows = np.zeros(n_industries * n_countries * n_countries)
+    values = df.to_numpy()
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        block = np.asarray(values[start:stop][:, sector_cols[order]], dtype=np.float64)
+        block[country_pos[start:stop, None] == country_pos[order][None, :]] = 0.0
+        np.maximum(block, 0.0, out=block)
+        keys = buyer_keys[order][None, :] + country_pos[start:stop, None] * n_countries
+        country_flows += np.bincount(keys.ravel(), weights=block.ravel(), minlength=country_flows.size)
+        for industry in range(n_industries):
+            part = block[:, bounds[industry]:bounds[industry + 1]].ravel()
+            k = min(size, part.size)
+            if not k:
+                continue
+            best = np.argpartition(-part, k - 1)[:k]
+            width = bounds[industry + 1] - bounds[industry]
+            cells = (start + best // width) * n + order[bounds[industry] + best % width]
+            top[industry] = _merge_top(*top[industry], part[best], cells, size)
+
+    all_values = np.concatenate([flow_values for flow_values, _ in top])
+    all_cells = np.concatenate([cells for _, cells in top])
+    top.append(_merge_top(all_values[:0], all_cells[:0], all_values, all_cells, size))
+
+    top_cells = np.full((n_industries + 1, size, 2), -1, dtype=np.int32)
+    top_values = np.zeros((n_industries + 1, size))
+    for row, (flow_values, cells) in enumerate(top):
+        ranked = np.argsort(-flow_values, kind="stable")
+        ranked = ranked[flow_values[ranked] > 0]
+        top_values[row, :len(ranked)] = flow_values[ranked]
+        top_cells[row, :len(ranked), 0] = cells[ranked] // n
+        top_cells[row, :len(ranked), 1] = cells[ranked] % n
+
+    country_flows = country_flows.reshape(n_industries, n_countries, n_countries)
+    return {
+        "cells": top_cells,
+        "values": top_values,
+        "country_flows": np.concatenate([country_flows, country_flows.sum(axis=0, keepdims=True)]),
+        "labels": labels,
+        "industries": industries,
+        "countries": countries
+    }
+
+
+def build_flow_index(data, version, directory=PRECOMPUTE_DIR):
+    """Index the flows of ``data`` and publish the index as ``version``."""
+    with timeline.phase("flows: scan"):
+        index = compute_flow_index(data["data"])
+    staging = staging_dir(version, directory)
+    target = version_dir(version, staging)
+    for name, key, dtype in ((FLOW_CELLS_FILE, "cells", np.int32), (FLOW_VALUES_FILE, "values", np.float64),
+                             (COUNTRY_FLOWS_FILE, "country_flows", np.float64)):
+        array = create_array(name, index[key].shape, dtype, target)
+        array[:] = index[key]
+        array.flush()
+    write_manifest({
+        "version": version,
+        "table_version": data["version"],
+        "rows": index["labels"],
+        "industries": index["industries"],
+        "countries": index["countries"],
+        "artifacts": [FLOW_CELLS_FILE, FLOW_VALUES_FILE, COUNTRY_FLOWS_FILE],
+        "figures": []
+    }, target)
+    publish(staging, version, directory)
+
+
+def ensure_flow_index(data, directory=PRECOMPUTE_DIR):
+    """Open the flow index of ``data``, scanning the table first if needed, under ``build_lock``."""
+    version = derived_version(data["version"], "flows")
+    flows = open_flow_index(version, directory)
+    if flows is None:
+        with build_lock(version, directory):
+            flows = open_flow_index(version, directory)
+            if flows is None:
+                with timeline.phase("build flow index"):
+                    build_flow_index(data, version, directory)
+                flows = open_flow_index(version, directory)
+    return flows
+
+
+def flow_index(data):
+    """
+    The ``FlowIndex`` of ``data``: the published one, or for tables
+    without one (aggregated groupings, or a table ``python cli.py
+    precompute`` has not indexed yet) an index built in memory and kept
+    in ``flows_cache``.
+    """
+    if data.get("flows") is not None:
+        return data["flows"]
+
+    def build():
+        index = compute_flow_index(data["data"])
+        return FlowIndex(index["cells"], index["values"], index["country_flows"], data["version"],
+                         index["labels"], index["industries"], index["countries"])
+    return flows_cache.get_or_compute((data["version"],), build)
+
+
+@extraction
+def top_flows(index, industry=None, count=FLOW_INDEX_SIZE):
+    """
+    The ``count`` largest cross-border flows into buyer ``industry`` (all
+    industries when None), largest first, read from the index. Raises
+    ValueError for an unknown industry.
+    """
+    row = index.industry(industry)
+    values = np.asarray(index.values[row, :count])
+    cells = np.asarray(index.cells[row, :count])[values > 0]
+    labels = np.asarray(index.labels)
+    sources, targets = labels[cells[:, 0]], labels[cells[:, 1]]
+    return DataFrame({
+        "source": sources,
+        "target": targets,
+        "source_country": [label.split("_", 1)[0] for label in sources],
+        "source_industry": [label.split("_", 1)[1] for label in sources],
+        "target_country": [label.split("_", 1)[0] for label in targets],
+        "target_industry": [label.split("_", 1)[1] for label in targets],
+        "value": values[values > 0]
+    })
+
+
+@extraction
+def top_country_flows(index, industry=None, count=FLOW_INDEX_SIZE):
+    """
+    The ``count`` largest supplier-country to buyer-country totals of
+    intermediate flows into ``industry`` (all industries when None),
+    largest first. Raises ValueError for an unknown industry.
+    """
+    matrix = np.asarray(index.country_flows[index.industry(industry)])
+    flat = matrix.ravel()
+    count = min(count, int((flat > 0).sum()))
+    if not count:
+        return DataFrame(columns=["source_country", "target_country", "value"])
+    best = np.argpartition(-flat, count - 1)[:count]
+    best = best[np.argsort(-flat[best], kind="stable")]
+    countries = np.asarray(index.countries)
+    return DataFrame({
+        "source_country": countries[best // len(countries)],
+        "target_country": countries[best % len(countries)],
+        "value": flat[best]
+    })
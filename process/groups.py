@@ -0,0 +1,210 @@
+from hashlib import sha1
+from json import dumps, load
+
+import numpy as np
+from pandas import DataFrame
+
+from process import COUNTRY_COORDS, GROUPED_CACHE_SIZE, GROUPINGS_PATH
+from process.cache import LRUCache
+
+# Aggregated datasets by (table version, grouping, spec digest)
+grouped_cache = LRUCache(GROUPED_CACHE_SIZE)
+
+# Rows of the source matrix summed at a time, so only one block is ever copied
+AGGREGATE_CHUNK_ROWS = 1024
+
+
+def read_groupings(path=GROUPINGS_PATH):
+    """
+    The grouping spec file: ``country_groups`` and ``industry_groups`` map a
+    group code to its ``name`` and ``members``, and ``groupings`` names
+    combinations of them (``label``, ``countries``, ``industries``).
+    """
+    try:
+        with open(path) as fid:
+            return load(fid)
+    except FileNotFoundError:
+        return {}
+
+
+def load_groupings(path=GROUPINGS_PATH):
+    """
+    Every grouping in the spec file, resolved to
+    ``{"label", "countries": {group: {"name", "members"}}, "industries": {...}}``.
+
+    Raises ValueError for a spec that cannot be applied: an unknown group,
+    a group code containing "_" (labels are split on the first one) or a
+    code that belongs to two groups of the same grouping.
+    """
+    spec = read_groupings(path)
+    groupings = {}
+    for name, grouping in spec.get("groupings", {}).items():
+        resolved = {"label": grouping.get("label", name)}
+        for kind, source in (("countries", "country_groups"), ("industries", "industry_groups")):
+            groups, seen = {}, set()
+            for code in grouping.get(kind, []):
+                if code not in spec.get(source, {}):
+                    raise ValueError(f"Grouping '{name}' uses unknown {kind[:-3]}y group '{code}'")
+                if "_" in code:
+                    raise ValueError(f"Group code '{code}' must not contain '_'")
+                members = spec[source][code]["members"]
+                if seen.intersection(members):
+                    raise ValueError(f"Grouping '{name}' puts {sorted(seen.intersection(members))} in two groups")
+                seen.update(members)
+                groups[code] = {"name": spec[source][code].get("name", code), "members": list(members)}
+            resolved[kind] = groups
+        groupings[name] = resolved
+    return groupings
+
+
+def grouping_options(path=GROUPINGS_PATH):
+    """Dropdown options for the groupings in the spec file."""
+    return [{"label": grouping["label"], "value": name} for name, grouping in load_groupings(path).items()]
+
+
+def spec_digest(grouping):
+    """Short hash of a resolved grouping, so editing the spec file gives new cache keys."""
+    return sha1(dumps(grouping, sort_keys=True).encode()).hexdigest()[:8]
+
+
+def member_map(groups):
+    """{member code: group code} for ``{group: {"members": [...]}}``."""
+    return {member: code for code, group in groups.items() for member in group["members"]}
+
+
+def regroup_code(code, codes, groups):
+    """
+    ``code`` as it should be selected among ``codes`` after the grouping
+    changed: itself if present, else the group containing it, else the first
+    present member of the group it names, else the first of ``codes``.
+    ``groups`` holds every group of the spec (``{group: {"members": [...]}}``).
+    """
+    if code in codes:
+        return code
+    group = member_map(groups).get(code)
+    if group in codes:
+        return group
+    members = groups.get(code, {}).get("members", [])
+    return next((member for member in members if member in codes), codes[0] if codes else None)
+
+
+class Aggregation:
+    """
+    A sparse 0/1 aggregation matrix S mapping source labels to group labels.
+
+    Every source label belongs to exactly one group, so S is stored by its
+    columns: ``index[j]`` is the row (group) of source label ``j``, the CSR
+    layout of Sᵀ with implicit ones. ``labels`` are the group labels in
+    order of first appearance.
+    """
+
+    def __init__(self, labels, index):
+        self.labels = labels
+        self.index = np.asarray(index, dtype=np.intp)
+        # Sorting the sources by group once turns every product with S into segment sums
+        self._order = np.argsort(self.index, kind="stable")
+        self._starts = np.searchsorted(self.index[self._order], np.arange(len(labels)))
+        self.identity = len(labels) == len(self.index) and bool((self.index == np.arange(len(labels))).all())
+
+    @classmethod
+    def from_labels(cls, source_labels, countries, industries):
+        """
+        S for ``CTRY_IND`` labels, with ``countries`` and ``industries``
+        mapping member codes to group codes. Codes outside any group, and
+        suffixes that are not industries (final demand), are kept as they are.
+        """
+        positions, index = {}, []
+        for label in source_labels:
+            country, _, suffix = str(label).partition("_")
+            group = f"{countries.get(country, country)}_{industries.get(suffix, suffix)}"
+            index.append(positions.setdefault(group, len(positions)))
+        return cls(list(positions), index)
+
+    def sum(self, values, axis):
+        """S·values (``axis=0``) or values·Sᵀ (``axis=1``)."""
+        if self.identity:
+            return values
+        return np.add.reduceat(np.take(values, self._order, axis=axis), self._starts, axis=axis)
+
+
+def aggregate_matrix(values, rows, columns, chunk_rows=AGGREGATE_CHUNK_ROWS):
+    """
+    rows·values·columnsᵀ for ``Aggregation`` objects ``rows`` and ``columns``.
+    Columns are summed first, one block of source rows at a time, so the
+    source matrix (which may be memory-mapped) is never copied whole.
+    """
+    reduced = np.empty((len(values), len(columns.labels)))
+    for start in range(0, len(values), chunk_rows):
+        block = np.asarray(values[start:start + chunk_rows], dtype=float)
+        reduced[start:start + chunk_rows] = columns.sum(block, axis=1)
+    return rows.sum(reduced, axis=0)
+
+
+def aggregate_frame(frame, groups, code_column, name_column):
+    """
+    A metadata frame with the members of each group replaced by one row for
+    the group, at the position of its first member. Numeric columns (e.g.
+    coordinates) are averaged and other columns take the first member's value.
+    """
+    mapping = member_map(groups)
+    keys = frame[code_column].astype(str).map(lambda code: mapping.get(code, code))
+    aggregated = frame.groupby(keys.to_numpy(), sort=False).agg({
+        col: "mean" if frame[col].dtype.kind in "fi" else "first" for col in frame.columns
+    })
+    aggregated[code_column] = aggregated.index
+    for code, group in groups.items():
+        if code in aggregated.index:
+            aggregated.loc[code, name_column] = group["name"]
+    return aggregated.reset_index(drop=True)
+
+
+def register_group_coordinates(groups):
+    """Place each country group on the map at the mean position of its members."""
+    for code, group in groups.items():
+        coords = [COUNTRY_COORDS[member] for member in group["members"] if member in COUNTRY_COORDS]
+        if coords:
+            COUNTRY_COORDS.setdefault(code, [float(np.mean([c[0] for c in coords])),
+                                             float(np.mean([c[1] for c in coords]))])
+
+
+def _aggregate(data, grouping, version):
+    df = data["data"]
+    countries, industries = member_map(grouping["countries"]), member_map(grouping["industries"])
+    rows = Aggregation.from_labels(df.index, countries, industries)
+    columns = Aggregation.from_labels(df.columns, countries, industries)
+
+    aggregated = DataFrame(aggregate_matrix(df.to_numpy(), rows, columns),
+                           index=rows.labels, columns=columns.labels, copy=False)
+    aggregated.attrs["data_version"] = version
+    register_group_coordinates(grouping["countries"])
+    return {
+        **data,
+        "data": aggregated,
+        "metadata": aggregate_frame(data["metadata"], grouping["industries"], "Code", "Industry"),
+        "all_countries": aggregate_frame(data["all_countries"], grouping["countries"], "Code", "countries"),
+        "version": version,
+        # Precomputed blocks, sector tables and the flow index are per raw sector; heatmaps gather from the
+        # aggregated frame and process.flows indexes it in memory
+        "heatmap_blocks": None,
+        "linkages": None,
+        "centrality": None,
+        "flows": None,
+        "grouping": grouping
+    }
+
+
+def aggregate_data(data, name, path=GROUPINGS_PATH):
+    """
+    ``data`` (a ``load_data`` dict) aggregated by the grouping ``name``: the
+    table as S·Z·Sᵀ, where S sums the members of each country and industry
+    group, with matching metadata. Every view takes the result in place of
+    the raw dataset. Its version, ``<table version>/<name>-<spec digest>``,
+    keys the figure and extraction caches, and the aggregated table itself
+    is kept in ``grouped_cache`` until the table version is discarded.
+    Raises KeyError for an unknown grouping.
+    """
+    grouping = load_groupings(path)[name]
+    digest = spec_digest(grouping)
+    version = f"{data['version']}/{name}-{digest}"
+    return grouped_cache.get_or_compute((data["version"], name, digest),
+                                        lambda: _aggregate(data, grouping, version))
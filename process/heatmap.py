@@ -4,28 +4,52 @@ import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+from process.instrument import extraction
 
 def strip_country(label):
     return label.split("_", 1)[1] if "_" in label else label
 
-def create_heatmap(
+@extraction
+def heatmap_block(
     df: pd.DataFrame,
     df_metadata: pd.DataFrame,
     selected_country: str,
     reference_country: str,
-    use_log: str = "linear"
-) -> go.Figure:
-
+    blocks=None
+) -> pd.DataFrame:
+    """
+    Flows from the industries of ``selected_country`` (rows) to the
+    industries of ``reference_country`` (columns), in metadata order.
+    ``blocks`` is an optional ``HeatmapBlocks`` reader over precomputed
+    country blocks; without it the submatrix is gathered from ``df``.
+    """
     # Generate index and column labels for the heatmap
     industries = df_metadata['Code'].tolist()
     row_labels = [f"{selected_country}_{industry}" for industry in industries]
     col_labels = [f"{reference_country}_{industry}" for industry in industries]
 
     # Extract submatrix for heatmap (vectorized)
-    heatmap_data = df.loc[row_labels, col_labels].astype(float)
+    block = blocks.get(selected_country, reference_country) if blocks is not None else None
+    if block is not None:
+        return pd.DataFrame(np.asarray(block, dtype=float), index=row_labels, columns=col_labels)
+    return df.loc[row_labels, col_labels].astype(float)
 
-    col_labels_reversed = col_labels[::-1]
-    heatmap_data = heatmap_data[col_labels_reversed]
+
+def heatmap_values(
+    df: pd.DataFrame,
+    df_metadata: pd.DataFrame,
+    selected_country: str,
+    reference_country: str,
+    use_log: str = "linear",
+    blocks=None
+) -> pd.DataFrame:
+    """
+    The block ``create_heatmap`` draws: columns reversed, and log-scaled
+    when ``use_log`` is "log". Switching the scale of a drawn heatmap only
+    needs these values and their range.
+    """
+    heatmap_data = heatmap_block(df, df_metadata, selected_country, reference_country, blocks=blocks)
+    heatmap_data = heatmap_data[list(heatmap_data.columns)[::-1]]
 
     # Handle missing values by filling with zeros (or np.nan if preferred)
     # heatmap_data = heatmap_data.fillna(0)
@@ -33,6 +57,21 @@ def create_heatmap(
     # Apply log scaling if requested
     if use_log == "log":
         heatmap_data = np.log1p(heatmap_data)
+    return heatmap_data
+
+
+def create_heatmap(
+    df: pd.DataFrame,
+    df_metadata: pd.DataFrame,
+    selected_country: str,
+    reference_country: str,
+    use_log: str = "linear",
+    blocks=None
+) -> go.Figure:
+
+    heatmap_data = heatmap_values(df, df_metadata, selected_country, reference_country, use_log, blocks=blocks)
+    row_labels = list(heatmap_data.index)
+    col_labels_reversed = list(heatmap_data.columns)
 
     # Prepare hovertemplate for better readability
     hovertemplate = (
@@ -0,0 +1,131 @@
+from os.path import getsize
+from time import perf_counter
+
+import numpy as np
+from pandas import read_csv
+
+from process import INGEST_CHUNK_BYTES, INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE, PRECOMPUTE_DIR
+from process.artifacts import DATA_FILE, create_array, publish, read_manifest, staging_dir, version_dir, write_manifest
+from process.memory import process_rss, reset_peak_rss
+
+# Row label column of the OECD ICIO CSV
+LABEL_COLUMN = "V1"
+# Rows below the inter-industry block: taxes less subsidies, value added, output
+ACCOUNT_ROWS = ("TLS", "VA", "OUT")
+
+
+def table_columns(table_path, countries):
+    """Columns ``load_data`` keeps: those starting with a country code, in file order."""
+    header = read_csv(table_path, nrows=0).columns
+    return [col for col in header if col != LABEL_COLUMN and col.startswith(countries)]
+
+
+def table_rows(table_path, countries):
+    """
+    Row labels ``load_data`` keeps, read without parsing any values, and
+    the total number of rows in the file.
+    """
+    labels = read_csv(table_path, usecols=[LABEL_COLUMN], dtype={LABEL_COLUMN: str})[LABEL_COLUMN]
+    return labels[labels.str.startswith(countries, na=False)].tolist(), len(labels)
+
+
+def table_accounts(table_path, countries, labels=ACCOUNT_ROWS):
+    """
+    The account rows ``load_data`` drops (e.g. value added and output),
+    over the columns it keeps. Only their lines are parsed: every other
+    line of the file is skipped before tokenising.
+    """
+    columns = table_columns(table_path, countries)
+    all_labels = read_csv(table_path, usecols=[LABEL_COLUMN], dtype={LABEL_COLUMN: str})[LABEL_COLUMN]
+    # Line 0 is the header; data line i is row i - 1
+    wanted = set((np.flatnonzero(all_labels.isin(labels).to_numpy()) + 1).tolist())
+    dtypes = dict.fromkeys(columns, np.float64)
+    dtypes[LABEL_COLUMN] = str
+    accounts = read_csv(table_path, usecols=[LABEL_COLUMN] + columns, index_col=LABEL_COLUMN, dtype=dtypes,
+                        skiprows=lambda line: line > 0 and line not in wanted)
+    accounts.index.name = None
+    return accounts
+
+
+def ingest_table(table_path, directory, version, countrycode_path=INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE,
+                 dtype=np.float64, chunk_bytes=INGEST_CHUNK_BYTES, progress=None):
+    """
+    Stream the IO table at ``table_path`` into a data cache in ``directory``
+    (the files ``save_data_cache`` writes) without building the table in
+    memory.
+
+    A first pass reads only the row labels to size the matrix, which is
+    preallocated as the ``.npy`` file workers memory-map. The second pass
+    parses chunks of about ``chunk_bytes`` of CSV text with every value
+    column declared float, drops the rows and columns ``load_data``
+    filters out and writes each chunk's rows to their place in the file.
+    Positional writes keep the written pages out of this process's RSS,
+    where a writable mapping would accumulate them, so peak memory is one
+    chunk plus the labels, whatever the size of the table. The manifest
+    is returned with ``ingest`` statistics, including peak RSS.
+    """
+    start = perf_counter()
+    reset_peak_rss()
+    countries = tuple(read_csv(countrycode_path)["Code"])
+    columns = table_columns(table_path, countries)
+    rows, n_lines = table_rows(table_path, countries)
+    # While parsing a chunk pandas holds its text, a pointer per field, the
+    # parsed columns and the 2-D copy written out
+    row_bytes = getsize(table_path) // max(n_lines, 1) + 3 * 8 * len(columns)
+    chunk_rows = max(1, chunk_bytes // row_bytes)
+
+    matrix = create_array(DATA_FILE, (len(rows), len(columns)), dtype, directory)
+    offset, path = matrix.offset, matrix.filename
+    del matrix
+    dtypes = dict.fromkeys(columns, np.float64)
+    dtypes[LABEL_COLUMN] = str
+    filled = 0
+    with open(path, "r+b") as fid:
+        for chunk in read_csv(table_path, usecols=[LABEL_COLUMN] + columns, index_col=LABEL_COLUMN,
+                              dtype=dtypes, chunksize=chunk_rows):
+            keep = chunk.index.str.startswith(countries, na=False)
+            values = chunk.to_numpy(dtype=dtype)
+            block = values if keep.all() else values[keep]
+            fid.seek(offset + filled * block.itemsize * len(columns))
+            fid.write(np.ascontiguousarray(block).data)
+            filled += len(block)
+            # Free this chunk before the next one is parsed rather than after
+            del chunk, values, block
+            if progress is not None:
+                progress(f"{filled}/{len(rows)} rows ({perf_counter() - start:.1f}s)")
+
+    manifest = {
+        "version": version,
+        "rows": rows,
+        "columns": columns,
+        "artifacts": [DATA_FILE],
+        "figures": [],
+        "ingest": {
+            "seconds": perf_counter() - start,
+            "chunk_rows": chunk_rows,
+            "matrix_bytes": len(rows) * len(columns) * np.dtype(dtype).itemsize,
+            "peak_rss": process_rss()["peak"]
+        }
+    }
+    write_manifest(manifest, directory)
+    return manifest
+
+
+def ingest_data_cache(table_path, version, directory=PRECOMPUTE_DIR, replace=False, **kwargs):
+    """
+    ``ingest_table`` into a staging directory, published as ``version``.
+    Callers hold ``build_lock(version, directory)``.
+
+    Publishing replaces the whole ``version`` directory, including the
+    top-K index, heatmap blocks and figures ``run_precompute`` added to it,
+    so an existing version raises FileExistsError unless ``replace``.
+    """
+    manifest = read_manifest(version_dir(version, directory))
+    if manifest is not None and manifest["version"] == version and not replace:
+        raise FileExistsError(f"Artifacts for {version} already exist in {version_dir(version, directory)} "
+                              f"({', '.join(manifest['artifacts'])}); replacing them drops everything but the "
+                              f"data cache")
+    staging = staging_dir(version, directory)
+    manifest = ingest_table(table_path, version_dir(version, staging), version, **kwargs)
+    publish(staging, version, directory)
+    return manifest
@@ -0,0 +1,145 @@
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock, local
+from time import perf_counter
+
+from process.profiling import run_profiled, should_profile
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+# Per-thread state of the callback currently running on this request thread
+_state = local()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """Return (cumulative bucket counts incl. +Inf, sum, count)."""
+        with self._lock:
+            cumulative, total = [], 0
+            for count in self.counts:
+                total += count
+                cumulative.append(total)
+            return cumulative, self.sum, self.count
+
+
+class CallbackMetrics:
+    """
+    Latency and payload histograms per Dash callback.
+
+    ``seconds`` is the callback wall time, split into ``extract_seconds``
+    (time inside functions marked with ``extraction``) and
+    ``figure_seconds`` (everything else, i.e. Plotly figure construction).
+    ``response_bytes`` is the size of the serialised callback response.
+    Metrics are per process; each worker reports its own.
+    """
+
+    SERIES = {
+        "seconds": LATENCY_BUCKETS,
+        "extract_seconds": LATENCY_BUCKETS,
+        "figure_seconds": LATENCY_BUCKETS,
+        "response_bytes": BYTES_BUCKETS,
+    }
+
+    def __init__(self):
+        self.histograms = {}
+        self.errors = {}
+        self._lock = Lock()
+
+    def histogram(self, callback, series):
+        with self._lock:
+            key = (callback, series)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.SERIES[series])
+            return self.histograms[key]
+
+    def record_error(self, callback):
+        with self._lock:
+            self.errors[callback] = self.errors.get(callback, 0) + 1
+
+    def callbacks(self):
+        with self._lock:
+            return sorted({callback for callback, _ in self.histograms} | set(self.errors))
+
+
+callback_metrics = CallbackMetrics()
+
+
+def extraction(func):
+    """
+    Mark ``func`` as data extraction, so its time is reported separately
+    from figure construction. Nested extraction calls count once.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_state, "callback", None) is None or getattr(_state, "extract_depth", 0):
+            return func(*args, **kwargs)
+        _state.extract_depth = 1
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _state.extract_seconds += perf_counter() - start
+            _state.extract_depth = 0
+    return wrapper
+
+
+def instrument(name):
+    """
+    Record wall time, and its extraction/figure split, for a Dash callback.
+    Callbacks selected by ``process.profiling.should_profile`` also run
+    under cProfile.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            _state.callback = name
+            _state.extract_seconds = 0.0
+            _state.extract_depth = 0
+            start = perf_counter()
+            try:
+                if should_profile(name):
+                    return run_profiled(name, func, args, kwargs)
+                return func(*args, **kwargs)
+            except Exception as exc:
+                # PreventUpdate is flow control, not a failure
+                if type(exc).__name__ != "PreventUpdate":
+                    callback_metrics.record_error(name)
+                raise
+            finally:
+                elapsed = perf_counter() - start
+                callback_metrics.histogram(name, "seconds").observe(elapsed)
+                callback_metrics.histogram(name, "extract_seconds").observe(_state.extract_seconds)
+                callback_metrics.histogram(name, "figure_seconds").observe(elapsed - _state.extract_seconds)
+                # Left set so the response hook can attribute the payload size
+                _state.finished = name
+                _state.callback = None
+        return wrapper
+    return decorator
+
+
+def record_response_bytes(size):
+    """Attribute a response size to the callback that just ran on this thread."""
+    name = getattr(_state, "finished", None)
+    if name is not None:
+        callback_metrics.histogram(name, "response_bytes").observe(size)
+        _state.finished = None
+
+
+def reset_response_tracking():
+    _state.finished = None
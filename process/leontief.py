@@ -0,0 +1,66 @@
+import numpy as np
+
+
+def io_system(df):
+    """
+    The parts of the Leontief model in a ``load_data`` table.
+
+    Sectors are the row labels (``CTRY_IND``). ``Z`` is the sector-by-sector
+    block of intermediate use. ``F`` is final demand summed per destination
+    country over its final-demand columns (``CTRY_HFCE``, ``CTRY_GFCF``,
+    ...). ``x`` is gross output as row totals, so ``Z·1 + F·1 = x`` holds
+    exactly. ``country_pos`` gives each sector's country as a position in
+    ``countries``.
+    """
+    sectors = list(df.index)
+    positions = {label: pos for pos, label in enumerate(df.columns)}
+    missing = [label for label in sectors if label not in positions]
+    if missing:
+        raise ValueError(f"Column {missing[0]} not found in DataFrame")
+    sector_cols = np.array([positions[label] for label in sectors])
+    sector_set = set(sectors)
+    final_cols = np.array([pos for label, pos in positions.items() if label not in sector_set], dtype=np.intp)
+
+    values = df.to_numpy()
+    # Fancy indexing already copies; a float64 table is not copied again
+    Z = np.asarray(values[:, sector_cols], dtype=np.float64)
+    sector_countries = [label.split("_", 1)[0] for label in sectors]
+    countries = list(dict.fromkeys(sector_countries))
+    country_ids = {country: pos for pos, country in enumerate(countries)}
+    country_pos = np.array([country_ids[country] for country in sector_countries])
+
+    F = np.zeros((len(sectors), len(countries)))
+    final_values = np.asarray(values[:, final_cols], dtype=np.float64)
+    for pos, col in enumerate(final_cols):
+        destination = country_ids.get(str(df.columns[col]).split("_", 1)[0])
+        if destination is not None:
+            F[:, destination] += final_values[:, pos]
+
+    return {
+        "sectors": sectors,
+        "countries": countries,
+        "country_pos": country_pos,
+        "Z": Z,
+        "F": F,
+        "x": Z.sum(axis=1) + F.sum(axis=1)
+    }
+
+
+def safe_divide(numerator, denominator):
+    """``numerator / denominator`` with zero where the denominator is zero (sectors without output)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator != 0, numerator / np.where(denominator != 0, denominator, 1), 0.0)
+
+
+def leontief_matrix(Z, x):
+    """I - A, with A = Z·diag(x)⁻¹ the technical coefficients, built in one array."""
+    matrix = -safe_divide(Z, x[None, :])
+    matrix[np.diag_indices_from(matrix)] += 1.0
+    return matrix
+
+
+def country_indicator(country_pos, n_countries):
+    """(sector, country) 0/1 matrix putting each sector in its country."""
+    indicator = np.zeros((len(country_pos), n_countries))
+    indicator[np.arange(len(country_pos)), country_pos] = 1.0
+    return indicator
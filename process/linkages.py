@@ -0,0 +1,111 @@
+import numpy as np
+
+from process import PRECOMPUTE_DIR
+from process.artifacts import (
+    LINKAGES_FILE,
+    build_lock,
+    create_array,
+    derived_version,
+    open_sector_table,
+    publish,
+    staging_dir,
+    version_dir,
+    write_manifest
+)
+from process.leontief import io_system, safe_divide
+from process.startup import timeline
+
+# Columns of the linkages table, in order
+LINKAGE_MEASURES = [
+    "output",
+    "output_multiplier",
+    "backward_linkage",
+    "forward_linkage",
+    "upstreamness"
+]
+
+
+def compute_linkages(df):
+    """
+    Position of every sector of a ``load_data`` table in the value chain,
+    as a (sector, measure) array of ``LINKAGE_MEASURES``:
+
+    - output multiplier: column sums of the Leontief inverse, 1ᵀ(I - A)⁻¹,
+      i.e. the output needed across all sectors per unit of final demand
+      (Miller-Temurshoev downstreamness);
+    - backward linkage: the multiplier relative to the average sector;
+    - upstreamness: row sums of the Ghosh inverse, (I - B)⁻¹·1 with
+      B = diag(x)⁻¹·Z, Antràs et al.'s average number of production stages
+      between a sector and final demand (1 = sells only to final demand);
+    - forward linkage: upstreamness relative to the average sector.
+
+    Each is one ``solve`` with a single right-hand side; no inverse is
+    formed. Sectors without output get NaN and are left out of the averages.
+    """
+    system = io_system(df)
+    Z, x = system["Z"], system["x"]
+    n = len(x)
+    active = x > 0
+    ones = np.ones(n)
+
+    with timeline.phase("linkages: solve"):
+        # I - A and then I - B are built in place of Z, so the only other
+        # copy of the matrix is the one ``solve`` factorises
+        scale = safe_divide(1.0, x)
+        Z *= -scale[None, :]
+        Z[np.diag_indices(n)] += 1.0
+        multiplier = np.linalg.solve(Z.T, ones)
+        # -A·diag(x) = -Z, then diag(x)⁻¹·(-Z) = -B
+        Z[np.diag_indices(n)] -= 1.0
+        Z *= x[None, :]
+        Z *= scale[:, None]
+        Z[np.diag_indices(n)] += 1.0
+        upstreamness = np.linalg.solve(Z, ones)
+    del Z
+
+    multiplier[~active] = np.nan
+    upstreamness[~active] = np.nan
+    return np.column_stack([
+        x,
+        multiplier,
+        multiplier / np.nanmean(multiplier),
+        upstreamness / np.nanmean(upstreamness),
+        upstreamness
+    ])
+
+
+def build_linkages(data, version, directory=PRECOMPUTE_DIR):
+    """Compute the linkages of ``data`` and publish them as ``version``."""
+    values = compute_linkages(data["data"])
+    staging = staging_dir(version, directory)
+    target = version_dir(version, staging)
+    array = create_array(LINKAGES_FILE, values.shape, np.float64, target)
+    array[:] = values
+    array.flush()
+    write_manifest({
+        "version": version,
+        "table_version": data["version"],
+        "rows": [str(label) for label in data["data"].index],
+        "measures": LINKAGE_MEASURES,
+        "artifacts": [LINKAGES_FILE],
+        "figures": []
+    }, target)
+    publish(staging, version, directory)
+
+
+def ensure_linkages(data, directory=PRECOMPUTE_DIR):
+    """
+    Open the linkages table of ``data``, computing it first if needed. One
+    process builds it under ``build_lock`` while the others wait and then
+    map the result, so no request ever solves.
+    """
+    version = derived_version(data["version"], "linkages")
+    linkages = open_sector_table(version, LINKAGES_FILE, directory)
+    if linkages is None:
+        with build_lock(version, directory):
+            linkages = open_sector_table(version, LINKAGES_FILE, directory)
+            if linkages is None:
+                with timeline.phase("build linkages"):
+                    build_linkages(data, version, directory)
+                linkages = open_sector_table(version, LINKAGES_FILE, directory)
+    return linkages
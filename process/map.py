@@ -3,7 +3,36 @@ import pandas as pd
 import plotly.graph_objects as go
 
 from process import COUNTRY_COORDS
-from process.utils import calculate_risk_index, quadratic_bezier, obtain_inputs
+from process.utils import calculate_risk_index, obtain_inputs
+
+# Columns identifying the start and end points of a link; links sharing them are drawn side by side
+LINK_KEYS = ['start_lon', 'start_lat', 'end_lon', 'end_lat']
+
+
+def arc_paths(start_lon, start_lat, end_lon, end_lat, offsets, num_points=50):
+    """
+    Latitude and longitude points of many curved links at once, as
+    (link, point) arrays: quadratic Bezier curves whose control point sits
+    ``offsets`` away from the midpoint, perpendicular to each link.
+    """
+    start_lon, start_lat, end_lon, end_lat, offsets = (
+        np.asarray(values, dtype=float)[:, None] for values in (start_lon, start_lat, end_lon, end_lat, offsets)
+    )
+    dx, dy = end_lon - start_lon, end_lat - start_lat
+    length = np.hypot(dx, dy)
+    safe_length = np.where(length > 0, length, 1.0)
+    control_lon = (start_lon + end_lon) / 2 + offsets * np.where(length > 0, -dy / safe_length, 0.0)
+    control_lat = (start_lat + end_lat) / 2 + offsets * np.where(length > 0, dx / safe_length, 0.0)
+
+    t = np.linspace(0, 1, num_points)[None, :]
+    lon = (1 - t) ** 2 * start_lon + 2 * (1 - t) * t * control_lon + t ** 2 * end_lon
+    lat = (1 - t) ** 2 * start_lat + 2 * (1 - t) * t * control_lat + t ** 2 * end_lat
+    return lat, lon
+
+
+def link_offset(line_index, total_lines):
+    """Offset separating overlapping lines between the same start and end points."""
+    return 10 * 0.5 * (line_index - (total_lines - 1) / 2)
 
 
 def add_links(line_index, total_lines, start_lon, end_lon, start_lat, end_lat, num_points=50):
@@ -20,55 +49,89 @@ def add_links(line_index, total_lines, start_lon, end_lon, start_lat, end_lat, n
     Returns:
     - lat, lon: lists of coordinates along the curve
     """
-    # Midpoint between start and end
-    mid_lon = (start_lon + end_lon) / 2
-    mid_lat = (start_lat + end_lat) / 2
+    lat, lon = arc_paths([start_lon], [start_lat], [end_lon], [end_lat],
+                         [link_offset(line_index, total_lines)], num_points)
+    return tuple(lat[0]), tuple(lon[0])
 
-    # Offset magnitude to separate overlapping lines
-    offset_scale = 10 * 0.5 * (line_index - (total_lines - 1) / 2)
-
-    # Perpendicular direction
-    dx, dy = end_lon - start_lon, end_lat - start_lat
-    length = np.hypot(dx, dy)
-    perp_dx, perp_dy = (-dy / length, dx / length) if length > 0 else (0, 0)
 
-    # Control point for the curve
-    control_lon = mid_lon + offset_scale * perp_dx
-    control_lat = mid_lat + offset_scale * perp_dy
-
-    # Bezier curve calculation (vectorized)
-    t = np.linspace(0, 1, num_points)
-    lon, lat = zip(*[quadratic_bezier(ti, [start_lon, start_lat],
-                                      [control_lon, control_lat],
-                                      [end_lon, end_lat]) for ti in t])
-    return lat, lon
-
-
-def create_io_map(df, selected_country, selected_industry, selected_deps,
-                  metadata, country_info, selected_sec_deps=False, use_thickness=False):
+def add_arc_batches(fig, arcs, num_points=50, opacity=0.3):
     """
-    Create a world map showing input flows to a specific country-industry pair.
+    Draw every link of ``arcs`` (a DataFrame with start/end coordinates,
+    ``color``, ``thickness`` and hover ``text``) with one trace per colour
+    and rounded thickness instead of one per link: the curves are computed
+    together by ``arc_paths`` and joined with gaps. The hover text sits on
+    one marker per link at the middle of its curve, so it is sent once
+    rather than for every point. Hundreds of links then cost a handful of
+    traces to serialise and render.
+    """
+    if arcs.empty:
+        return
+    pairs = arcs.groupby(["start_lon", "start_lat", "end_lon", "end_lat"], sort=False)
+    offsets = link_offset(pairs.cumcount().to_numpy(), pairs["start_lon"].transform("size").to_numpy())
+    lat, lon = arc_paths(arcs["start_lon"], arcs["start_lat"], arcs["end_lon"], arcs["end_lat"], offsets,
+                         num_points)
+    # Two decimals (about 1 km) are plenty on a world map and halve the JSON
+    lat, lon = np.round(lat, 2), np.round(lon, 2)
+    middle = num_points // 2
+    # A NaN after each curve breaks the line between links of one trace
+    gap = np.full((len(arcs), 1), np.nan)
+    widths = np.round(arcs["thickness"].to_numpy(dtype=float), 0)
+
+    for (color, width), batch in arcs.assign(width=widths).groupby(["color", "width"], sort=False):
+        rows = arcs.index.get_indexer(batch.index)
+        fig.add_trace(go.Scattergeo(
+            lon=np.hstack([lon[rows], gap[rows]]).ravel(),
+            lat=np.hstack([lat[rows], gap[rows]]).ravel(),
+            mode='lines',
+            line=dict(width=width, color=color),
+            opacity=opacity,
+            hoverinfo='skip',
+            name=color
+        ))
+    fig.add_trace(go.Scattergeo(
+        lon=lon[:, middle],
+        lat=lat[:, middle],
+        mode='markers',
+        marker=dict(size=5, color=arcs["color"].tolist(), opacity=0.6),
+        hoverinfo='text',
+        text=arcs["text"].tolist(),
+        name="Flows"
+    ))
 
-    Parameters:
-    - df: pandas DataFrame containing input-output data
-    - selected_country: str, country code
-    - selected_industry: str, industry code
-    - selected_deps: list of dependency levels
-    - metadata: DataFrame mapping industry codes to names
-    - country_info: DataFrame mapping country codes to names/colors
-    - selected_sec_deps: bool, include secondary dependencies
-    - use_thickness: bool, scale line thickness by value
 
-    Returns:
-    - Plotly Figure object, or None if no inputs found
+def add_centrality_nodes(fig, plot_df, centrality, get_country_name, get_industry_name):
     """
+    Add one marker per supplier country of ``plot_df``, sized by the PageRank
+    (see process.centrality) of the most central of its sectors on the map.
+    """
+    plot_df = plot_df.assign(pagerank=[
+        centrality.get(f"{country}_{industry}", "pagerank")
+        for country, industry in zip(plot_df["input_country"], plot_df["input_industry"])
+    ]).dropna(subset=["pagerank"])
+    if plot_df.empty:
+        return
+    nodes = plot_df.loc[plot_df.groupby("input_country")["pagerank"].idxmax()]
+    fig.add_trace(go.Scattergeo(
+        lon=nodes["start_lon"],
+        lat=nodes["start_lat"],
+        mode='markers',
+        # PageRank averages 1 per sector; the square root keeps hubs from covering the map
+        marker=dict(size=np.clip(6 + 4 * np.sqrt(nodes["pagerank"]), 6, 30), color='rgb(90, 90, 90)',
+                    opacity=0.6, line=dict(width=0)),
+        hoverinfo='text',
+        text=[f"{get_country_name(row.input_country)}: most central supplier "
+              f"{get_industry_name(row.input_industry)} (PageRank {row.pagerank:.2f})"
+              for row in nodes.itertuples()],
+        name="Supplier centrality"
+    ))
 
-    def get_country_name(code):
-        return country_info.loc[country_info["Code"] == code, "countries"].values[0]
-
-    def get_industry_name(code):
-        return metadata.loc[metadata["Code"] == code, "Industry"].values[0]
 
+def map_links(df, selected_country, selected_industry, selected_deps, selected_sec_deps=False, use_thickness=False):
+    """
+    The links ``create_io_map`` draws, one row per link with its countries,
+    input industry, value, coordinates and line thickness; None when the
+    pair has no inputs.
+    """
     all_inputs = {
         f"{selected_country}_{selected_industry}":
             obtain_inputs(df, selected_industry, selected_deps, selected_country=selected_country)
@@ -82,9 +145,6 @@ def create_io_map(df, selected_country, selected_industry, selected_deps,
             proc_country, proc_industry = proc_index.split("_", 1)
             all_inputs[proc_index] = obtain_inputs(df, proc_industry, selected_deps, selected_country=proc_country)
 
-    # Calculate risk index (currently unused in plotting, but kept for future use)
-    hhi = calculate_risk_index(all_inputs[f"{selected_country}_{selected_industry}"])
-
     plot_data = []
     for proc_key, inputs_series in all_inputs.items():
         proc_country = proc_key.split('_', 1)[0]
@@ -114,12 +174,71 @@ def create_io_map(df, selected_country, selected_industry, selected_deps,
                 'thickness': thickness
             })
 
-    plot_df = pd.DataFrame(plot_data)
+    return pd.DataFrame(plot_data)
+
+
+def map_line_widths(df, selected_country, selected_industry, selected_deps, selected_sec_deps=False,
+                    use_thickness=False):
+    """
+    Line width of every link trace of ``create_io_map``, in trace order
+    (the links come first, one trace each), or None when the pair has no
+    inputs. Enough to restyle a drawn map without rebuilding it.
+    """
+    plot_df = map_links(df, selected_country, selected_industry, selected_deps, selected_sec_deps, use_thickness)
+    if plot_df is None:
+        return None
+    if plot_df.empty:
+        return []
+    # create_io_map draws the links group by group, in sorted coordinate order
+    return plot_df.sort_values(LINK_KEYS, kind="stable")["thickness"].tolist()
+
+
+def create_io_map(df, selected_country, selected_industry, selected_deps,
+                  metadata, country_info, selected_sec_deps=False, use_thickness=False, linkages=None,
+                  centrality=None):
+    """
+    Create a world map showing input flows to a specific country-industry pair.
+
+    Parameters:
+    - df: pandas DataFrame containing input-output data
+    - selected_country: str, country code
+    - selected_industry: str, industry code
+    - selected_deps: list of dependency levels
+    - metadata: DataFrame mapping industry codes to names
+    - country_info: DataFrame mapping country codes to names/colors
+    - selected_sec_deps: bool, include secondary dependencies
+    - use_thickness: bool, scale line thickness by value
+    - linkages: optional SectorTable (see process.linkages) whose upstreamness
+      and output multiplier of each supplier sector are added to the hover text
+    - centrality: optional SectorTable (see process.centrality); each supplier
+      country gets a node sized by the PageRank of its most central sector drawn
+
+    Returns:
+    - Plotly Figure object, or None if no inputs found
+    """
+
+    def get_country_name(code):
+        return country_info.loc[country_info["Code"] == code, "countries"].values[0]
+
+    def get_industry_name(code):
+        return metadata.loc[metadata["Code"] == code, "Industry"].values[0]
+
+    def get_sector_position(label):
+        if linkages is None or label not in linkages.positions:
+            return ""
+        return (f"<br>Upstreamness: {linkages.get(label, 'upstreamness'):.2f}, "
+                f"output multiplier: {linkages.get(label, 'output_multiplier'):.2f}")
+
+    plot_df = map_links(df, selected_country, selected_industry, selected_deps, selected_sec_deps, use_thickness)
+    if plot_df is None:
+        return None
+
+    # Calculate risk index (currently unused in plotting, but kept for future use)
+    hhi = calculate_risk_index(obtain_inputs(df, selected_industry, selected_deps, selected_country=selected_country))
 
     fig = go.Figure()
 
-    for (start_lon, start_lat, end_lon, end_lat), group in plot_df.groupby(
-            ['start_lon', 'start_lat', 'end_lon', 'end_lat']):
+    for (start_lon, start_lat, end_lon, end_lat), group in plot_df.groupby(LINK_KEYS):
         for line_idx, row in enumerate(group.itertuples()):
             lat, lon = add_links(line_idx, len(group), start_lon, end_lon, start_lat, end_lat)
 
@@ -134,10 +253,14 @@ def create_io_map(df, selected_country, selected_industry, selected_deps,
                 text=(
                     f"{get_country_name(row.input_country)} -> {get_country_name(row.output_country)}:<br>"
                     f"{get_industry_name(row.input_industry)}: {row.value:.2f}"
+                    f"{get_sector_position(f'{row.input_country}_{row.input_industry}')}"
                 ),
                 name=f"{get_country_name(row.input_country)}: {get_industry_name(row.input_industry)}"
             ))
 
+    if centrality is not None:
+        add_centrality_nodes(fig, plot_df, centrality, get_country_name, get_industry_name)
+
     # Add marker for the selected country
     sel_lat, sel_lon = COUNTRY_COORDS[selected_country]
     fig.add_trace(go.Scattergeo(
@@ -171,3 +294,69 @@ def create_io_map(df, selected_country, selected_industry, selected_deps,
     )
 
     return fig
+
+
+def create_flow_map(flows, metadata, country_info, use_thickness=False, title="Largest cross-border flows"):
+    """
+    World map of ``flows`` (see process.flows.top_flows and
+    top_country_flows): one arc per flow from the supplier country to the
+    buyer country, drawn with ``add_arc_batches``. Sector flows name both
+    industries in the hover text; country flows only the countries.
+
+    Returns a Plotly Figure, or None when no flow can be placed on the map.
+    """
+    country_names = country_info.set_index("Code")["countries"]
+    country_colors = country_info.set_index("Code")["color"]
+    industry_names = metadata.set_index("Code")["Industry"]
+    placed = flows[flows["source_country"].isin(list(COUNTRY_COORDS))
+                   & flows["target_country"].isin(list(COUNTRY_COORDS))]
+    if placed.empty:
+        return None
+
+    max_value = placed["value"].max() if placed["value"].max() > 0 else 1
+    texts = [
+        f"{country_names.get(row.source_country, row.source_country)} -> "
+        f"{country_names.get(row.target_country, row.target_country)}:<br>"
+        + (f"{industry_names.get(row.source_industry, row.source_industry)} -> "
+           f"{industry_names.get(row.target_industry, row.target_industry)}: "
+           if "source_industry" in placed.columns else "All intermediate inputs: ")
+        + f"{row.value:,.2f}"
+        for row in placed.itertuples()
+    ]
+    arcs = pd.DataFrame({
+        "start_lat": [COUNTRY_COORDS[code][0] for code in placed["source_country"]],
+        "start_lon": [COUNTRY_COORDS[code][1] for code in placed["source_country"]],
+        "end_lat": [COUNTRY_COORDS[code][0] for code in placed["target_country"]],
+        "end_lon": [COUNTRY_COORDS[code][1] for code in placed["target_country"]],
+        "color": [country_colors.get(code, "#888888") for code in placed["source_country"]],
+        "thickness": np.maximum(placed["value"].to_numpy() / max_value * 10, 1.0) if use_thickness else 1.0,
+        "text": texts
+    })
+
+    fig = go.Figure()
+    add_arc_batches(fig, arcs, num_points=30)
+
+    endpoints = pd.unique(pd.concat([placed["source_country"], placed["target_country"]]))
+    fig.add_trace(go.Scattergeo(
+        lon=[COUNTRY_COORDS[code][1] for code in endpoints],
+        lat=[COUNTRY_COORDS[code][0] for code in endpoints],
+        mode='markers',
+        marker=dict(size=6, color=[country_colors.get(code, "#888888") for code in endpoints]),
+        hoverinfo='text',
+        text=[country_names.get(code, code) for code in endpoints],
+        name="Countries"
+    ))
+
+    fig.update_layout(
+        title=dict(text=title, y=0.95, x=0.5, xanchor='center', yanchor='top', pad=dict(b=10)),
+        showlegend=False,
+        geo=dict(
+            scope='world',
+            projection_type='natural earth',
+            showland=True,
+            landcolor='rgb(243, 243, 243)',
+            countrycolor='rgb(204, 204, 204)'
+        ),
+        margin=dict(t=50, b=50, l=50, r=50)
+    )
+    return fig
@@ -0,0 +1,209 @@
+import sys
+import tracemalloc
+from functools import lru_cache
+from os.path import sep
+
+import numpy as np
+
+# Path components under which third-party packages live
+SITE_DIRS = ("site-packages", "dist-packages")
+
+
+def process_rss():
+    """Current and peak resident set size of this process in bytes (None where unknown)."""
+    try:
+        with open("/proc/self/status") as fid:
+            fields = dict(line.split(":", 1) for line in fid if ":" in line)
+        return {
+            "current": int(fields["VmRSS"].split()[0]) * 1024,
+            "peak": int(fields["VmHWM"].split()[0]) * 1024
+        }
+    except (OSError, KeyError):
+        import resource
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"current": None, "peak": peak if sys.platform == "darwin" else peak * 1024}
+
+
+def reset_peak_rss():
+    """
+    Restart the peak RSS (VmHWM) from the current RSS, so ``process_rss``
+    reports the peak of what follows. Linux only; returns False elsewhere.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fid:
+            fid.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def sizeof(value, _seen=None):
+    """
+    Approximate bytes held by ``value``. pandas and numpy objects report
+    their buffers; Plotly figures are measured by their JSON size; other
+    objects by their attributes. Memory-mapped arrays count nothing, since
+    their pages live in the shared page cache, and objects reachable twice
+    are counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, np.memmap):
+        return 0
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "to_plotly_json"):
+        return len(value.to_json())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(item, _seen) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(key, _seen) + sizeof(item, _seen) for key, item in value.items())
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return sys.getsizeof(value) + sizeof(vars(value), _seen)
+    return sys.getsizeof(value)
+
+
+def structure_sizes(data, caches=()):
+    """
+    Byte counts of the structures a worker keeps alive: the IO matrix, its
+    labels, the metadata frames, the heatmap blocks and each ``(name,
+    LRUCache)`` in ``caches``. Memory-mapped arrays are flagged, since their
+    pages live in the shared page cache rather than the worker's heap.
+    """
+    df = data["data"]
+    mapped = bool(df.attrs.get("mapped"))
+    sizes = [
+        {"name": "data.values", "bytes": int(df.memory_usage(index=False).sum()), "mapped": mapped,
+         "detail": ", ".join(sorted({str(dtype) for dtype in df.dtypes}))},
+        {"name": "data.index", "bytes": int(df.index.memory_usage(deep=True)), "mapped": False,
+         "detail": str(df.index.dtype)},
+        {"name": "data.columns", "bytes": int(df.columns.memory_usage(deep=True)), "mapped": False,
+         "detail": str(df.columns.dtype)},
+        {"name": "metadata", "bytes": sizeof(data["metadata"]), "mapped": False, "detail": ""},
+        {"name": "all_countries", "bytes": sizeof(data["all_countries"]), "mapped": False, "detail": ""},
+    ]
+    if data.get("heatmap_blocks") is not None:
+        values = data["heatmap_blocks"].values
+        sizes.append({"name": "heatmap_blocks", "bytes": values.nbytes,
+                      "mapped": isinstance(values, np.memmap), "detail": str(values.dtype)})
+    for name, cache in caches:
+        entries = cache.items()
+        sizes.append({"name": f"{name}_cache", "bytes": sum(sizeof(value) for _, value in entries),
+                      "mapped": False, "detail": f"{len(entries)} entries"})
+    return sizes
+
+
+@lru_cache(maxsize=None)
+def package_of(filename):
+    """Top-level package owning ``filename``, or the file itself for local code."""
+    parts = filename.split(sep)
+    for site_dir in SITE_DIRS:
+        if site_dir in parts:
+            return parts[parts.index(site_dir) + 1].removesuffix(".py")
+    if filename.startswith(sys.prefix) or filename.startswith(sys.base_prefix):
+        return "stdlib"
+    return filename
+
+
+def _owner(traceback):
+    """
+    Package of the innermost frame outside the import machinery, so that
+    allocations made while a module is imported count against that module.
+    """
+    for frame in reversed(traceback):
+        if not frame.filename.startswith("<frozen"):
+            return package_of(frame.filename)
+    return "<import machinery>"
+
+
+def traced_allocations(top=10):
+    """
+    Summarise tracemalloc: traced bytes per package and the largest
+    allocation sites. ``peak_since_last`` is the high-water mark above the
+    current level since the previous call, i.e. per-request temporaries.
+    Import costs are only attributed to packages when tracing keeps more
+    than one frame (e.g. PYTHONTRACEMALLOC=10). Returns None when tracemalloc
+    is not tracing.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    packages, sites = {}, {}
+    for stat in snapshot.statistics("traceback"):
+        package = _owner(stat.traceback)
+        size, blocks = packages.get(package, (0, 0))
+        packages[package] = (size + stat.size, blocks + stat.count)
+        site = f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}"
+        sites[site] = sites.get(site, 0) + stat.size
+    return {
+        "current": current,
+        "peak_since_last": peak - current,
+        "packages": [
+            {"package": package, "bytes": size, "blocks": blocks}
+            for package, (size, blocks) in sorted(packages.items(), key=lambda item: -item[1][0])[:top]
+        ],
+        "sites": [
+            {"site": site, "bytes": size}
+            for site, size in sorted(sites.items(), key=lambda item: -item[1])[:top]
+        ]
+    }
+
+
+def memory_report(data, caches=(), top=10, trace=True):
+    return {
+        "rss": process_rss(),
+        "structures": structure_sizes(data, caches),
+        "tracemalloc": traced_allocations(top) if trace else None
+    }
+
+
+def _mb(size):
+    return "n/a" if size is None else f"{size / 1e6:10.2f} MB"
+
+
+def _detail(entry):
+    return entry["detail"] + (" (memory-mapped)" if entry["mapped"] else "")
+
+
+def format_report(report, compare=None):
+    """
+    Render ``memory_report`` output as text. With ``compare`` (a second
+    report, e.g. after compaction) structures are shown before and after.
+    """
+    rss = report["rss"]
+    lines = [f"RSS {_mb(rss['current'])}   peak {_mb(rss['peak'])}"]
+    if compare is None:
+        lines.append(f"{'structure':<16} {'size':>13}  detail")
+        for entry in report["structures"]:
+            lines.append(f"{entry['name']:<16} {_mb(entry['bytes'])}  {_detail(entry)}")
+    else:
+        after = {entry["name"]: entry for entry in compare["structures"]}
+        lines.append(f"{'structure':<16} {'before':>13} {'after':>13}  detail")
+        for entry in report["structures"]:
+            new = after.get(entry["name"], {"bytes": None, "detail": "", "mapped": False})
+            detail = _detail(entry) if _detail(entry) == _detail(new) else f"{_detail(entry)} -> {_detail(new)}"
+            lines.append(f"{entry['name']:<16} {_mb(entry['bytes'])} {_mb(new['bytes'])}  {detail}")
+        before_total = sum(entry["bytes"] for entry in report["structures"])
+        after_total = sum(entry["bytes"] for entry in compare["structures"])
+        lines.append(f"{'total':<16} {_mb(before_total)} {_mb(after_total)}")
+
+    traced = (compare or report)["tracemalloc"]
+    if traced is None:
+        lines.append("tracemalloc is off; set PYTHONTRACEMALLOC=10 to attribute Python allocations")
+        return "\n".join(lines)
+    lines.append(f"traced {_mb(traced['current'])}   request peak above current {_mb(traced['peak_since_last'])}")
+    for entry in traced["packages"]:
+        lines.append(f"  {entry['package'][:60]:<60} {_mb(entry['bytes'])}")
+    lines.append("largest allocation sites:")
+    for entry in traced["sites"]:
+        lines.append(f"  {entry['site'][-60:]:<60} {_mb(entry['bytes'])}")
+    return "\n".join(lines)
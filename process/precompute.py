@@ -0,0 +1,263 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import cpu_count, makedirs
+from os.path import join
+from time import time
+
+import numpy as np
+
+from pandas import read_csv
+
+from process import (
+    INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE,
+    INTER_COUNTRY_INPUT_OUTPUT_METADATA,
+    INTER_COUNTRY_INPUT_OUTPUT_TABLES,
+    PRECOMPUTE_DIR,
+    TOPK_SIZE,
+    POPULAR_SELECTIONS
+)
+from process.artifacts import (
+    CENTRALITY_FILE,
+    DATA_FILE,
+    FIGURES_DIR,
+    HEATMAP_BLOCKS_FILE,
+    LINKAGES_FILE,
+    RISK_CUBE_FILE,
+    TOPK_INDEX_FILE,
+    TOPK_VALUES_FILE,
+    create_array,
+    build_lock,
+    derived_version,
+    open_array,
+    open_sector_table,
+    publish,
+    read_manifest,
+    staging_dir,
+    version_dir,
+    write_manifest
+)
+from process.centrality import ensure_centrality
+from process.data import load_data, table_version
+from process.flows import ensure_flow_index
+from process.ingest import ingest_table
+from process.linkages import ensure_linkages
+
+INDEX_CHUNK_SIZE = 256
+
+# Per-process state for pool workers, filled by _init_worker
+_worker = {}
+
+
+def _init_worker(root, version, table_path, published_root):
+    directory = version_dir(version, root)
+    manifest = read_manifest(directory)
+    _worker["root"] = root
+    _worker["published_root"] = published_root
+    _worker["table_path"] = table_path
+    _worker["directory"] = directory
+    _worker["manifest"] = manifest
+    _worker["matrix"] = open_array(DATA_FILE, directory)
+
+
+def _label_codes(labels):
+    countries = np.array([label.split("_", 1)[0] for label in labels])
+    industries = np.array([label.split("_", 1)[1] if "_" in label else "" for label in labels])
+    return countries, industries
+
+
+def _build_index(start, stop, industries):
+    """
+    Top-K foreign suppliers and default-weight HHI per input industry for
+    columns [start, stop).
+
+    Mirrors ``obtain_inputs``: only positive inputs from other countries are
+    ranked, ties keep row order. The HHI matches ``update_risk_chart`` with
+    default weights, i.e. the domestic supplier carries zero weight.
+    """
+    manifest = _worker["manifest"]
+    matrix = _worker["matrix"]
+    directory = _worker["directory"]
+    row_countries, row_industries = _label_codes(manifest["rows"])
+    col_countries, _ = _label_codes(manifest["columns"][start:stop])
+    industry_ids = {code: pos for pos, code in enumerate(industries)}
+    row_industry_ids = np.array([industry_ids.get(code, -1) for code in row_industries])
+
+    values = np.array(matrix[:, start:stop], dtype=np.float64)
+    foreign = row_countries[:, None] != col_countries[None, :]
+    ranked = np.where(foreign & (values > 0), values, -np.inf)
+    order = np.argsort(-ranked, axis=0, kind="stable")[:TOPK_SIZE].T
+    top_values = np.take_along_axis(ranked.T, order, axis=1)
+    valid = np.isfinite(top_values)
+
+    topk_index = open_array(TOPK_INDEX_FILE, directory, mode="r+")
+    topk_values = open_array(TOPK_VALUES_FILE, directory, mode="r+")
+    risk_cube = open_array(RISK_CUBE_FILE, directory, mode="r+")
+
+    topk_index[start:stop] = np.where(valid, order, -1)
+    topk_values[start:stop] = np.where(valid, top_values, 0.0)
+
+    ids = np.where(valid, row_industry_ids[order], -1)
+    keep = ids >= 0
+    col_pos = np.broadcast_to(np.arange(stop - start)[:, None], ids.shape)
+    sums = np.zeros((stop - start, len(industries)))
+    squares = np.zeros((stop - start, len(industries)))
+    np.add.at(sums, (col_pos[keep], ids[keep]), top_values[keep])
+    np.add.at(squares, (col_pos[keep], ids[keep]), top_values[keep] ** 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        risk_cube[start:stop] = np.where(sums > 0, squares / sums ** 2, np.nan)
+
+    for array in (topk_index, topk_values, risk_cube):
+        array.flush()
+    return stop - start
+
+
+def _build_heatmap_blocks(country_pos, countries, industries):
+    """Fill the (industry, country, industry) block for one source country."""
+    manifest = _worker["manifest"]
+    matrix = _worker["matrix"]
+    row_pos = {label: pos for pos, label in enumerate(manifest["rows"])}
+    col_pos = {label: pos for pos, label in enumerate(manifest["columns"])}
+
+    source = countries[country_pos]
+    rows = [row_pos.get(f"{source}_{industry}", -1) for industry in industries]
+    cols = [col_pos.get(f"{country}_{industry}", -1) for country in countries for industry in industries]
+    rows, cols = np.array(rows), np.array(cols)
+
+    block = np.full((len(rows), len(cols)), np.nan)
+    if (rows >= 0).any() and (cols >= 0).any():
+        block[np.ix_(rows >= 0, cols >= 0)] = matrix[rows[rows >= 0]][:, cols[cols >= 0]]
+
+    blocks = open_array(HEATMAP_BLOCKS_FILE, _worker["directory"], mode="r+")
+    blocks[country_pos] = block.reshape(len(industries), len(countries), len(industries))
+    blocks.flush()
+    return source
+
+
+def _build_popular_figures(selected_country, selected_industry):
+    """Render the default view of every tab for one selection to JSON."""
+    from process.heatmap import create_heatmap
+    from process.map import create_io_map
+    from process.risk import update_risk_chart
+    from process.summary import create_io_summary, get_input_industry_options
+
+    if "data" not in _worker:
+        # Maps the matrix being built rather than any published version
+        _worker["data"] = load_data(table_path=_worker["table_path"], directory=_worker["root"])
+        # Sector tables are published on their own before the pool starts
+        for kind, file_name in (("linkages", LINKAGES_FILE), ("centrality", CENTRALITY_FILE)):
+            _worker["data"][kind] = open_sector_table(
+                derived_version(_worker["data"]["version"], kind), file_name, _worker["published_root"])
+    data = _worker["data"]
+    df, metadata, country_info = data["data"], data["metadata"], data["all_countries"]
+
+    options = get_input_industry_options(df, metadata, selected_country, selected_industry)
+    input_industry = options[0]["value"] if options else None
+
+    # Keys mirror the figure builders in app.py
+    figures = [
+        (("map", selected_country, selected_industry, 10, False, True),
+         lambda: create_io_map(df, selected_country, selected_industry, 10, metadata, country_info,
+                               selected_sec_deps=False, use_thickness=True, linkages=data["linkages"],
+                               centrality=data["centrality"])),
+        (("summary", selected_country, selected_industry, input_industry),
+         lambda: create_io_summary(df, selected_country, selected_industry, input_industry,
+                                   metadata, country_info)),
+        (("risk", (), selected_country, selected_industry),
+         lambda: update_risk_chart(df, None, selected_country, selected_industry, metadata, country_info)),
+        (("heatmap", selected_country, "CN1", "log"),
+         lambda: create_heatmap(df, metadata, selected_country, "CN1", "log")),
+    ]
+
+    entries = []
+    makedirs(join(_worker["directory"], FIGURES_DIR), exist_ok=True)
+    for key, builder in figures:
+        try:
+            fig = builder()
+        except Exception:
+            # The dashboard shows an error figure for these; nothing to cache
+            continue
+        if fig is None:
+            continue
+        file_name = join(FIGURES_DIR, "-".join(str(part) for part in key if part != ()) + ".json")
+        fig.write_json(join(_worker["directory"], file_name))
+        entries.append({"key": list(key), "file": file_name})
+    return entries
+
+
+def run_precompute(directory=PRECOMPUTE_DIR, workers=None, progress=print,
+                   table_path=INTER_COUNTRY_INPUT_OUTPUT_TABLES):
+    """
+    Build every derived artifact for the current version of the IO table
+    at ``table_path`` (by default the ``DEFAULT_YEAR`` table).
+
+    The filtered matrix is streamed once from the CSV into ``data.npy``
+    (see ``process.ingest``) and the linkages table, centrality scores and
+    flow index are computed from it (see ``process.linkages``,
+    ``process.centrality`` and ``process.flows``); pool workers then memory-map it and fill the top-K index, risk cube and heatmap blocks in
+    place, and render the popular figures, in parallel across cores.
+
+    Everything is written to a staging directory and published as
+    ``<directory>/<version>`` at the end, so a running dashboard keeps
+    mapping the previous build until it reloads.
+    """
+    start_time = time()
+    version = table_version(table_path)
+    industries = list(read_csv(INTER_COUNTRY_INPUT_OUTPUT_METADATA)["Code"])
+    countries = list(read_csv(INTER_COUNTRY_INPUT_OUTPUT_COUNTRYCODE)["Code"])
+    with build_lock(version, directory):
+        manifest = _build_artifacts(version, industries, countries, directory, workers, progress,
+                                    start_time, table_path)
+    progress(f"done: artifacts for version {version} in {version_dir(version, directory)} "
+             f"({time() - start_time:.1f}s)")
+    return manifest
+
+
+def _build_artifacts(version, industries, countries, directory, workers, progress, start_time, table_path):
+    staging = staging_dir(version, directory)
+    target = version_dir(version, staging)
+
+    manifest = ingest_table(table_path, target, version)
+    n_rows, n_cols = len(manifest["rows"]), len(manifest["columns"])
+    progress(f"data cache: {n_rows} x {n_cols} matrix, peak RSS "
+             f"{manifest['ingest']['peak_rss'] / 1e6:.0f} MB ({time() - start_time:.1f}s)")
+    staged = load_data(table_path=table_path, directory=staging)
+    ensure_linkages(staged, directory)
+    progress(f"linkages: {n_rows} sectors ({time() - start_time:.1f}s)")
+    ensure_centrality(staged, directory)
+    progress(f"centrality: {n_rows} sectors ({time() - start_time:.1f}s)")
+    ensure_flow_index(staged, directory)
+    progress(f"flow index: {n_rows} x {n_rows} cells ({time() - start_time:.1f}s)")
+    del staged
+
+    create_array(TOPK_INDEX_FILE, (n_cols, TOPK_SIZE), np.int32, target, fill=-1)
+    create_array(TOPK_VALUES_FILE, (n_cols, TOPK_SIZE), np.float64, target, fill=0.0)
+    create_array(RISK_CUBE_FILE, (n_cols, len(industries)), np.float64, target, fill=np.nan)
+    create_array(HEATMAP_BLOCKS_FILE, (len(countries), len(industries), len(countries), len(industries)),
+                 np.float64, target, fill=np.nan)
+
+    workers = workers or cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(staging, version, table_path, directory)) as executor:
+        tasks = {}
+        for start in range(0, n_cols, INDEX_CHUNK_SIZE):
+            stop = min(start + INDEX_CHUNK_SIZE, n_cols)
+            tasks[executor.submit(_build_index, start, stop, industries)] = f"top-K/risk columns {start}-{stop}"
+        for country_pos, country in enumerate(countries):
+            tasks[executor.submit(_build_heatmap_blocks, country_pos, countries, industries)] = f"heatmap blocks {country}"
+        for selected_country, selected_industry in POPULAR_SELECTIONS:
+            tasks[executor.submit(_build_popular_figures, selected_country, selected_industry)] = \
+                f"figures {selected_country}_{selected_industry}"
+
+        figures = []
+        for done, future in enumerate(as_completed(tasks), start=1):
+            result = future.result()
+            if tasks[future].startswith("figures"):
+                figures.extend(result)
+            progress(f"[{done}/{len(tasks)}] {tasks[future]} ({time() - start_time:.1f}s)")
+
+    manifest["artifacts"] += [TOPK_INDEX_FILE, TOPK_VALUES_FILE, RISK_CUBE_FILE, HEATMAP_BLOCKS_FILE]
+    manifest["industries"] = industries
+    manifest["countries"] = countries
+    manifest["figures"] = figures
+    write_manifest(manifest, target)
+    publish(staging, version, directory)
+    return manifest
@@ -0,0 +1,117 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from process import (
+    FIGURE_CACHE_SIZE,
+    PREFETCH_MAX_WORKERS,
+    PREFETCH_MAX_SESSIONS,
+    PREFETCH_MAX_TASKS,
+    PREFETCH_NEIGHBOURS,
+    PREFETCH_RECENT_COUNTRIES
+)
+from process.cache import LRUCache
+
+figure_cache = LRUCache(FIGURE_CACHE_SIZE)
+
+
+def neighbour_industries(industries, selected_industry, distance=PREFETCH_NEIGHBOURS):
+    """
+    Return the industries adjacent to ``selected_industry`` in dropdown order,
+    nearest first.
+    """
+    if selected_industry not in industries:
+        return []
+    pos = industries.index(selected_industry)
+    neighbours = []
+    for step in range(1, distance + 1):
+        for proc_pos in (pos + step, pos - step):
+            if 0 <= proc_pos < len(industries):
+                neighbours.append(industries[proc_pos])
+    return neighbours
+
+
+class _SessionState:
+    """What the prefetcher remembers of one browser session."""
+
+    def __init__(self):
+        self.recent_countries = deque(maxlen=PREFETCH_RECENT_COUNTRIES)
+        self.futures = []
+        self.generation = 0
+
+
+class Prefetcher:
+    """
+    Compute figures for likely next selections in the background.
+
+    Work runs on a small thread pool so it never takes more than
+    ``max_workers`` threads from the server. Each call to ``schedule``
+    starts a new generation for its session: that session's queued tasks
+    from older generations are cancelled and those that already left the
+    queue are skipped before they start, so the pool only ever works on
+    the latest selection of each session. Sessions (browser tabs, see the
+    ``session-id`` store) keep their own generation and recently viewed
+    countries; the ``max_sessions`` most recently active are remembered.
+    Results land in ``figure_cache``, which the callbacks read from.
+    """
+
+    def __init__(self, max_workers=PREFETCH_MAX_WORKERS, max_tasks=PREFETCH_MAX_TASKS,
+                 max_sessions=PREFETCH_MAX_SESSIONS):
+        self.max_tasks = max_tasks
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="prefetch")
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+
+    def _session(self, session):
+        # Caller holds self._lock
+        state = self._sessions.get(session)
+        if state is None:
+            state = self._sessions[session] = _SessionState()
+            while len(self._sessions) > self.max_sessions:
+                _, dropped = self._sessions.popitem(last=False)
+                for future in dropped.futures:
+                    future.cancel()
+        self._sessions.move_to_end(session)
+        return state
+
+    def remember_country(self, country, session=None):
+        """Record a country viewed in ``session``; returns the other ones it viewed recently."""
+        with self._lock:
+            recent_countries = self._session(session).recent_countries
+            if country in recent_countries:
+                recent_countries.remove(country)
+            recent_countries.appendleft(country)
+            return list(recent_countries)[1:]
+
+    def schedule(self, tasks, session=None):
+        """
+        Replace the pending work of ``session`` with ``tasks``, a list of
+        (cache key, builder) pairs in priority order. Builders are expected
+        to store their result in ``figure_cache`` under the key; keys
+        already cached are skipped.
+        """
+        pending = []
+        for key, builder in tasks:
+            if key not in figure_cache and key not in (k for k, _ in pending):
+                pending.append((key, builder))
+
+        with self._lock:
+            state = self._session(session)
+            state.generation += 1
+            for future in state.futures:
+                future.cancel()
+            state.futures = [
+                self._executor.submit(self._run, state, state.generation, builder)
+                for _, builder in pending[:self.max_tasks]
+            ]
+            return len(state.futures)
+
+    def _run(self, state, generation, builder):
+        if generation != state.generation:
+            return
+        try:
+            builder()
+        except Exception:
+            # Speculative work: the real callback will surface the error
+            pass
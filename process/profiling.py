@@ -0,0 +1,119 @@
+from cProfile import Profile
+from datetime import datetime, timezone
+from glob import glob
+from json import dump, load
+from os import environ, makedirs, remove
+from os.path import basename, exists, getmtime, join
+from pstats import Stats
+from threading import Lock, local
+from time import perf_counter
+from uuid import uuid4
+
+from process import PROFILE_DIR, PROFILE_MAX_DUMPS
+
+# IO_PROFILE=all profiles every callback, IO_PROFILE=update_map,update_risk only those
+PROFILE_ENV = "IO_PROFILE"
+# Requests carrying this header with the value of IO_PROFILE_TOKEN are profiled
+PROFILE_HEADER = "X-IO-Profile"
+PROFILE_TOKEN_ENV = "IO_PROFILE_TOKEN"
+
+_state = local()
+# cProfile allows one active profiler per process (enforced from Python 3.12 on), so calls are profiled one at a time
+_profile_lock = Lock()
+
+
+def request_profiling(enabled):
+    """Flag (or unflag) the current request thread for profiling."""
+    _state.requested = enabled
+
+
+def header_allows_profiling(header_value):
+    token = environ.get(PROFILE_TOKEN_ENV)
+    return bool(token) and header_value == token
+
+
+def should_profile(name):
+    if getattr(_state, "requested", False):
+        return True
+    selected = environ.get(PROFILE_ENV, "")
+    return selected == "all" or name in selected.split(",")
+
+
+def run_profiled(name, func, args, kwargs, directory=PROFILE_DIR, max_dumps=PROFILE_MAX_DUMPS):
+    """
+    Run ``func`` under cProfile and store the stats next to a JSON record
+    of the callback name, inputs and wall time.
+
+    While another call is being profiled (or another profiler is active)
+    ``func`` runs unprofiled. Profiling must never break the callback it
+    observes, so errors of the profiler itself are swallowed; only those
+    of ``func`` propagate.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return func(*args, **kwargs)
+    try:
+        profiler = Profile()
+        try:
+            profiler.enable()
+        except Exception:
+            return func(*args, **kwargs)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            try:
+                profiler.disable()
+                save_profile(profiler, name, args, kwargs, elapsed, directory, max_dumps)
+            except Exception:
+                pass
+    finally:
+        _profile_lock.release()
+
+
+def save_profile(profiler, name, args, kwargs, elapsed, directory=PROFILE_DIR, max_dumps=PROFILE_MAX_DUMPS):
+    makedirs(directory, exist_ok=True)
+    created = datetime.now(timezone.utc)
+    profile_id = f"{created:%Y%m%dT%H%M%S}-{name}-{uuid4().hex[:6]}"
+    profiler.dump_stats(join(directory, profile_id + ".prof"))
+    with open(join(directory, profile_id + ".json"), "w") as fid:
+        dump({
+            "id": profile_id,
+            "callback": name,
+            "created": created.isoformat(),
+            "seconds": elapsed,
+            "inputs": list(args),
+            "kwargs": kwargs
+        }, fid, default=str)
+    prune_profiles(directory, max_dumps)
+    return profile_id
+
+
+def prune_profiles(directory=PROFILE_DIR, max_dumps=PROFILE_MAX_DUMPS):
+    """Delete the oldest dumps so at most ``max_dumps`` remain."""
+    dumps = sorted(glob(join(directory, "*.prof")), key=getmtime)
+    for path in dumps[:max(len(dumps) - max_dumps, 0)]:
+        for stale in (path, path[:-len(".prof")] + ".json"):
+            if exists(stale):
+                remove(stale)
+
+
+def list_profiles(directory=PROFILE_DIR):
+    """Records of stored dumps, newest first."""
+    records = []
+    for path in glob(join(directory, "*.json")):
+        with open(path) as fid:
+            records.append(load(fid))
+    return sorted(records, key=lambda record: record["created"], reverse=True)
+
+
+def profile_summary(profile_id, directory=PROFILE_DIR, sort="cumulative", limit=25, stream=None):
+    """Print the inputs and the top ``limit`` functions of one dump."""
+    profile_id = basename(profile_id).removesuffix(".prof").removesuffix(".json")
+    with open(join(directory, profile_id + ".json")) as fid:
+        record = load(fid)
+    print(f"{record['callback']} at {record['created']}: {record['seconds'] * 1000:.1f} ms", file=stream)
+    print(f"inputs: {record['inputs']}", file=stream)
+    stats = Stats(join(directory, profile_id + ".prof"), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return record
@@ -0,0 +1,54 @@
+from math import ceil
+
+from pandas import DataFrame, concat
+
+from process import RANKING_PAGE_SIZE
+from process.cache import LRUCache
+from process.instrument import extraction
+
+# Per-sector measure frames by table version; each is a few hundred KB
+metrics_cache = LRUCache(4)
+
+
+def sector_metrics(data):
+    """
+    Every precomputed per-sector measure of ``data`` (the linkages and
+    centrality tables) as one frame with the sector label, country code and
+    industry name, built once per table version. Measures whose table has
+    not been built (see ``missing_measures``) are left out; without either
+    table the frame only lists the sectors.
+    """
+    def build():
+        frames = [table.frame() for table in (data.get("linkages"), data.get("centrality")) if table is not None]
+        metrics = concat(frames, axis=1) if frames else DataFrame(index=data["data"].columns)
+        codes = metrics.index.str.split("_", n=1)
+        industry_names = data["metadata"].set_index("Code")["Industry"]
+        metrics.insert(0, "industry", codes.str[1].map(lambda code: industry_names.get(code, code)))
+        metrics.insert(0, "country", codes.str[0])
+        metrics.insert(0, "sector", metrics.index)
+        return metrics.reset_index(drop=True)
+
+    return metrics_cache.get_or_compute((data["version"],), build)
+
+
+def missing_measures(data):
+    """Names of the sector measure tables ``data`` has no precomputed artifact for."""
+    return [name for name in ("linkages", "centrality") if data.get(name) is None]
+
+
+@extraction
+def ranking_page(metrics, sort_by=None, page=0, page_size=RANKING_PAGE_SIZE, country=None):
+    """
+    One page of ``metrics`` sorted by ``sort_by`` (a DataTable ``sort_by``
+    list; sectors without a value go last, and columns ``metrics`` lacks
+    are not sorted by), optionally only the sectors of
+    ``country``. Returns the rows as records, with NaN as None, and the
+    number of pages.
+    """
+    frame = metrics if not country else metrics[metrics["country"] == country]
+    for sort in reversed([sort for sort in sort_by or [] if sort["column_id"] in frame.columns]):
+        frame = frame.sort_values(sort["column_id"], ascending=sort["direction"] == "asc",
+                                  na_position="last", kind="stable")
+    page_count = max(1, ceil(len(frame) / page_size))
+    rows = frame.iloc[page * page_size:(page + 1) * page_size].round(4)
+    return rows.astype(object).where(rows.notna(), None).to_dict("records"), page_count
@@ -0,0 +1,133 @@
+from os import register_at_fork
+from threading import Lock, Thread
+from time import sleep, time
+
+from process.startup import timeline
+
+
+class DataStore:
+    """
+    The dataset a worker serves, replaced in place when the IO table changes.
+
+    ``get`` returns the current dataset, waiting on ``loader`` (a
+    ``BackgroundLoader``) for the first one. ``check`` compares the table's
+    version token with the served one. A new version must be seen on two
+    consecutive checks, so a file that is still being written is not picked
+    up. It is then built on a background thread with ``load`` and swapped in
+    with a single reference assignment. Requests already running keep the
+    dataset they started with. After the swap ``on_swap(old, new)`` runs, e.g.
+    to drop cache entries keyed on the old version.
+    """
+
+    def __init__(self, loader, load, on_swap=None):
+        self.loader = loader
+        self._load = load
+        self._on_swap = on_swap
+        self._current = None
+        self._seen = None
+        self._reloading = False
+        self._lock = Lock()
+        self._interval = 0
+        self.reloads = 0
+        self.last_reload = None
+        self.last_error = None
+        register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def ready(self):
+        return self.loader.ready
+
+    @property
+    def error(self):
+        return self.loader.error
+
+    @property
+    def reloading(self):
+        return self._reloading
+
+    def get(self, timeout=None):
+        current = self._current
+        return current if current is not None else self.loader.get(timeout)
+
+    def check(self):
+        """Start a reload if the table changed; True when one was started."""
+        from process.data import table_version
+        if not self.loader.ready:
+            return False
+        try:
+            version = table_version()
+        except OSError:
+            # The table is being replaced right now; look again next time
+            return False
+        if version == self.get()["version"]:
+            self._seen = None
+            return False
+        if version != self._seen:
+            self._seen = version
+            return False
+        return self.reload()
+
+    def reload(self):
+        """Reload on a background thread; False when a reload is already running."""
+        with self._lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+        Thread(target=self._run_reload, name="data-reload", daemon=True).start()
+        return True
+
+    def _run_reload(self):
+        try:
+            with timeline.phase("data-reload"):
+                new = self._load()
+            self.swap(new)
+            self.last_error = None
+        except Exception as exc:
+            self.last_error = exc
+        finally:
+            self._seen = None
+            self._reloading = False
+
+    def swap(self, new):
+        old = self.get()
+        self._current = new
+        self.reloads += 1
+        self.last_reload = time()
+        if self._on_swap is not None and old["version"] != new["version"]:
+            self._on_swap(old, new)
+
+    def status(self):
+        current = self.get(0) if self.ready else None
+        return {
+            "version": current["version"] if current is not None else None,
+            "reloading": self._reloading,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+            "last_error": str(self.last_error) if self.last_error is not None else None
+        }
+
+    def start_polling(self, interval):
+        """Call ``check`` every ``interval`` seconds on a daemon thread (also in forked children)."""
+        self._interval = interval
+        if interval > 0:
+            self._start_poll_thread()
+        return self
+
+    def _start_poll_thread(self):
+        def poll():
+            while True:
+                sleep(self._interval)
+                try:
+                    self.check()
+                except Exception as exc:
+                    self.last_error = exc
+        Thread(target=poll, name="data-poll", daemon=True).start()
+
+    def _after_fork(self):
+        # Threads do not survive fork: restart polling and forget a reload
+        # the parent had in flight (the child will see the change itself)
+        self._lock = Lock()
+        self._reloading = False
+        self._seen = None
+        if self._interval > 0:
+            self._start_poll_thread()
@@ -1,4 +1,6 @@
-from process.utils import obtain_inputs
+from process.utils import obtain_inputs, topk_index
+from process.instrument import extraction
+from numpy import isnan
 from pandas import DataFrame
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -26,14 +28,50 @@ def compute_industry_risk(inputs_series, risk_weights):
     return DataFrame(results)
 
 
-def update_risk_chart(
-        df, 
-        risk_weights_data, 
-        selected_country, 
-        selected_industry,
-        metadata,
-        country_info):
-    # Default all weights to 1.0
+def _indexed_risk(index, selected_country, selected_industry):
+    pos = index.column(f"{selected_country}_{selected_industry}")
+    if pos is None:
+        return None
+    rows = index.index[pos]
+    labels = index.rows[rows[rows >= 0]]
+    if labels.empty or not labels.str.split('_', n=1).str[1].isin(index.industries).all():
+        return None
+    risk_weights = {c: 1.0 for c in labels.str.split('_').str[0].unique()}
+    risk_weights[selected_country] = 0.0
+
+    hhi = index.risk_cube[pos]
+    present = ~isnan(hhi)
+    df_metrics = DataFrame({
+        'industry': [code for code, keep in zip(index.industries, present) if keep],
+        'weighted_HHI': hhi[present]
+    })
+    return risk_weights, df_metrics.sort_values('industry').reset_index(drop=True)
+
+
+@extraction
+def weighted_risk(df, risk_weights_data, selected_country, selected_industry):
+    """
+    Weighted HHI per input industry for a country-industry pair.
+
+    Every supplier country defaults to a weight of 1.0 and the importer
+    itself to 0.0; ``risk_weights_data`` overrides individual countries.
+    Without overrides, a precomputed table is served from the risk cube
+    of its top-K index.
+
+    Returns
+    -------
+    risk_weights : dict
+        The weights actually applied, by country code.
+    df_metrics : pd.DataFrame
+        Columns ``industry`` and ``weighted_HHI``.
+    """
+    index = topk_index(df)
+    # The cube covers exactly the 50 suppliers ranked below
+    if not risk_weights_data and index is not None and index.index.shape[1] == 50:
+        served = _indexed_risk(index, selected_country, selected_industry)
+        if served is not None:
+            return served
+
     all_inputs = obtain_inputs(
         df,
         selected_industry,
@@ -42,9 +80,6 @@ def update_risk_chart(
         run_filter=False
     )
 
-    selected_country_name = country_info[country_info["Code"] == selected_country]["countries"].values[0]
-    selected_industry_name = metadata[metadata["Code"] == selected_industry]["Industry"].values[0]
-
     countries = all_inputs.index.str.split('_').str[0].unique()
     risk_weights = {c: 1.0 for c in countries}
     
@@ -54,15 +89,25 @@ def update_risk_chart(
     if risk_weights_data:
         risk_weights.update(risk_weights_data)
 
+    return risk_weights, compute_industry_risk(all_inputs, risk_weights)
+
+
+def risk_chart_data(df, risk_weights_data, selected_country, selected_industry, metadata):
+    """
+    What ``update_risk_chart`` plots: the weighted HHI per input industry,
+    named, and the table of the weights applied. The industries depend only
+    on the selection, so a change of weights only changes the bar heights
+    and the table cells.
+    """
+    # Default all weights to 1.0
+    risk_weights, df_metrics = weighted_risk(df, risk_weights_data, selected_country, selected_industry)
+
     # Prepare table data for risk weights
     table_df = DataFrame({
         "Country": list(risk_weights.keys()),
         "Weight": [round(w, 3) for w in risk_weights.values()]
     })
 
-    # Compute metrics
-    df_metrics = compute_industry_risk(all_inputs, risk_weights)
-
     # For exact matching rows, merge on 'industry' == 'Code':
     df_merged = df_metrics.merge(metadata, left_on='industry', right_on='Code', how='left')
 
@@ -71,6 +116,20 @@ def update_risk_chart(
 
     # Then drop extra columns:
     df_merged = df_merged.drop(columns=['Code', 'Industry'])
+    return df_merged, table_df
+
+
+def update_risk_chart(
+        df, 
+        risk_weights_data, 
+        selected_country, 
+        selected_industry,
+        metadata,
+        country_info):
+    selected_country_name = country_info[country_info["Code"] == selected_country]["countries"].values[0]
+    selected_industry_name = metadata[metadata["Code"] == selected_industry]["Industry"].values[0]
+
+    df_merged, table_df = risk_chart_data(df, risk_weights_data, selected_country, selected_industry, metadata)
 
     fig = make_subplots(
         rows=1, cols=2,
@@ -0,0 +1,172 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from process import SANKEY_CACHE_SIZE, SANKEY_DEPTH, SANKEY_MIN_SHARE, SANKEY_NODE_BUDGET
+from process.cache import LRUCache, data_version
+from process.instrument import extraction
+
+# Pruned traversals by (data version, selection, depth, min share, node budget)
+sankey_cache = LRUCache(SANKEY_CACHE_SIZE)
+
+
+@extraction
+def upstream_chain(df, selected_country, selected_industry, depth=SANKEY_DEPTH, min_share=SANKEY_MIN_SHARE,
+                   node_budget=SANKEY_NODE_BUDGET):
+    """
+    The supply chain of a country-industry pair, traversed upstream one
+    tier at a time and pruned.
+
+    Every node of a tier spreads the value it carries over its suppliers
+    (self-supply excluded) in proportion to its inputs, so a tier-2 link
+    is the part of a tier-1 flow that the supplier itself bought from the
+    tier-2 sector. Links worth less than ``min_share`` of the root's
+    intermediate inputs (its own sector's excluded) are dropped. Each tier
+    keeps only its most valuable suppliers, up to an even split of what is
+    left of ``node_budget`` over the tiers still to go, so deep chains are
+    not starved by a wide first tier.
+    A sector reached at two tiers gets a node in each, which keeps the
+    chain acyclic. Each tier is one column gather and a few array
+    operations, whatever its width.
+
+    Returns ``{"sectors", "tiers", "values", "sources", "targets",
+    "links"}``: node labels, tiers and values, and the supplier node,
+    buyer node and value of every link. Memoised per selection in
+    ``sankey_cache``; callers must treat the arrays as read-only.
+    """
+    version = data_version(df)
+    if version is None:
+        return _traverse(df, selected_country, selected_industry, depth, min_share, node_budget)
+    key = (version, selected_country, selected_industry, int(depth), float(min_share), int(node_budget))
+    return sankey_cache.get_or_compute(
+        key,
+        lambda: _traverse(df, selected_country, selected_industry, depth, min_share, node_budget)
+    )
+
+
+def _traverse(df, selected_country, selected_industry, depth, min_share, node_budget):
+    root = f"{selected_country}_{selected_industry}"
+    if root not in df.columns or root not in df.index:
+        raise ValueError(f"Column {root} not found in DataFrame")
+    values = df.to_numpy()
+    sector_cols = df.columns.get_indexer(df.index)
+    if (sector_cols < 0).any():
+        raise ValueError(f"Column {df.index[np.argmax(sector_cols < 0)]} not found in DataFrame")
+
+    frontier = np.array([df.index.get_loc(root)])
+    frontier_nodes = np.array([0])
+    root_inputs = np.asarray(values[:, sector_cols[frontier[0]]], dtype=np.float64)
+    root_value = float(root_inputs.sum() - root_inputs[frontier[0]])
+    frontier_values = np.array([root_value])
+    sectors, tiers, node_values = [frontier], [np.zeros(1, dtype=int)], [frontier_values]
+    sources, targets, links = [], [], []
+    n_nodes = 1
+
+    for tier in range(1, depth + 1):
+        if not frontier.size or n_nodes >= node_budget or root_value <= 0:
+            break
+        block = np.asarray(values[:, sector_cols[frontier]], dtype=np.float64)
+        block[frontier, np.arange(frontier.size)] = 0.0
+        totals = block.sum(axis=0)
+        scale = np.divide(frontier_values, totals, out=np.zeros_like(totals), where=totals > 0)
+        block *= scale[None, :]
+        suppliers, buyers = np.nonzero(block >= min_share * root_value)
+        if not suppliers.size:
+            break
+        weights = block[suppliers, buyers]
+
+        # Keep the most valuable suppliers of this tier within the budget
+        candidates, position = np.unique(suppliers, return_inverse=True)
+        candidate_values = np.bincount(position, weights=weights)
+        keep = min(-(-(node_budget - n_nodes) // (depth - tier + 1)), candidates.size)
+        kept = np.argsort(-candidate_values, kind="stable")[:keep]
+        node_ids = np.full(candidates.size, -1)
+        node_ids[kept] = n_nodes + np.arange(keep)
+        on = node_ids[position] >= 0
+
+        sources.append(node_ids[position][on])
+        targets.append(frontier_nodes[buyers][on])
+        links.append(weights[on])
+        frontier = candidates[kept]
+        frontier_nodes = node_ids[kept]
+        frontier_values = candidate_values[kept]
+        sectors.append(frontier)
+        tiers.append(np.full(keep, tier))
+        node_values.append(frontier_values)
+        n_nodes += keep
+
+    labels = np.asarray(df.index.astype(str))
+    return {
+        "sectors": labels[np.concatenate(sectors)],
+        "tiers": np.concatenate(tiers),
+        "values": np.concatenate(node_values),
+        "sources": np.concatenate(sources) if sources else np.zeros(0, dtype=int),
+        "targets": np.concatenate(targets) if targets else np.zeros(0, dtype=int),
+        "links": np.concatenate(links) if links else np.zeros(0)
+    }
+
+
+def _rgba(color, alpha):
+    color = color.lstrip("#")
+    return f"rgba({int(color[0:2], 16)}, {int(color[2:4], 16)}, {int(color[4:6], 16)}, {alpha})"
+
+
+def create_sankey_chart(chain, selected_country, selected_industry, metadata, country_info):
+    """
+    Sankey diagram of ``upstream_chain``: suppliers on the left, the
+    selected sector on the right, one column per tier, coloured by country.
+    """
+    industry_names = metadata.set_index("Code")["Industry"]
+    country_names = country_info.set_index("Code")["countries"]
+    colors = country_info.set_index("Code")["color"]
+    split = [label.split("_", 1) for label in chain["sectors"]]
+    node_countries = [parts[0] for parts in split]
+    node_industries = [parts[1] if len(parts) > 1 else "" for parts in split]
+    node_colors = [colors.get(country, "#888888") for country in node_countries]
+    root_value = chain["values"][0]
+    tiers = chain["tiers"]
+    depth = max(int(tiers.max()), 1)
+    # Plotly only honours positions given for both axes: within a tier, nodes
+    # are spread top to bottom in traversal order, which is by value
+    rank = np.arange(len(tiers)) - np.searchsorted(tiers, tiers)
+    counts = np.bincount(tiers)[tiers]
+
+    fig = go.Figure(go.Sankey(
+        arrangement="snap",
+        node=dict(
+            label=[f"{country} {industry_names.get(industry, industry)}"
+                   for country, industry in zip(node_countries, node_industries)],
+            color=node_colors,
+            # Tier 0 (the selected sector) on the right, the furthest suppliers on the left
+            x=0.01 + 0.98 * (depth - tiers) / depth,
+            y=0.01 + 0.98 * (rank + 0.5) / counts,
+            customdata=[
+                f"{country_names.get(country, country)}, tier {tier}: "
+                f"{value:,.2f} ({100 * value / root_value if root_value else 0:.1f}% of inputs)"
+                for country, tier, value in zip(node_countries, tiers, chain["values"])
+            ],
+            hovertemplate="%{label}<br>%{customdata}<extra></extra>",
+            pad=12,
+            thickness=14
+        ),
+        link=dict(
+            source=chain["sources"],
+            target=chain["targets"],
+            value=chain["links"],
+            color=[_rgba(node_colors[source], 0.35) for source in chain["sources"]],
+            hovertemplate="%{source.label} -> %{target.label}: %{value:,.2f}<extra></extra>"
+        )
+    ))
+    if not len(chain["links"]):
+        fig.add_annotation(text="No supplier reaches the minimum share of inputs", xref="paper", yref="paper",
+                           x=0.5, y=0.5, showarrow=False, font=dict(size=16, color="#555"))
+    fig.update_layout(
+        title=dict(
+            text=(f"Upstream supply chain of {country_names.get(selected_country, selected_country)} - "
+                  f"{industry_names.get(selected_industry, selected_industry)}"),
+            x=0.5,
+            xanchor='center'
+        ),
+        font=dict(size=11),
+        margin=dict(t=60, b=20, l=20, r=20)
+    )
+    return fig
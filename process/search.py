@@ -0,0 +1,124 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+from process import SEARCH_CACHE_SIZE, SEARCH_LIMIT
+from process.cache import LRUCache
+
+# Option indexes by (data version, kind)
+search_cache = LRUCache(SEARCH_CACHE_SIZE)
+
+# Kinds of options an index can be built for: importer codes, industries, and country-industry sectors
+OPTION_KINDS = ("countries", "industries", "sectors")
+
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def tokenize(text):
+    """Lower-case words of ``text``, plus each whole word that contains an underscore or dash (A01_02)."""
+    text = str(text).lower()
+    words = text.split()
+    return [token for token in _SPLIT.split(text) if token] + [word for word in words if _SPLIT.search(word)]
+
+
+class OptionIndex:
+    """
+    Dropdown options with a sorted token list for prefix search.
+
+    Every option's value and label (or its ``search`` text, when given) are
+    split into tokens; the tokens are kept sorted, with the option each came
+    from, so all options having a token that starts with a prefix form one
+    contiguous run, found by bisection. A query matches an option when
+    every one of its tokens is a prefix of one of the option's tokens.
+    """
+
+    def __init__(self, options):
+        self.options = list(options)
+        self.positions = {option["value"]: pos for pos, option in enumerate(self.options)}
+        pairs = sorted({
+            (token, pos)
+            for pos, option in enumerate(self.options)
+            for token in tokenize(f"{option['value']} {option.get('search', option['label'])}")
+        })
+        self.tokens = [token for token, _ in pairs]
+        self.owners = np.array([pos for _, pos in pairs], dtype=np.int64)
+        self.values = [str(option["value"]).lower() for option in self.options]
+
+    def prefix(self, token):
+        """Positions of the options with a token starting with ``token``."""
+        start = bisect_left(self.tokens, token)
+        stop = bisect_left(self.tokens, token + "\uffff", start)
+        return np.unique(self.owners[start:stop])
+
+    def search(self, query=None, limit=SEARCH_LIMIT, value=None):
+        """
+        Up to ``limit`` options matching ``query``: options whose value is
+        the query first, then those whose value starts with it, then the
+        rest, each in their original order. An empty query gives the first
+        ``limit`` options. The options of ``value`` (the current selection,
+        or a list of them) are always included, so dropdowns can still show
+        them.
+        """
+        tokens = tokenize(query or "")
+        if tokens:
+            matches = self.prefix(tokens[0])
+            for token in tokens[1:]:
+                matches = np.intersect1d(matches, self.prefix(token), assume_unique=True)
+            text = query.strip().lower()
+            rank = [0 if self.values[pos] == text else 1 if self.values[pos].startswith(text) else 2
+                    for pos in matches]
+            matches = matches[np.lexsort((matches, rank))]
+        else:
+            matches = np.arange(len(self.options))
+        result = [self.options[pos] for pos in matches[:limit]]
+        shown = {option["value"] for option in result}
+        for selected in value if isinstance(value, (list, tuple)) else [value]:
+            if selected in self.positions and selected not in shown:
+                result.append(self.options[self.positions[selected]])
+                shown.add(selected)
+        return result
+
+
+def _build_options(data, kind):
+    metadata, countries = data["metadata"], data["all_countries"]
+    if kind == "countries":
+        # Labelled by code as before; the name is searched too, on the server and in the browser
+        return [{"label": code, "value": code, "search": f"{code} {name}"}
+                for code, name in zip(countries["Code"], countries["countries"])]
+    if kind == "industries":
+        return [{"label": name, "value": code, "search": f"{name} {code}"}
+                for code, name in zip(metadata["Code"], metadata["Industry"])]
+    if kind == "sectors":
+        industry_names = dict(zip(metadata["Code"], metadata["Industry"]))
+        country_names = dict(zip(countries["Code"], countries["countries"]))
+        options = []
+        for label in data["data"].columns.intersection(data["data"].index):
+            country, _, industry = str(label).partition("_")
+            name = industry_names.get(industry, industry)
+            options.append({"label": f"{country} {name}", "value": str(label),
+                            "search": f"{country} {country_names.get(country, country)} {name} {industry}"})
+        return options
+    raise ValueError(f"Unknown option kind '{kind}', expected one of {', '.join(OPTION_KINDS)}")
+
+
+def option_index(data, kind):
+    """The ``OptionIndex`` of ``kind`` (see ``OPTION_KINDS``) for a ``load_data`` dict, cached per version."""
+    if kind not in OPTION_KINDS:
+        raise ValueError(f"Unknown option kind '{kind}', expected one of {', '.join(OPTION_KINDS)}")
+    return search_cache.get_or_compute((data["version"], kind), lambda: OptionIndex(_build_options(data, kind)))
+
+
+def layout_options(data, kind, value=None):
+    """
+    The options of ``kind`` to send with the page layout: those an empty
+    search gives, without their ``search`` text, which is only needed once
+    the server answers a search.
+    """
+    return [{"label": option["label"], "value": option["value"]}
+            for option in search_options(data, kind, value=value)]
+
+
+def search_options(data, kind, query=None, limit=SEARCH_LIMIT, value=None):
+    """Up to ``limit`` options of ``kind`` matching ``query``, with the options of ``value`` kept."""
+    return option_index(data, kind).search(query, limit, value)
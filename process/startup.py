@@ -0,0 +1,157 @@
+import subprocess
+import sys
+from collections import deque
+from contextlib import contextmanager
+from json import loads
+from os import register_at_fork
+from threading import Event, Lock, Thread
+from time import perf_counter
+
+# Run in a fresh interpreter by ``measure_startup``; prints one JSON line
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.data_loader.get()
+ready = time.perf_counter()
+from process.startup import timeline
+print(json.dumps({
+    "import_seconds": imported - start,
+    "ready_seconds": ready - start,
+    "phases": timeline.phases(since=start)
+}))
+"""
+
+
+class StartupTimeline:
+    """Named, timed startup phases, recorded from any thread (the latest ``maxlen`` are kept)."""
+
+    def __init__(self, maxlen=256):
+        self.origin = perf_counter()
+        self._phases = deque(maxlen=maxlen)
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases.append({"name": name, "start": start, "seconds": perf_counter() - start})
+
+    def phases(self, since=None):
+        """Recorded phases in start order, with ``start`` in seconds after ``since`` (default: origin)."""
+        since = self.origin if since is None else since
+        with self._lock:
+            phases = sorted(self._phases, key=lambda phase: phase["start"])
+        return [dict(phase, start=phase["start"] - since) for phase in phases]
+
+
+timeline = StartupTimeline()
+
+
+class BackgroundLoader:
+    """
+    Run ``load`` once on a daemon thread so importing the app does not wait
+    for it. ``get`` blocks until the result is available and re-raises the
+    error of a failed load. A process forked before the load finished
+    starts its own load, since the loading thread does not survive the fork.
+    """
+
+    def __init__(self, load, name="data-load"):
+        self.name = name
+        self._load = load
+        self._reset()
+        register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _reset(self):
+        self._done = Event()
+        self._result = None
+        self._error = None
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            Thread(target=self._run, name=self.name, daemon=True).start()
+        return self
+
+    def _run(self):
+        try:
+            with timeline.phase(self.name):
+                self._result = self._load()
+        except BaseException as exc:
+            self._error = exc
+        finally:
+            self._done.set()
+
+    def _restart_after_fork(self):
+        if self._started and not self._done.is_set():
+            self._reset()
+            self.start()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self._error is None
+
+    @property
+    def error(self):
+        return self._error
+
+    def get(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} did not finish within {timeout} s")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def parse_importtime(text):
+    """
+    Self time in seconds per top-level package from ``-X importtime``
+    output, plus the nested modules with the largest cumulative time.
+    """
+    packages, modules = {}, []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        root = name.strip().split(".")[0]
+        packages[root] = packages.get(root, 0.0) + int(self_us) / 1e6
+        modules.append((name.strip(), int(cumulative_us) / 1e6))
+    return packages, modules
+
+
+def measure_startup(python=sys.executable, cwd=None):
+    """Import the app in a fresh interpreter under ``-X importtime`` and time it to readiness."""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        capture_output=True, text=True, cwd=cwd
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Starting the app failed:\n{result.stderr[-2000:]}")
+    report = loads(result.stdout.strip().splitlines()[-1])
+    packages, modules = parse_importtime(result.stderr)
+    report["packages"] = sorted(packages.items(), key=lambda item: -item[1])
+    report["modules"] = sorted(modules, key=lambda item: -item[1])
+    return report
+
+
+def format_startup(report, top=15):
+    lines = [
+        f"importable after {report['import_seconds']:7.3f} s",
+        f"ready after      {report['ready_seconds']:7.3f} s",
+        "",
+        "import self time by package:",
+    ]
+    lines += [f"  {name:<40} {seconds:7.3f} s" for name, seconds in report["packages"][:top]]
+    lines += ["", "slowest imports (cumulative):"]
+    lines += [f"  {name[:60]:<60} {seconds:7.3f} s" for name, seconds in report["modules"][:top]]
+    lines += ["", "startup phases (offset from import start):"]
+    lines += [
+        f"  {phase['start']:7.3f} s  +{phase['seconds']:7.3f} s  {phase['name']}"
+        for phase in report["phases"]
+    ]
+    return "\n".join(lines)
@@ -3,6 +3,26 @@ from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 
 
+def get_input_industry_options(df, metadata, selected_country, selected_output_industry):
+    """
+    Dropdown options for the input industries feeding a country-industry
+    pair, ordered by their largest supplier so the first option is the
+    most important input.
+    """
+    inputs = obtain_inputs(
+        df,
+        selected_output_industry,
+        50,
+        selected_country=selected_country,
+        run_filter=False
+    )
+    industry_names = metadata.set_index("Code")["Industry"]
+    return [
+        {"label": industry_names[proc_option], "value": proc_option}
+        for proc_option in inputs.index.str.split('_', n=1).str[1].unique()
+    ]
+
+
 def create_io_summary(
     df,
     selected_country,
@@ -77,12 +97,9 @@ def create_io_summary(
     total_value = round(proc_inputs["value"].sum(), 1)
 
     # Get readable names
-    selected_output_industry_name = inputs.loc[
-        inputs["Industry_code"] == selected_output_industry, "Industry"
-    ].iloc[0]
-    selected_input_industry_name = inputs.loc[
-        inputs["Industry_code"] == selected_input_industry, "Industry"
-    ].iloc[0]
+    industry_names = metadata.set_index("Code")["Industry"]
+    selected_output_industry_name = industry_names[selected_output_industry]
+    selected_input_industry_name = industry_names[selected_input_industry]
 
     # --- Create Figure ---
     fig = make_subplots(
@@ -0,0 +1,225 @@
+import numpy as np
+import plotly.graph_objects as go
+from pandas import DataFrame, concat
+from plotly.subplots import make_subplots
+
+from process import INTER_COUNTRY_INPUT_OUTPUT_TABLES, PRECOMPUTE_DIR, VA_TOP_ORIGINS
+from process.artifacts import (
+    TIVA_ABSORPTION_FILE,
+    TIVA_ORIGIN_FILE,
+    TIVA_SECTORS_FILE,
+    build_lock,
+    create_array,
+    derived_version,
+    open_tiva,
+    publish,
+    staging_dir,
+    version_dir,
+    write_manifest
+)
+from process.cache import LRUCache
+from process.ingest import table_accounts
+from process.instrument import extraction
+from process.leontief import country_indicator, io_system, leontief_matrix, safe_divide
+from process.startup import timeline
+
+# Open decompositions (memory-mapped, so cheap to keep) by table version
+tiva_cache = LRUCache(2)
+
+# Columns of the per-sector table, in order
+SECTOR_MEASURES = [
+    "output",
+    "value_added",
+    "exports",
+    "domestic_va_share",
+    "foreign_va_share",
+    "domestic_va_exports",
+    "foreign_va_exports",
+    "va_exports"
+]
+
+
+def decompose(df, value_added):
+    """
+    Value-added decomposition of a ``load_data`` table, for all countries at
+    once. ``value_added`` holds the VA row (by sector label).
+
+    With v the value-added coefficients, L = (I - A)⁻¹ the Leontief inverse
+    and F final demand by destination country, this computes:
+
+    - origin = V·L, where V spreads v over each sector's country. It gives the
+      value added from every country per unit of each sector's output.
+    - absorption = diag(v)·L·F. It gives the value added generated in each
+      sector that ends up in each country's final demand.
+
+    L is never formed. Both products are one ``solve`` of I - A (or its
+    transpose), with one right-hand side per country.
+    Returns (countries, origin, absorption, sectors), with ``sectors`` the
+    (sector, measure) table of ``SECTOR_MEASURES``.
+    """
+    system = io_system(df)
+    countries, country_pos, Z, F, x = (system[key] for key in ("countries", "country_pos", "Z", "F", "x"))
+    n = len(x)
+    va = np.asarray(value_added.reindex(system["sectors"]).fillna(0.0), dtype=np.float64)
+    v = safe_divide(va, x)
+
+    with timeline.phase("tiva: solve"):
+        matrix = leontief_matrix(Z, x)
+        indicator = country_indicator(country_pos, len(countries))
+        origin = np.linalg.solve(matrix.T, indicator * v[:, None]).T
+        absorption = v[:, None] * np.linalg.solve(matrix, F)
+    del matrix
+
+    sectors = np.arange(n)
+    # Sales to every destination country; exports are those outside the sector's own country
+    sales = Z @ indicator + F
+    exports = sales.sum(axis=1) - sales[sectors, country_pos]
+    domestic_share = origin[country_pos, sectors]
+    foreign_share = origin.sum(axis=0) - domestic_share
+    va_exports = absorption.sum(axis=1) - absorption[sectors, country_pos]
+
+    table = np.column_stack([
+        x,
+        va,
+        exports,
+        domestic_share,
+        foreign_share,
+        domestic_share * exports,
+        foreign_share * exports,
+        va_exports
+    ])
+    return countries, origin, absorption, table
+
+
+def build_tiva(data, table_path, version, directory=PRECOMPUTE_DIR):
+    """Decompose ``data`` (the table at ``table_path``) and publish the result as ``version``."""
+    with timeline.phase("tiva: read value added"):
+        accounts = table_accounts(table_path, tuple(data["all_countries"]["Code"]), labels=("VA",))
+    countries, origin, absorption, sectors = decompose(data["data"], accounts.loc["VA"])
+
+    staging = staging_dir(version, directory)
+    target = version_dir(version, staging)
+    for name, values in ((TIVA_ORIGIN_FILE, origin), (TIVA_ABSORPTION_FILE, absorption),
+                         (TIVA_SECTORS_FILE, sectors)):
+        array = create_array(name, values.shape, np.float64, target)
+        array[:] = values
+        array.flush()
+    write_manifest({
+        "version": version,
+        "table_version": data["version"],
+        "countries": countries,
+        "rows": [str(label) for label in data["data"].index],
+        "measures": SECTOR_MEASURES,
+        "artifacts": [TIVA_ORIGIN_FILE, TIVA_ABSORPTION_FILE, TIVA_SECTORS_FILE],
+        "figures": []
+    }, target)
+    publish(staging, version, directory)
+
+
+def ensure_tiva(data, table_path=INTER_COUNTRY_INPUT_OUTPUT_TABLES, directory=PRECOMPUTE_DIR):
+    """
+    Open the decomposition of ``data``, building it first if needed. As
+    with the data cache, one process builds under ``build_lock`` while the
+    others wait and then map the result.
+    """
+    version = derived_version(data["version"], "tiva")
+    tiva = open_tiva(version, directory)
+    if tiva is None:
+        with build_lock(version, directory):
+            tiva = open_tiva(version, directory)
+            if tiva is None:
+                with timeline.phase("build tiva"):
+                    build_tiva(data, table_path, version, directory)
+                tiva = open_tiva(version, directory)
+    return tiva
+
+
+def load_tiva(data, table_path=INTER_COUNTRY_INPUT_OUTPUT_TABLES, directory=PRECOMPUTE_DIR):
+    """The decomposition of ``data``, opened once per table version."""
+    return tiva_cache.get_or_compute((data["version"],), lambda: ensure_tiva(data, table_path, directory))
+
+
+@extraction
+def va_origin_shares(tiva, selected_country, selected_industry, top=VA_TOP_ORIGINS):
+    """
+    Share of each country in the value added embodied in the output of
+    ``selected_country``_``selected_industry``. The ``top`` countries are
+    listed separately and the rest are summed as "Other".
+    """
+    shares = DataFrame({
+        "country": tiva.countries,
+        "share": np.asarray(tiva.origin[:, tiva.sector(f"{selected_country}_{selected_industry}")], dtype=float)
+    }).sort_values("share", ascending=False, kind="stable")
+    if len(shares) > top:
+        other = DataFrame({"country": ["Other"], "share": [shares["share"].iloc[top:].sum()]})
+        shares = concat([shares.iloc[:top], other])
+    return shares.reset_index(drop=True)
+
+
+@extraction
+def export_decomposition(tiva, selected_country):
+    """
+    Gross exports of each industry of ``selected_country`` split into
+    domestic and foreign value added, with the industry's value added that
+    is absorbed abroad (value-added exports).
+    """
+    positions = [pos for label, pos in tiva.positions.items() if label.split("_", 1)[0] == selected_country]
+    if not positions:
+        raise ValueError(f"No sectors for {selected_country}")
+    return DataFrame({
+        "industry": [tiva.labels[pos].split("_", 1)[1] for pos in positions],
+        "domestic_va_exports": np.asarray(tiva.measure("domestic_va_exports")[positions], dtype=float),
+        "foreign_va_exports": np.asarray(tiva.measure("foreign_va_exports")[positions], dtype=float),
+        "va_exports": np.asarray(tiva.measure("va_exports")[positions], dtype=float)
+    })
+
+
+def create_va_chart(origin, exports, selected_country, selected_industry, metadata, country_info):
+    """
+    Bar chart of the selected country's exports by industry, split into
+    domestic and foreign value added, next to a pie of the countries whose
+    value added is embodied in the selected sector's output.
+    """
+    industry_names = metadata.set_index("Code")["Industry"]
+    country_names = country_info.set_index("Code")["countries"]
+    domestic = origin.loc[origin["country"] == selected_country, "share"].sum()
+    selected_name = industry_names.get(selected_industry, selected_industry)
+
+    fig = make_subplots(
+        rows=1, cols=2,
+        column_widths=[0.6, 0.4],
+        specs=[[{"type": "xy"}, {"type": "domain"}]],
+        subplot_titles=(
+            f"Value added in the exports of {selected_country}",
+            f"Origin of value added in {selected_name}"
+        )
+    )
+    labels = [industry_names.get(code, code) for code in exports["industry"]]
+    fig.add_trace(go.Bar(x=labels, y=exports["domestic_va_exports"], name="Domestic value added",
+                         marker_color="steelblue"), row=1, col=1)
+    fig.add_trace(go.Bar(x=labels, y=exports["foreign_va_exports"], name="Foreign value added",
+                         marker_color="indianred"), row=1, col=1)
+    fig.add_trace(go.Scatter(x=labels, y=exports["va_exports"], mode="markers", name="Value added absorbed abroad",
+                             marker=dict(color="black", symbol="diamond", size=7)), row=1, col=1)
+    fig.add_trace(go.Pie(
+        labels=[country_names.get(code, code) for code in origin["country"]],
+        values=origin["share"] * 100,
+        hovertemplate="%{label}<br>%{value:.2f}% of output value<extra></extra>",
+        sort=False,
+        showlegend=False
+    ), row=1, col=2)
+
+    fig.update_annotations(font_size=10)
+    fig.update_layout(
+        title_text=(
+            f"Value added in <b>{selected_name} ({selected_industry})</b> of {selected_country}: "
+            f"{domestic * 100:.1f}% domestic, {(origin['share'].sum() - domestic) * 100:.1f}% foreign"
+        ),
+        barmode="stack",
+        yaxis=dict(title="Million USD"),
+        legend=dict(orientation="h", y=-0.3),
+        height=700,
+        margin=dict(l=40, r=40, t=100, b=40),
+        plot_bgcolor="white"
+    )
+    return fig
@@ -0,0 +1,242 @@
+from hashlib import sha1
+from threading import Lock
+
+import numpy as np
+import plotly.graph_objects as go
+from pandas import DataFrame
+
+from process import PRECOMPUTE_DIR, TREND_TOP_SUPPLIERS
+from process.artifacts import (
+    YEAR_CUBE_FILE,
+    build_lock,
+    create_array,
+    open_year_cube,
+    publish,
+    staging_dir,
+    version_dir,
+    write_manifest
+)
+from process.data import load_shared_data, table_version
+from process.heatmap import strip_country
+from process.instrument import extraction
+from process.startup import BackgroundLoader, timeline
+from process.years import available_years, table_path
+
+# Seconds a request waits for the cube to open before it is reported as not built yet
+YEAR_CUBE_WAIT = 1.0
+
+# Background opens (and builds) of the cube by (version, directory); the loader keeps the open handle
+_cube_loaders = {}
+_cube_loaders_lock = Lock()
+
+
+def year_cube_version(years):
+    """Version token for the cube of ``years``: changes when any year's table does."""
+    versions = "|".join(table_version(table_path(year)) for year in years)
+    return "years-" + sha1(versions.encode()).hexdigest()[:16]
+
+
+def build_year_cube(years, version, directory=PRECOMPUTE_DIR):
+    """
+    Stack the tables of ``years`` into a (column, year, row) float32 array
+    and publish it as ``version``. Each year is memory-mapped from its data
+    cache (written first if missing), so only one year's matrix is copied
+    at a time. float32 keeps the cube at half size; shares and changes need
+    far fewer digits.
+    """
+    datasets = [load_shared_data(directory, table_path(year)) for year in years]
+    rows, columns = {}, {}
+    for data in datasets:
+        rows.update(dict.fromkeys(data["data"].index))
+        columns.update(dict.fromkeys(data["data"].columns))
+    rows, columns = list(rows), list(columns)
+
+    staging = staging_dir(version, directory)
+    target = version_dir(version, staging)
+    cube = create_array(YEAR_CUBE_FILE, (len(columns), len(years), len(rows)), np.float32, target, fill=np.nan)
+    for pos, data in enumerate(datasets):
+        frame = data["data"].reindex(index=rows, columns=columns)
+        cube[:, pos, :] = frame.to_numpy(dtype=np.float32).T
+    cube.flush()
+    write_manifest({
+        "version": version,
+        "years": list(years),
+        "rows": [str(label) for label in rows],
+        "columns": [str(label) for label in columns],
+        "artifacts": [YEAR_CUBE_FILE],
+        "figures": []
+    }, target)
+    publish(staging, version, directory)
+
+
+def ensure_year_cube(years=None, directory=PRECOMPUTE_DIR):
+    """
+    Open the cube for ``years`` (default: every year with a table), building
+    it first if needed. As with the data cache, one process builds under
+    ``build_lock`` while the others wait and then map the result.
+    """
+    years = available_years() if years is None else sorted(years)
+    version = year_cube_version(years)
+    cube = open_year_cube(version, directory)
+    if cube is None:
+        with build_lock(version, directory):
+            cube = open_year_cube(version, directory)
+            if cube is None:
+                with timeline.phase("build year cube"):
+                    build_year_cube(years, version, directory)
+                cube = open_year_cube(version, directory)
+    return cube
+
+
+def load_year_cube(directory=PRECOMPUTE_DIR, wait=YEAR_CUBE_WAIT):
+    """
+    The cube over every year with a table, or None while it is not built
+    yet. ``ensure_year_cube`` runs on a ``BackgroundLoader`` once per
+    version, so a request waits at most ``wait`` seconds for it and never
+    builds the cube itself; a failed build is retried on the next call.
+    """
+    years = available_years()
+    key = (year_cube_version(years), directory)
+    with _cube_loaders_lock:
+        loader = _cube_loaders.get(key)
+        if loader is None or loader.error is not None:
+            for stale in [k for k in _cube_loaders if k[1] == directory]:
+                del _cube_loaders[stale]
+            loader = _cube_loaders[key] = BackgroundLoader(lambda: ensure_year_cube(years, directory),
+                                                           name="year cube").start()
+    try:
+        return loader.get(wait)
+    except TimeoutError:
+        return None
+
+
+@extraction
+def supplier_share_history(cube, selected_country, selected_industry, input_industry, top=TREND_TOP_SUPPLIERS):
+    """
+    Share of each source country in the ``input_industry`` inputs of
+    ``selected_country``_``selected_industry``, for every year of ``cube``.
+
+    Returns a years x countries frame holding the ``top`` countries by
+    average share, with the remaining countries summed as "Other".
+    """
+    history = np.asarray(cube.history(f"{selected_country}_{selected_industry}"), dtype=float)
+    mask = cube.row_industries == input_industry
+    block = np.nan_to_num(history[:, mask])
+    totals = block.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = np.where(totals > 0, block / totals, np.nan)
+
+    frame = DataFrame(shares, index=cube.years, columns=cube.row_countries[mask])
+    order = frame.mean().sort_values(ascending=False).index
+    if len(order) > top:
+        frame = frame[order[:top]].assign(Other=frame[order[top:]].sum(axis=1, min_count=1))
+    return frame
+
+
+@extraction
+def change_blocks(cube, df_metadata, selected_country, reference_country, year_from, year_to):
+    """
+    Flows from the industries of ``selected_country`` (rows) to those of
+    ``reference_country`` (columns) in ``year_from`` and ``year_to``, as
+    two frames in metadata order. Reads one contiguous history per
+    reference-country column.
+    """
+    industries = df_metadata["Code"].tolist()
+    row_labels = [f"{selected_country}_{industry}" for industry in industries]
+    col_labels = [f"{reference_country}_{industry}" for industry in industries]
+    row_pos = np.array([cube.row_positions.get(label, -1) for label in row_labels])
+    col_pos = np.array([cube.column_positions.get(label, -1) for label in col_labels])
+    if not (row_pos >= 0).any() or not (col_pos >= 0).any():
+        raise ValueError(f"No flows from {selected_country} to {reference_country}")
+    year_pos = [cube.years.index(year_from), cube.years.index(year_to)]
+
+    values = np.full((2, len(row_labels), len(col_labels)), np.nan)
+    histories = np.asarray(cube.values[col_pos[col_pos >= 0]], dtype=float)[:, year_pos, :]
+    values[np.ix_([0, 1], row_pos >= 0, col_pos >= 0)] = \
+        histories[:, :, row_pos[row_pos >= 0]].transpose(1, 2, 0)
+    return (DataFrame(values[0], index=row_labels, columns=col_labels),
+            DataFrame(values[1], index=row_labels, columns=col_labels))
+
+
+def create_trends_chart(shares, selected_country, selected_industry, input_industry):
+    fig = go.Figure()
+    for country in shares.columns:
+        fig.add_trace(go.Scatter(
+            x=shares.index,
+            y=shares[country] * 100,
+            mode="lines+markers",
+            name=country,
+            hovertemplate=f"<b>{country}</b><br>%{{x}}: %{{y:.2f}}%<extra></extra>"
+        ))
+    fig.update_layout(
+        title=dict(
+            text=f"Source countries of {input_industry} inputs to {selected_country}_{selected_industry}",
+            x=0.5,
+            xanchor="center",
+            font=dict(size=18, family="Arial, sans-serif")
+        ),
+        xaxis=dict(title="Year", dtick=1, showgrid=False),
+        yaxis=dict(title="Share of inputs (%)", rangemode="tozero"),
+        legend=dict(title="Source country"),
+        margin=dict(l=80, r=40, t=80, b=60),
+        plot_bgcolor="white",
+        hovermode="x unified"
+    )
+    return fig
+
+
+def create_change_heatmap(before, after, selected_country, reference_country, year_from, year_to, mode="delta"):
+    """
+    Change in each flow from ``year_from`` to ``year_to``: the difference
+    (``mode="delta"``) or the percentage change (``mode="pct"``, empty where
+    the earlier flow is zero), on a diverging scale centred on zero.
+    """
+    if mode == "pct":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change = (after - before) / before.where(before != 0) * 100
+        label, value_format = "Change (%)", ":.1f"
+    else:
+        change = after - before
+        label, value_format = "Change", ":.4f"
+
+    col_labels_reversed = list(change.columns)[::-1]
+    change = change[col_labels_reversed]
+    x_labels = [strip_country(lbl) for lbl in col_labels_reversed]
+    y_labels = [strip_country(lbl) for lbl in change.index]
+
+    # Symmetric colour range that ignores the few most extreme cells
+    finite = np.abs(change.to_numpy()[np.isfinite(change.to_numpy())])
+    bound = (float(np.percentile(finite, 98)) if finite.size else 0.0) or 1.0
+
+    fig = go.Figure(data=[go.Heatmap(
+        z=change.values,
+        x=x_labels,
+        y=y_labels,
+        colorscale="RdBu",
+        reversescale=True,
+        zmid=0,
+        zmin=-bound,
+        zmax=bound,
+        colorbar=dict(title=dict(text=label, side="right"), ticks="outside", thickness=20),
+        hovertemplate=(
+            "<b>From %{y}</b><br>" +
+            "<b>To %{x}</b><br>" +
+            f"{label}: %{{z{value_format}}}<extra></extra>"
+        )
+    )])
+    fig.update_layout(
+        title=dict(
+            text=f"Change {year_from} to {year_to}: from {selected_country} (y-axis) to {reference_country} (x-axis)",
+            x=0.5,
+            xanchor="center",
+            font=dict(size=18, family="Arial, sans-serif")
+        ),
+        xaxis=dict(title=f"Industries of {reference_country}", tickangle=45, tickfont=dict(size=11),
+                   automargin=True, showgrid=False, zeroline=False),
+        yaxis=dict(title=f"Industries of {selected_country}", autorange="reversed", tickfont=dict(size=11),
+                   automargin=True, showgrid=False, zeroline=False, scaleanchor="x", scaleratio=1),
+        margin=dict(l=100, r=40, t=80, b=120),
+        plot_bgcolor="white",
+        hovermode="closest"
+    )
+    return fig
@@ -3,7 +3,27 @@ from numpy import sum as np_sum
 from numpy import log as np_log
 from numpy import sort as np_sort
 from numpy import cumsum as np_cumsum
-from pandas import DataFrame
+from pandas import DataFrame, Series
+
+from process import INPUTS_CACHE_SIZE, TOPK_SIZE
+from process.cache import LRUCache, data_version
+from process.instrument import extraction
+
+inputs_cache = LRUCache(INPUTS_CACHE_SIZE)
+
+# Precomputed top-K supplier indexes (process.artifacts.TopKIndex) by data version, registered by load_data
+topk_indexes = {}
+
+
+def register_topk_index(index):
+    """Serve ``obtain_inputs`` for frames of ``index.version`` from ``index``."""
+    topk_indexes[index.version] = index
+
+
+def topk_index(df):
+    """The precomputed ``TopKIndex`` of ``df``'s table version, or None."""
+    version = data_version(df)
+    return None if version is None else topk_indexes.get(version)
 
 def calculate_risk_index(inputs):
     """
@@ -72,8 +92,45 @@ def quadratic_bezier(t, p0, p1, p2):
     return x, y
 
 
+@extraction
 def obtain_inputs(df, selected_industry, selected_deps, selected_country: str = "NZL", run_filter: bool = True):
+    """
+    Return the top foreign inputs (and, without filtering, the matching
+    domestic inputs) for a country-industry column.
+
+    Results for frames produced by ``load_data`` are memoised in
+    ``inputs_cache`` keyed by (data version, country, industry, deps,
+    run_filter), so callers must treat the returned Series as read-only.
+    With filtering and at most ``TOPK_SIZE`` inputs, a precomputed table
+    is served from its top-K index instead of scanning the column.
+    """
+    version = data_version(df)
+    if version is None:
+        return _extract_inputs(df, selected_industry, selected_deps, selected_country, run_filter)
+
+    key = (version, selected_country, selected_industry, int(selected_deps), bool(run_filter))
+    return inputs_cache.get_or_compute(
+        key,
+        lambda: _extract_inputs(df, selected_industry, selected_deps, selected_country, run_filter)
+    )
+
+
+def _indexed_inputs(index, target_col, selected_deps):
+    pos = index.column(target_col)
+    if pos is None:
+        return None
+    rows = index.index[pos, :selected_deps]
+    rows = rows[rows >= 0]
+    return Series(index.values[pos, :len(rows)], index=index.rows[rows], name=target_col)
+
+
+def _extract_inputs(df, selected_industry, selected_deps, selected_country, run_filter):
     target_col = f"{selected_country}_{selected_industry}"
+    index = topk_index(df)
+    if run_filter and index is not None and 0 <= int(selected_deps) <= TOPK_SIZE:
+        indexed = _indexed_inputs(index, target_col, int(selected_deps))
+        if indexed is not None:
+            return indexed
     if target_col not in df.columns:
         raise ValueError(f"Column {target_col} not found in DataFrame")
     inputs = df[target_col]
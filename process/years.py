@@ -0,0 +1,96 @@
+import re
+from collections import OrderedDict
+from concurrent.futures import Future
+from os import listdir
+from os.path import dirname
+from threading import Lock
+
+from process import INTER_COUNTRY_INPUT_OUTPUT_TABLE_PATTERN, YEAR_MEMORY_BUDGET
+
+YEAR_FILE = re.compile(r"^(\d{4})\.csv$")
+
+
+def table_path(year):
+    return INTER_COUNTRY_INPUT_OUTPUT_TABLE_PATTERN.format(year=year)
+
+
+def available_years(directory=None):
+    """Years that have a table file, in ascending order."""
+    directory = directory or dirname(INTER_COUNTRY_INPUT_OUTPUT_TABLE_PATTERN) or "."
+    return sorted(int(match.group(1)) for match in map(YEAR_FILE.match, listdir(directory)) if match)
+
+
+def dataset_bytes(data):
+    """
+    Bytes a loaded year accounts for against the budget: the matrix and the
+    heatmap blocks at full size, mapped or not, since the pages of a year
+    in use become resident.
+    """
+    size = int(data["data"].memory_usage(index=False).sum())
+    if data.get("heatmap_blocks") is not None:
+        size += data["heatmap_blocks"].values.nbytes
+    return size
+
+
+class YearStore:
+    """
+    IO tables for years other than the one the app serves by default.
+
+    A year is loaded with ``load(year)`` on first use (concurrent requests
+    for it wait on the same load) and kept until the loaded years together
+    exceed ``budget`` bytes, when the least recently used are dropped. A
+    year whose CSV has changed since it was loaded is loaded again on its
+    next use. ``on_evict(data)`` runs for every dataset dropped, e.g. to
+    discard cache entries keyed on its version.
+    """
+
+    def __init__(self, load, budget=YEAR_MEMORY_BUDGET, on_evict=None):
+        self.budget = budget
+        self._load = load
+        self._on_evict = on_evict
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = Lock()
+
+    def get(self, year):
+        from process.data import table_version
+        # Raises FileNotFoundError for a year without a table
+        version = table_version(table_path(year))
+        with self._lock:
+            data = self._entries.get(year)
+            if data is not None and data["version"] == version:
+                self._entries.move_to_end(year)
+                return data
+            future = self._pending.get(year)
+            owner = future is None
+            if owner:
+                future = self._pending[year] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            data = self._load(year)
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[year]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            del self._pending[year]
+            evicted = [self._entries.pop(year)] if year in self._entries else []
+            self._entries[year] = data
+            while len(self._entries) > 1 and self.loaded_bytes() > self.budget:
+                evicted.append(self._entries.popitem(last=False)[1])
+        future.set_result(data)
+        if self._on_evict is not None:
+            for old in evicted:
+                self._on_evict(old)
+        return data
+
+    def loaded_bytes(self):
+        return sum(dataset_bytes(data) for data in self._entries.values())
+
+    def loaded(self):
+        """(year, version, bytes) of the loaded years, least recently used first."""
+        with self._lock:
+            return [(year, data["version"], dataset_bytes(data)) for year, data in self._entries.items()]